@@ -4,8 +4,12 @@ Customizable and Reproducible Analysis Pipeline for RNA-Seq Experiments (Curare)
 
 Usage:
     curare.py --samples <samples_file> --pipeline <pipeline_file> --output <output_folder> --cores <cores>
-                 [--use-conda | --no-conda] [--conda-frontend <frontend>] [--conda-prefix <conda_prefix>] [--keep-going] [--latency-wait <seconds>] [--verbose]
+                 [--use-conda | --no-conda] [--conda-frontend <frontend>] [--conda-prefix <conda_prefix>] [--index-store <index_store>] [--mem-mb <mem_mb>] [--keep-going] [--latency-wait <seconds>]
+                 [--plan] [--calibration <calibration_file>] [--executor <executor>] [--cluster-command <command>] [--cluster-nodes <nodes>]
+                 [--node-cores <node_cores>] [--node-mem-mb <node_mem_mb>] [--profile <profile>] [--verbose]
     curare.py --samples <samples_file> --pipeline <pipeline_file> --output <output_folder> --create-conda-envs-only [--conda-frontend <frontend>] [--conda-prefix <conda_prefix>] [--verbose]
+    curare.py index list [--index-store <index_store>]
+    curare.py index prune --max-size <size> [--index-store <index_store>] [--dry-run]
     curare.py (--version | --help)
 
 Options:
@@ -21,11 +25,26 @@ Options:
     --conda-frontend <frontend>                     Choose conda frontend for creating and installing conda environments (conda, mamba) [Default: mamba]
     --conda-prefix <conda_prefix>                   The directory in which conda environments will be created. Relative paths will be relative to output folder! (Default: Output_folder)
     --create-conda-envs-only                        Only download and create conda environments.
+    --index-store <index_store>                     Directory for sharing genome indexes between Curare runs. Indexes are identified by genome content, tool, tool version and index settings (Default: Environment variable CURARE_INDEX_STORE, otherwise indexes are not shared)
     -t <cores> --cores <cores>                      Number of threads/cores.
+    --mem-mb <mem_mb>                               Memory in MB available for all jobs running in parallel. Memory of the rules is limited to this value (Default: unlimited)
     --keep-going                                    Keep going with individual jobs if a job fails.
     --latency-wait <seconds>                        Seconds to wait before checking if all files of a rule were created. [Default: 5]
+    --plan                                          Only print the number of jobs per module and estimate CPU-hours, peak memory and disk usage without starting the pipeline
+    --executor <executor>                           Execution of the jobs: local (all jobs on this machine) or cluster (jobs are submitted with --cluster-command or the Snakemake profile) [Default: local]
+    --cluster-command <command>                     Command template for submitting a job to the cluster. The job script is appended as last argument. Placeholders: {threads}, {resources.mem_mb}, {rule}, {jobid} (e.g. 'sbatch --cpus-per-task {threads} --mem {resources.mem_mb}')
+    --cluster-nodes <nodes>                         Maximum number of cluster jobs at the same time [Default: 100]
+    --node-cores <node_cores>                       Cores of a cluster node. With --executor cluster, the threads of the rules are limited to this value instead of --cores (Default: unlimited)
+    --node-mem-mb <node_mem_mb>                     Memory in MB of a cluster node. With --executor cluster, the memory of the rules is limited to this value instead of --mem-mb (Default: unlimited)
+    --profile <profile>                             Snakemake profile (directory or name) with additional Snakemake settings, e.g. for a cluster
+    --calibration <calibration_file>                File with the measured CPU time and result sizes of previous runs. Used by --plan and updated after each run (Default: Environment variable CURARE_CALIBRATION, otherwise ~/.config/curare/calibration.yaml)
     -v --verbose                                    Print additional information
 
+    index list                                      List all genome indexes of the index store
+    index prune                                     Remove least recently used genome indexes from the index store
+    --max-size <size>                               Maximum size of the index store after pruning (e.g. 800M, 50G, 1.5T)
+    --dry-run                                       Only print which genome indexes would be removed
+
 
 """
 
@@ -48,8 +67,10 @@ Options:
 """
 
 import datetime
-import filecmp
+import hashlib
+import io
 import math
+import os
 import re
 import shutil
 import subprocess
@@ -60,10 +81,9 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Tuple, Any, Optional
 from docopt import docopt
-from distutils.dir_util import copy_tree
 
 import curare.metadata as metadata
-from curare.lib import generate_report
+from curare.lib import generate_report, index_store, run_planner
 
 CURARE_PATH: Path = Path(__file__).resolve().parent
 
@@ -76,6 +96,9 @@ REPORT_TARGET_DIRECTORY: Path = Path('.report')
 GLOBAL_LIB: Path = CURARE_PATH / 'lib'
 GLOBAL_LIB_TARGET_DIR: Path = SNAKEFILES_TARGET_DIRECTORY / 'global_scripts'
 
+# Resources of rules which can be declared in the module YAML files
+RULE_RESOURCES: List[str] = ['threads', 'mem_mb']
+
 
 class ClColors:
     HEADER = '\033[95m'
@@ -105,7 +128,14 @@ def main():
     start_time: datetime.datetime = datetime.datetime.utcnow()
     try:
         args = parse_arguments()
+        if args["index"]:
+            manage_index_store(args)
+            return
         used_modules, paired_end = load_pipeline_file(args["--pipeline"])
+        disable_single_host_settings(used_modules, args["--executor"])
+        scale_resources(used_modules, *get_job_resource_limits(args))
+        if args["--index-store"]:
+            resolve_genome_indexes(used_modules, args["--index-store"])
         samples: Dict[str, Dict[str, Dict[str, str]]] = parse_samples_file(args["--samples"], used_modules, paired_end)
         create_output_directory(args["--output"])
         snakefile: Path = create_snakefile(args["--output"], samples, used_modules, not args["--no-conda"], args["--conda-prefix"], args["--pipeline"])
@@ -128,7 +158,9 @@ def main():
         print(ClColors.FAIL + "Unknown Error occured:\n" + str(ex) + ClColors.ENDC, file=sys.stderr)
         sys.exit(9)
 
-    if args['--create-conda-envs-only']:
+    if args['--plan']:
+        plan_run(args, snakefile, samples, used_modules)
+    elif args['--create-conda-envs-only']:
         sm_command: List[str] = ["snakemake", "--snakefile", str(snakefile), "--directory", str(args["--output"]),
                                  "--cores", args["--cores"], "--use-conda", "--conda-create-envs-only",
                                  "--conda-frontend", args["--conda-frontend"]]
@@ -151,6 +183,9 @@ def main():
                 sm_command.extend(["--conda-frontend", args["--conda-frontend"]])
             if args["--conda-prefix"]:
                 sm_command.extend(["--conda-prefix", args["--conda-prefix"]])
+        if args["--mem-mb"]:
+            sm_command.extend(["--resources", "mem_mb={}".format(args["--mem-mb"])])
+        sm_command.extend(get_executor_arguments(args, used_modules))
         if args["--keep-going"]:
             sm_command.append("--keep-going")
         if args["--verbose"]:
@@ -161,6 +196,11 @@ def main():
             print(ex, file=sys.stderr)
             sys.exit(99)
 
+        try:
+            run_planner.update_calibration(args["--calibration"], args["--output"], get_planned_modules(used_modules), run_planner.input_size_gb(samples))
+        except (OSError, yaml.YAMLError) as ex:
+            print(ClColors.WARNING + 'Calibration file {} could not be updated: {}'.format(args["--calibration"], ex) + ClColors.ENDC, file=sys.stderr)
+
         finish_time: datetime.datetime = datetime.datetime.utcnow()
         if not args["--no-conda"]:
             generate_report.create_report(
@@ -173,6 +213,65 @@ def main():
             )
 
 
+def plan_run(args: Dict[str, Any], snakefile: Path, samples: Dict[str, Dict[str, Dict[str, str]]], modules: Dict[str, List['Module']]):
+    sm_command: List[str] = ["snakemake", "--snakefile", str(snakefile), "--directory", str(args["--output"]),
+                             "--cores", args["--cores"], "--dry-run"]
+    if args["--mem-mb"]:
+        sm_command.extend(["--resources", "mem_mb={}".format(args["--mem-mb"])])
+    try:
+        dry_run = subprocess.run(sm_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    except subprocess.CalledProcessError as ex:
+        print(ex.stdout, file=sys.stderr)
+        sys.exit(99)
+
+    job_counts: Dict[str, int] = run_planner.parse_job_counts(dry_run.stdout)
+    if not job_counts:
+        print('Nothing to be done, all results are up to date.')
+        return
+    planned_modules: List[run_planner.PlannedModule] = get_planned_modules(modules)
+    input_gb: float = run_planner.input_size_gb(samples)
+    coefficients = run_planner.load_coefficients(SNAKEFILES_LIBRARY / 'misc' / 'calibration.yaml', args["--calibration"])
+    estimates = run_planner.estimate(planned_modules, job_counts, input_gb, coefficients,
+                                     int(args["--cores"]) if args["--cores"].isdigit() else None,
+                                     int(args["--mem-mb"]) if args["--mem-mb"] else None)
+    for line in run_planner.format_plan(estimates, job_counts, input_gb):
+        print(line)
+
+
+def get_executor_arguments(args: Dict[str, Any], modules: Dict[str, List['Module']]) -> List[str]:
+    executor_arguments = []  # type: List[str]
+    if args["--profile"]:
+        executor_arguments.extend(["--profile", args["--profile"]])
+    if args["--executor"] == 'cluster':
+        # Rules without a memory declaration get Snakemake's default resources, so all placeholders of the command are set
+        executor_arguments.extend(["--jobs", args["--cluster-nodes"], "--default-resources"])
+        if args["--cluster-command"]:
+            executor_arguments.extend(["--cluster", args["--cluster-command"]])
+        group_components = {}  # type: Dict[str, int]
+        for module in [module for module_list in modules.values() for module in module_list]:
+            group_components.update(module.group_components)
+        if group_components:
+            executor_arguments.append("--group-components")
+            executor_arguments.extend(["{}={}".format(group, components) for group, components in group_components.items()])
+    return executor_arguments
+
+
+def get_planned_modules(modules: Dict[str, List['Module']]) -> List[run_planner.PlannedModule]:
+    planned_modules = []  # type: List[run_planner.PlannedModule]
+    for category, module_list in modules.items():
+        for module in module_list:
+            planned_modules.append(run_planner.PlannedModule(
+                name=module.name,
+                rule_prefix=module.name.lower().replace('-', '_'),
+                # Results of preprocessing and mapping modules are written into the category folder
+                directory=Path(category) / module.name if category in ['premapping', 'analysis'] else Path(category),
+                threads={rule_name: resources['threads'].value for rule_name, resources in module.resources.items() if 'threads' in resources},
+                mem_mb={rule_name: resources['mem_mb'].value for rule_name, resources in module.resources.items() if 'mem_mb' in resources},
+                reference_rules=module.reference_rules
+            ))
+    return planned_modules
+
+
 def check_columns(col_names: List[str], modules: Dict[str, List['Module']], paired_end: bool) -> List[SampleColumnProperties]:
     col2module: List[SampleColumnProperties] = [SampleColumnProperties('', '', []) for _ in col_names]
     if 'name' not in col_names:
@@ -379,6 +478,14 @@ def load_pipeline_file(pipeline_file: Path) -> Tuple[Dict[str, List['Module']],
             settings = pipeline[category].get(module_name, {})
             used_modules[category].append(load_module(category, module_name, settings, pipeline_file, paired_end))
 
+    chunk_reads = pipeline["mapping"].get("chunk_reads", 0)
+    if isinstance(chunk_reads, bool) or not isinstance(chunk_reads, int) or chunk_reads < 0:
+        raise InvalidPipelineFileError('Error in category "mapping": Option "chunk_reads" must be a non-negative integer (0: no chunking)')
+    for module in used_modules["mapping"]:
+        if chunk_reads and not module.chunked_mapping:
+            raise InvalidPipelineFileError('Error in category "mapping": Module "{}" does not support option "chunk_reads"'.format(module.name))
+        module.add_setting('chunk_reads', chunk_reads)
+
     return used_modules, paired_end
 
 
@@ -482,6 +589,8 @@ def get_default_setting(setting_name, setting_properties):
 
 def load_module(category: str, module_name: str, user_settings: Dict[str, str], pipeline_file_path: Path, paired_end: bool) -> 'Module':
     loaded_module = Module(module_name)
+    resource_declarations = {}  # type: Dict[str, Dict[str, Dict[str, Any]]]
+    pipe_group_declarations = {}  # type: Dict[str, List[str]]
     module_yaml_file = SNAKEFILES_LIBRARY / category / module_name / (module_name + '.yaml')
     try:
         if module_yaml_file.is_file():
@@ -501,6 +610,21 @@ def load_module(category: str, module_name: str, user_settings: Dict[str, str],
             if 'columns' in module_yaml:
                 for column_name, column_properties in module_yaml['columns'].items():
                     loaded_module.add_column(column_name, ColumnProperties(column_properties['type'], column_properties['description'], column_properties.get('character_set', None)))
+            if 'genome_index' in module_yaml:
+                tool: str = module_yaml['genome_index']['tool']
+                conda_env_file: Path = SNAKEFILES_LIBRARY / category / module_name / 'lib' / 'conda_env.yaml'
+                loaded_module.genome_index = GenomeIndexProperties(tool, get_conda_dependency_version(conda_env_file, tool),
+                                                                   module_yaml['genome_index'].get('settings', []),
+                                                                   module_yaml['genome_index'].get('files', []))
+                # Empty directory: Indexes are built at the default location of the module
+                loaded_module.add_setting('genome_index_dir', '')
+            loaded_module.chunked_mapping = module_yaml.get('chunked_mapping', False)
+            loaded_module.reference_rules = module_yaml.get('reference_rules', [])
+            add_resource_declarations(resource_declarations, module_yaml.get('resources', {}))
+            if 'cluster' in module_yaml:
+                loaded_module.local_rules = module_yaml['cluster'].get('local_rules', [])
+                loaded_module.group_components = module_yaml['cluster'].get('group_components', {})
+                loaded_module.single_host_settings = module_yaml['cluster'].get('single_host_settings', [])
 
             if paired_end:
                 loaded_module.snakefile = SNAKEFILES_LIBRARY / category / module_name / module_yaml['paired_end']['snakefile']
@@ -519,6 +643,8 @@ def load_module(category: str, module_name: str, user_settings: Dict[str, str],
                 if 'columns' in module_yaml['paired_end']:
                     for column_name, column_properties in module_yaml['paired_end']['columns'].items():
                         loaded_module.add_column(column_name, ColumnProperties(column_properties['type'], column_properties['description'], column_properties.get('character_set', None)))
+                add_resource_declarations(resource_declarations, module_yaml['paired_end'].get('resources', {}))
+                pipe_group_declarations.update(module_yaml['paired_end'].get('pipe_groups', {}))
 
             else:
                 loaded_module.snakefile = SNAKEFILES_LIBRARY / category / module_name / module_yaml['single_end']['snakefile']
@@ -537,7 +663,12 @@ def load_module(category: str, module_name: str, user_settings: Dict[str, str],
                 if 'columns' in module_yaml['single_end']:
                     for column_name, column_properties in module_yaml['single_end']['columns'].items():
                         loaded_module.add_column(column_name, ColumnProperties(column_properties['type'], column_properties['description'], column_properties.get('character_set', None)))
+                add_resource_declarations(resource_declarations, module_yaml['single_end'].get('resources', {}))
+                pipe_group_declarations.update(module_yaml['single_end'].get('pipe_groups', {}))
 
+            loaded_module.resources = load_rule_resources(resource_declarations, user_settings.get('resources', {}) if user_settings else {})
+            # Pipe groups are declared with the boolean setting enabling the named pipe
+            loaded_module.pipe_groups = [rule_names for setting_name, rule_names in pipe_group_declarations.items() if loaded_module.get_setting(setting_name)]
         else:
             raise UnknownModuleError(category.capitalize() + ': Unknown module "' + module_name + '"')
     except UnknownModuleError as e:
@@ -556,6 +687,143 @@ def load_module(category: str, module_name: str, user_settings: Dict[str, str],
     return loaded_module
 
 
+def add_resource_declarations(declarations: Dict[str, Dict[str, Dict[str, Any]]], section_declarations: Dict[str, Dict[str, Dict[str, Any]]]):
+    """Add the resources of a module YAML section. Resources of a rule which are not declared again are kept."""
+    for rule_name, rule_resources in section_declarations.items():
+        declarations.setdefault(rule_name, {}).update(rule_resources)
+
+
+def load_rule_resources(declarations: Dict[str, Dict[str, Dict[str, Any]]], user_resources: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, 'ResourceRange']]:
+    resources = {}  # type: Dict[str, Dict[str, ResourceRange]]
+    for rule_name, rule_resources in declarations.items():
+        resources[rule_name] = {}
+        for resource_name, properties in rule_resources.items():
+            if resource_name not in RULE_RESOURCES:
+                raise InvalidPipelineFileError('Unknown resource "{}" of rule "{}". Allowed resources: {}'.format(resource_name, rule_name, ', '.join(RULE_RESOURCES)))
+            min_value = properties.get('min', 1)
+            max_value = math.inf if properties.get('max', 'Inf') == "Inf" else properties['max']
+            resources[rule_name][resource_name] = ResourceRange(int(properties['default']), min_value, max_value)
+
+    for rule_name, rule_resources in user_resources.items():
+        if rule_name not in resources:
+            raise InvalidPipelineFileError('Error in option "resources": Unknown rule "{}". Rules with configurable resources: {}'.format(rule_name, ', '.join(resources.keys())))
+        for resource_name, value in rule_resources.items():
+            if resource_name not in resources[rule_name]:
+                raise InvalidPipelineFileError('Error in option "resources": Resource "{}" of rule "{}" is not configurable. Allowed resources: {}'.format(resource_name, rule_name, ', '.join(resources[rule_name].keys())))
+            try:
+                value = int(value)
+            except ValueError:
+                raise InvalidNumberTypeError('Error in option "resources": "{}" ({} of rule "{}") cannot be converted into an integer'.format(value, resource_name, rule_name))
+            resource = resources[rule_name][resource_name]
+            if not resource.min_value <= value <= resource.max_value:
+                raise OutOfBondError('Error in option "resources": Value out of valid range. Used value: {} ({} of rule "{}") - Range: {}-{}'.format(value, resource_name, rule_name, resource.min_value, resource.max_value))
+            resource.value = value
+    return resources
+
+
+def disable_single_host_settings(modules: Dict[str, List['Module']], executor: str):
+    """Disable boolean settings which need all jobs of a module on the same host (e.g. a genome in shared memory) on a cluster"""
+    if executor != 'cluster':
+        return
+    for module in [module for module_list in modules.values() for module in module_list]:
+        for setting_name in module.single_host_settings:
+            if module.get_setting(setting_name):
+                print(ClColors.WARNING + 'Module {}: Option "{}" is disabled, because the jobs run on different cluster nodes'.format(module.name, setting_name) + ClColors.ENDC, file=sys.stderr)
+                module.add_setting(setting_name, False)
+
+
+def get_job_resource_limits(args: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Cores and memory available for one job: this host (--cores, --mem-mb) or, with --executor cluster, a cluster node
+    (--node-cores, --node-mem-mb), because cluster jobs do not run on the submitting host"""
+    if args["--executor"] == "cluster":
+        return args["--node-cores"], args["--node-mem-mb"]
+    return args["--cores"], args["--mem-mb"]
+
+
+def scale_resources(modules: Dict[str, List['Module']], cores: Optional[str], mem_mb: Optional[str]):
+    """Limit the threads and memory of all rules to the resources available for one job (see get_job_resource_limits).
+    Rules of a pipe group run at the same time, so their sum is limited instead of each rule on its own."""
+    if cores == 'all':
+        cores = str(os.cpu_count() or 1)
+    limits = {'threads': int(cores) if cores and cores.isdigit() else None,
+              'mem_mb': int(mem_mb) if mem_mb else None}  # type: Dict[str, Optional[int]]
+    for module in [module for module_list in modules.values() for module in module_list]:
+        piped_rules = [rule_name for pipe_group in module.pipe_groups for rule_name in pipe_group]
+        rule_groups = [[rule_name] for rule_name in module.resources if rule_name not in piped_rules] + module.pipe_groups
+        for resource_name, limit in limits.items():
+            if limit is None:
+                continue
+            for rule_group in rule_groups:
+                fit_resources(module, rule_group, resource_name, limit)
+
+
+def fit_resources(module: 'Module', rule_names: List[str], resource_name: str, limit: int):
+    """Scale down the resource of rules running at the same time proportionally until their sum fits into the limit.
+    Rules without a declaration of the resource use one thread and no memory reserved by Curare."""
+    resources = [module.resources[rule_name][resource_name] for rule_name in rule_names
+                 if resource_name in module.resources.get(rule_name, {})]  # type: List[ResourceRange]
+    available = limit - (len(rule_names) - len(resources) if resource_name == 'threads' else 0)
+    if available < sum(resource.min_value for resource in resources):
+        if len(rule_names) == 1:
+            raise InvalidPipelineFileError('Error in module {}: Rule "{}" needs at least {} {}, but only {} are available'.format(module.name, rule_names[0], resources[0].min_value, resource_name, limit))
+        raise InvalidPipelineFileError('Error in module {}: Rules "{}" run at the same time and need at least {} {} together, but only {} are available'.format(
+            module.name, '", "'.join(rule_names), limit - available + sum(resource.min_value for resource in resources), resource_name, limit))
+    used = sum(resource.value for resource in resources)
+    if used <= available:
+        return
+    for resource in resources:
+        resource.value = max(resource.min_value, resource.value * available // used)
+    # Raising values to their minimum can exceed the limit again, so the surplus is taken from the largest rules
+    surplus = sum(resource.value for resource in resources) - available
+    for resource in sorted(resources, key=lambda resource: resource.value, reverse=True):
+        reduction = min(surplus, resource.value - resource.min_value)
+        resource.value -= reduction
+        surplus -= reduction
+
+
+def get_conda_dependency_version(conda_env_file: Path, tool: str) -> str:
+    conda_env = yaml.safe_load(conda_env_file.open('r'))
+    for dependency in conda_env['dependencies']:
+        if isinstance(dependency, str):
+            name, _, version = dependency.partition('=')
+            if name.strip() == tool:
+                return version.lstrip('=').strip()
+    raise InvalidPipelineFileError('Conda environment {} does not contain tool "{}"'.format(conda_env_file, tool))
+
+
+def resolve_genome_indexes(modules: Dict[str, List['Module']], store: Path):
+    for module in [module for module_list in modules.values() for module in module_list]:
+        if module.genome_index is None:
+            continue
+        properties: GenomeIndexProperties = module.genome_index
+        index_dir: Path = index_store.resolve_index(
+            store=store,
+            genome=Path(module.get_setting('genome_fasta')),
+            tool=properties.tool,
+            tool_version=properties.tool_version,
+            parameters={setting: str(module.get_setting(setting)) for setting in properties.settings},
+            parameter_files={setting: module.get_setting(setting) for setting in properties.files}
+        )
+        module.add_setting('genome_index_dir', str(index_dir))
+
+
+def manage_index_store(args: Dict[str, Any]):
+    store: Optional[Path] = args["--index-store"]
+    if store is None:
+        raise UnknownCommandLineArgumentError("Command Line Arguments: No index store found. Use --index-store or set {}".format(index_store.INDEX_STORE_ENVIRONMENT_VARIABLE))
+    if args["list"]:
+        entries = index_store.list_indexes(store)
+        print('\t'.join(['tool', 'version', 'size', 'last_used', 'genome', 'path']))
+        for entry in entries:
+            print('\t'.join([entry.tool, entry.tool_version, index_store.format_size(entry.size), entry.last_used, entry.genome, str(entry.path)]))
+        print('Total: {} ({} indexes)'.format(index_store.format_size(sum(entry.size for entry in entries)), len(entries)), file=sys.stderr)
+    elif args["prune"]:
+        removed = index_store.prune(store, index_store.parse_size(args["--max-size"]), args["--dry-run"])
+        for entry in removed:
+            print('{}{}\t{}\t{}\t{}'.format('Would remove ' if args["--dry-run"] else 'Removed ', entry.tool, index_store.format_size(entry.size), entry.genome, entry.path))
+        print('Freed: {}'.format(index_store.format_size(sum(entry.size for entry in removed))), file=sys.stderr)
+
+
 def create_output_directory(output_path: Path):
     if not output_path.exists():
         output_path.mkdir(parents=True)
@@ -578,6 +846,8 @@ def create_output_directory(output_path: Path):
 def create_snakefile(output_folder: Path, samples: Dict[str, Dict[str, Dict[str, Any]]], modules: Dict[str, List['Module']], use_conda: bool,
                      conda_environment: Path, curare_pipeline_file: Path) -> Path:
     config_file: Path = create_snakemake_config_file(output_folder, samples)
+    # Files are only written if their content changed, so Snakemake does not consider finished jobs as outdated
+    regenerated_modules = []  # type: List[str]
     # find every rule name
     re_rule_name = re.compile('^rule (?P<rule_name>.*):$', re.MULTILINE)
     # find every lib reference
@@ -587,31 +857,37 @@ def create_snakefile(output_folder: Path, samples: Dict[str, Dict[str, Dict[str,
     for module in [module for module_list in modules.values() for module in module_list]:
         with module.snakefile.open('r') as module_file:
             module_content = module_file.read()
+            if module.settings.get('chunk_reads', 0):
+                # scatter/gather rules for chunked mappings
+                with (SNAKEFILES_LIBRARY / 'misc' / 'chunked_mapping').open('r') as chunked_mapping_file:
+                    module_content += '\n\n' + chunked_mapping_file.read()
+            module_content = set_rule_resources(module_content, module.resources)
+            # short rules are not submitted to a cluster
+            local_rules = [rule_name for rule_name in module.local_rules if re.search('^rule {}:$'.format(rule_name), module_content, re.MULTILINE)]
+            if local_rules:
+                module_content += '\n\nlocalrules: {}\n'.format(', '.join('{}__{}'.format(module.name.lower().replace('-', '_'), rule_name) for rule_name in local_rules))
             # change rule name from <rule name> to <module name>__<rule name>
             module_content = re_rule_name.sub('rule {}__\g<rule_name>:'.format(module.name.lower().replace('-', '_')), module_content)
             module_content = re_lib_folder.sub('{}/{}_lib/\g<file_name>'.format(SNAKEFILES_TARGET_DIRECTORY, module.name.lower()), module_content)
+            # shared scripts of curare/lib (e.g. split_bam.py) are referenced with %%GLOBAL_SCRIPTS%%
+            module_content = module_content.replace('%%GLOBAL_SCRIPTS%%', str(GLOBAL_LIB_TARGET_DIR))
             for (wildcard, value) in module.settings.items():
                 module_content = module_content.replace("%%{}%%".format(wildcard.upper()), str(value))
             module_path = output_folder / SNAKEFILES_TARGET_DIRECTORY / (module.name.lower() + '.sm')
-            with module_path.open('w') as module_output_file:
-                module_output_file.write(module_content)
-                snakefile_module_paths.append(module_path.name)
+            module_changed = write_if_changed(module_path, module_content)
+            snakefile_module_paths.append(module_path.name)
             lib_src = module.snakefile.parent / 'lib'
             if lib_src.is_dir():
                 lib_dest = output_folder / SNAKEFILES_TARGET_DIRECTORY / (module.name.lower() + '_lib')
-                if lib_dest.is_dir():
-                    dir_comp = filecmp.dircmp(str(lib_src), str(lib_dest))
-                    if dir_comp.left_only or dir_comp.diff_files:
-                        copy_lib(lib_src, lib_dest)
-                    else:
-                        for sub in dir_comp.subdirs.values():
-                            if sub.left_only or sub.diff_files:
-                                copy_lib(lib_src, lib_dest)
-                else:
-                    copy_lib(lib_src, lib_dest)
+                module_changed = copy_lib(lib_src, lib_dest) or module_changed
+            if module_changed:
+                regenerated_modules.append(module.name)
+
+    if copy_lib(GLOBAL_LIB, output_folder / GLOBAL_LIB_TARGET_DIR):
+        regenerated_modules.append('global_scripts')
 
     snakefile_main_path = output_folder / 'Snakefile'
-    with snakefile_main_path.open('w') as snakefile:
+    with io.StringIO() as snakefile:
         snakefile.write(
             'configfile: "{}"\n\n'.format(SNAKEFILES_TARGET_DIRECTORY / config_file.name))
         for path in snakefile_module_paths:
@@ -625,8 +901,6 @@ def create_snakefile(output_folder: Path, samples: Dict[str, Dict[str, Dict[str,
         # copy parse_versions snakefile to parse conda versions for report.
         if use_conda:
             conda_environment = conda_environment if conda_environment is not None else Path(".snakemake/conda")
-            # copy parse_versions.py script
-            copy_tree(str(GLOBAL_LIB), str(output_folder / GLOBAL_LIB_TARGET_DIR), preserve_symlinks=True)
             with (SNAKEFILES_LIBRARY / 'misc' / 'parse_versions').open() as versions_snakefile:
                 parse_versions_rule: List[str] = versions_snakefile.read()\
                     .replace('%%CONDA_ENVIRONMENT%%', str(conda_environment))\
@@ -641,12 +915,50 @@ def create_snakefile(output_folder: Path, samples: Dict[str, Dict[str, Dict[str,
                         snakefile.write('\n')
                 snakefile.writelines([line + "\n" for line in parse_versions_rule])
 
+        if write_if_changed(snakefile_main_path, snakefile.getvalue()):
+            regenerated_modules.append(snakefile_main_path.name)
+
+    if regenerated_modules:
+        print('Regenerated workflow files: {}'.format(', '.join(regenerated_modules)))
+    else:
+        print('Workflow files unchanged')
+
     return snakefile_main_path
 
 
+def set_rule_resources(module_content: str, resources: Dict[str, Dict[str, 'ResourceRange']]) -> str:
+    """Replace the threads and resources directives of all rules with the resources declared in the module YAML file"""
+    re_rule_header = re.compile('^(rule|checkpoint) (?P<rule_name>[^:\s]+):$')
+    re_directive = re.compile('^    (?P<directive>\w+):')
+    lines = []  # type: List[str]
+    rule_name = None  # type: Optional[str]
+    skip_directive = False
+    for line in module_content.split('\n'):
+        rule_header = re_rule_header.match(line)
+        if rule_header:
+            rule_name = rule_header.group('rule_name')
+            lines.append(line)
+            if rule_name in resources:
+                if 'threads' in resources[rule_name]:
+                    lines.extend(['    threads:', '        {}'.format(resources[rule_name]['threads'].value)])
+                if 'mem_mb' in resources[rule_name]:
+                    lines.extend(['    resources:', '        mem_mb={}'.format(resources[rule_name]['mem_mb'].value)])
+            continue
+        if line and not line[0].isspace():
+            rule_name = None
+        if rule_name in resources:
+            directive = re_directive.match(line)
+            if directive:
+                skip_directive = directive.group('directive') in ['threads', 'resources']
+            if skip_directive and line.strip():
+                continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+
 def create_snakemake_config_file(output_folder: Path, samples: Dict[str, Dict[str, Dict[str, Any]]]) -> Path:
     config_path = output_folder / SNAKEFILES_TARGET_DIRECTORY / 'snakefile_config.yml'
-    with config_path.open('w') as config_file:
+    with io.StringIO() as config_file:
         config_file.write('entry_order: [{}]\n'.format(", ".join(['"' + sample + '"' for sample in samples.keys()])))
         config_file.write('entries:\n')
         for row, modules in samples.items():
@@ -658,25 +970,76 @@ def create_snakemake_config_file(output_folder: Path, samples: Dict[str, Dict[st
                         config_file.write('            "{}": {}\n'.format(column, value))
                     else:
                         config_file.write('            "{}": "{}"\n'.format(column, value))
+        write_if_changed(config_path, config_file.getvalue())
     return config_path
 
 
-def copy_lib(src_folder: Path, dest_folder: Path):
-    try:
-        if dest_folder.is_dir():
-            shutil.rmtree(str(dest_folder))
-        shutil.copytree(str(src_folder), str(dest_folder), symlinks=True)
-    except shutil.Error as err:
-        raise err
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def write_if_changed(path: Path, content: str) -> bool:
+    """Write content to path if the file does not exist or its content differs. Returns True if the file was written."""
+    new_content = content.encode()
+    if path.is_file() and content_hash(path.read_bytes()) == content_hash(new_content):
+        return False
+    tmp_path = path.with_name('.{}.tmp'.format(path.name))
+    tmp_path.write_bytes(new_content)
+    tmp_path.replace(path)
+    return True
+
+
+def copy_lib(src_folder: Path, dest_folder: Path) -> bool:
+    """Synchronize dest_folder with src_folder. Only changed files are copied. Returns True if anything changed."""
+    changed = False
+    dest_folder.mkdir(parents=True, exist_ok=True)
+    src_entries = {entry.name: entry for entry in src_folder.iterdir() if entry.name != '__pycache__'}
+    for dest_entry in dest_folder.iterdir():
+        src_entry = src_entries.get(dest_entry.name)
+        if dest_entry.name == '__pycache__' or (src_entry is not None and src_entry.is_symlink() == dest_entry.is_symlink() and src_entry.is_dir() == dest_entry.is_dir()):
+            continue
+        # Removed from source or changed its type
+        if dest_entry.is_dir() and not dest_entry.is_symlink():
+            shutil.rmtree(str(dest_entry))
+        else:
+            dest_entry.unlink()
+        changed = True
+    for name, src_entry in sorted(src_entries.items()):
+        dest_entry = dest_folder / name
+        if src_entry.is_symlink():
+            if not dest_entry.is_symlink() or os.readlink(str(dest_entry)) != os.readlink(str(src_entry)):
+                if dest_entry.is_symlink():
+                    dest_entry.unlink()
+                dest_entry.symlink_to(os.readlink(str(src_entry)))
+                changed = True
+        elif src_entry.is_dir():
+            changed = copy_lib(src_entry, dest_entry) or changed
+        elif not dest_entry.is_file() or content_hash(src_entry.read_bytes()) != content_hash(dest_entry.read_bytes()):
+            shutil.copy2(str(src_entry), str(dest_entry))
+            changed = True
+    return changed
 
 
 def parse_arguments():
     args = docopt(__doc__, version=metadata.__version__)
+    args["--index-store"] = index_store.get_index_store(args["--index-store"])
+    if args["index"]:
+        return args
+    args["--calibration"] = run_planner.get_calibration_file(args["--calibration"])
     args["--samples"] = Path(args["--samples"]).resolve()
     args["--output"] = Path(args["--output"])
     args["--pipeline"] = Path(args["--pipeline"]).resolve()
     if args["--conda-prefix"]:
         args["--conda-prefix"] = Path(args["--conda-prefix"]).resolve()
+    if args["--mem-mb"] and not (args["--mem-mb"].isdigit() and int(args["--mem-mb"]) > 0):
+        raise UnknownCommandLineArgumentError("Command Line Arguments: Option '--mem-mb' must be a positive integer (memory in MB)")
+    for option in ["--node-cores", "--node-mem-mb"]:
+        if args[option] and not (args[option].isdigit() and int(args[option]) > 0):
+            raise UnknownCommandLineArgumentError("Command Line Arguments: Option '{}' must be a positive integer".format(option))
+    if args["--executor"] not in ["local", "cluster"]:
+        raise UnknownCommandLineArgumentError("Command Line Arguments: Argument {} unknown for command line option '{}'".format(args["--executor"], "--executor"))
+    if args["--executor"] == "cluster" and not (args["--cluster-command"] or args["--profile"]):
+        raise UnknownCommandLineArgumentError("Command Line Arguments: '--executor cluster' needs '--cluster-command' or '--profile'")
     if args["--conda-frontend"] not in ["conda", "mamba"]:
         raise UnknownCommandLineArgumentError("Command Line Arguments: Argument {} unknown for command line option '{}'".format(args["--conda-frontend"], "--conda-frontend"))
 
@@ -698,6 +1061,14 @@ class Module:
             snakefile -- path to snakefile of module
             settings -- dictionary with all user-defined settings
             columns -- dictionary of all necessary columns in group file
+            genome_index -- properties of the genome index (only for modules building an index)
+            chunked_mapping -- module supports splitting the reads of a sample into chunks (pipeline setting "chunk_reads")
+            resources -- threads and memory (mem_mb) of the rules declared in the module YAML file
+            local_rules -- rules which are not submitted to a cluster
+            group_components -- number of independent jobs of a group which are submitted as one cluster job
+            single_host_settings -- boolean settings which are disabled on a cluster, because they need all jobs on one host
+            pipe_groups -- rules connected by named pipes, which run at the same time and share the resources
+            reference_rules -- rules which run once per reference (e.g. genome index), independent of the input size
 
     """
 
@@ -719,6 +1090,15 @@ class Module:
         else:
             self.columns = columns
 
+        self.genome_index = None  # type: Optional['GenomeIndexProperties']
+        self.chunked_mapping = False  # type: bool
+        self.resources = {}  # type: Dict[str, Dict[str, 'ResourceRange']]
+        self.local_rules = []  # type: List[str]
+        self.group_components = {}  # type: Dict[str, int]
+        self.single_host_settings = []  # type: List[str]
+        self.pipe_groups = []  # type: List[List[str]]
+        self.reference_rules = []  # type: List[str]
+
     def __str__(self):
         return self.name
 
@@ -749,6 +1129,38 @@ class ColumnProperties:
         self.character_set = chr_set
 
 
+class GenomeIndexProperties:
+    """Structure class for genome indexes which can be shared with the index store
+
+        Attributes:
+            tool -- indexing tool (as named in the conda environment)
+            tool_version -- version of the indexing tool
+            settings -- module settings which influence the index
+            files -- module settings containing files which influence the index
+    """
+
+    def __init__(self, tool: str, tool_version: str, settings: List[str], files: List[str]):
+        self.tool = tool
+        self.tool_version = tool_version
+        self.settings = settings
+        self.files = files
+
+
+class ResourceRange:
+    """Structure class for a resource (threads or mem_mb) of a rule
+
+        Attributes:
+            value -- used value (default of the module YAML file, pipeline file setting or limited to the available resources)
+            min_value -- minimal value necessary for the rule
+            max_value -- maximal value used by the rule
+    """
+
+    def __init__(self, value: int, min_value: int, max_value: float):
+        self.value = value
+        self.min_value = min_value
+        self.max_value = max_value
+
+
 class EmptySamplesFileError(Exception):
     """Exception raised for errors in the samples file.
 
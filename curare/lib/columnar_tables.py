@@ -0,0 +1,151 @@
+"""
+Write the TSV tables of the count table and DGE modules as typed, zstd-compressed Parquet files.
+
+Sample columns of featureCounts tables (mapping/<sample>.bam) are named by their sample. Every file stores the module,
+the source table and the sample metadata (sample name, original column and module columns of the samples file, e.g.
+condition) as JSON in the schema metadata (key "curare"), e.g. for notebooks:
+
+    pyarrow.parquet.read_schema('counts.parquet').metadata[b'curare']
+
+featurecounts_stats() reads the summary back for the report data.
+
+Written files (all optional):
+    <output-dir>/counts.parquet                             featureCounts table (--counts)
+    <output-dir>/counts_summary.parquet                     featureCounts summary (<counts>.summary)
+    <output-dir>/counts_normalized.parquet                  Normalized counts (--normalized)
+    <output-dir>/deseq2_comparisons/<comparison>.parquet    DESeq2 results of all comparisons (--comparisons)
+    <output-dir>/summary/<condition>.parquet                DGE summaries of all conditions (--summaries)
+
+Usage:
+    columnar_tables.py --module <module> --output-dir <dir> [--samples <samples>] [--counts <counts>] [--normalized <normalized>] [--comparisons <comparison_dir>] [--summaries <summary_dir>]
+    columnar_tables.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    -m <module> --module <module>                       Name of the module
+    -o <dir> --output-dir <dir>                         Output directory
+    -s <samples> --samples <samples>                    JSON list of sample metadata (objects with at least "name")
+    -c <counts> --counts <counts>                       featureCounts table (with <counts>.summary)
+    -n <normalized> --normalized <normalized>           Normalized count table (first column: gene id)
+    --comparisons <comparison_dir>                      Folder with DESeq2 result tables (*.csv)
+    --summaries <summary_dir>                           Folder with DGE summaries (*.tsv)
+"""
+
+import json
+
+from docopt import docopt
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+METADATA_KEY: bytes = b'curare'
+COMPRESSION: str = 'zstd'
+# Geneid, Chr, Start, End, Strand (Length and samples are numbers)
+FEATURECOUNTS_STRING_COLUMNS: List[str] = ['Geneid', 'Chr', 'Start', 'End', 'Strand']
+
+
+def sample_name(column: str) -> str:
+    """Sample of a featureCounts column (mapping/<sample>.bam)"""
+    name: str = Path(column).name
+    return name[:-len('.bam')] if name.endswith('.bam') else name
+
+
+def read_tsv(tsv: Path, skip_rows: int = 0, string_columns: Optional[List[str]] = None) -> pa.Table:
+    """TSV with typed columns (numbers are inferred, 'NA' is null). The first column is always a string."""
+    with tsv.open() as tsv_file:
+        for _ in range(skip_rows):
+            next(tsv_file)
+        header: List[str] = [column.strip('"') for column in next(tsv_file).rstrip('\r\n').split('\t')]
+    column_types: Dict[str, pa.DataType] = {column: pa.string() for column in [header[0]] + (string_columns or [])}
+    table: pa.Table = pa_csv.read_csv(str(tsv),
+                                      read_options=pa_csv.ReadOptions(skip_rows=skip_rows + 1, column_names=header),
+                                      parse_options=pa_csv.ParseOptions(delimiter='\t'),
+                                      convert_options=pa_csv.ConvertOptions(column_types=column_types, null_values=['NA'],
+                                                                            strings_can_be_null=False))
+    # columns with only NA values (e.g. padj of a comparison without tested genes) are numbers
+    for index, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            table = table.set_column(index, field.name, table.column(index).cast(pa.float64()))
+    return table
+
+
+def write_parquet(table: pa.Table, output: Path, metadata: Dict[str, Any]):
+    output.parent.mkdir(parents=True, exist_ok=True)
+    schema_metadata: Dict[bytes, bytes] = dict(table.schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(metadata).encode()
+    table = table.replace_schema_metadata(schema_metadata)
+    pq.write_table(table, str(output), compression=COMPRESSION)
+
+
+def featurecounts_metadata(module: str, source: Path, columns: List[str], samples: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    sample_metadata: List[Dict[str, Any]] = []
+    for column in columns:
+        name: str = sample_name(column)
+        sample_metadata.append(dict(samples.get(name, {}), name=name, column=column))
+    return {'module': module, 'source': source.name, 'samples': sample_metadata}
+
+
+def write_featurecounts(module: str, counts: Path, output_dir: Path, samples: Dict[str, Dict[str, Any]]):
+    # first line: featureCounts program and command
+    table: pa.Table = read_tsv(counts, skip_rows=1, string_columns=FEATURECOUNTS_STRING_COLUMNS)
+    sample_columns: List[str] = table.column_names[len(FEATURECOUNTS_STRING_COLUMNS) + 1:]
+    table = table.rename_columns(table.column_names[:len(FEATURECOUNTS_STRING_COLUMNS) + 1] + [sample_name(column) for column in sample_columns])
+    write_parquet(table, output_dir / 'counts.parquet', featurecounts_metadata(module, counts, sample_columns, samples))
+
+    summary: Path = counts.with_name(counts.name + '.summary')
+    if summary.is_file():
+        table = read_tsv(summary)
+        sample_columns = table.column_names[1:]
+        table = table.rename_columns(table.column_names[:1] + [sample_name(column) for column in sample_columns])
+        write_parquet(table, output_dir / 'counts_summary.parquet', featurecounts_metadata(module, summary, sample_columns, samples))
+
+
+def write_table_folder(module: str, folder: Path, suffix: str, output_dir: Path, first_column: str, samples: List[Dict[str, Any]]):
+    """All tables of a folder (e.g. one per comparison) with the same file name"""
+    for tsv in sorted(folder.iterdir()):
+        if tsv.is_file() and tsv.name.endswith(suffix):
+            table: pa.Table = read_tsv(tsv)
+            table = table.rename_columns([first_column] + table.column_names[1:])
+            write_parquet(table, output_dir / (tsv.name[:-len(suffix)] + '.parquet'), {'module': module, 'source': tsv.name, 'samples': samples})
+
+
+def featurecounts_stats(summary: Path) -> List[Dict[str, str]]:
+    """Status values of each sample of counts_summary.parquet, like the columns of the featureCounts summary"""
+    table: pa.Table = pq.read_table(str(summary))
+    statuses: List[str] = table.column(0).to_pylist()
+    stats_table: List[Dict[str, str]] = []
+    for name in table.column_names[1:]:
+        sample_stats: Dict[str, str] = {'name': name}
+        sample_stats.update(zip(statuses, (str(value) for value in table.column(name).to_pylist())))
+        stats_table.append(sample_stats)
+    return stats_table
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    module: str = args['--module']
+    output_dir: Path = Path(args['--output-dir'])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    sample_list: List[Dict[str, Any]] = json.loads(Path(args['--samples']).read_text()) if args['--samples'] else []
+    samples: Dict[str, Dict[str, Any]] = {sample['name']: sample for sample in sample_list}
+
+    if args['--counts']:
+        write_featurecounts(module, Path(args['--counts']), output_dir, samples)
+    if args['--normalized']:
+        normalized: Path = Path(args['--normalized'])
+        table: pa.Table = read_tsv(normalized)
+        write_parquet(table, output_dir / 'counts_normalized.parquet', {'module': module, 'source': normalized.name, 'samples': sample_list})
+    if args['--comparisons']:
+        # first header field of the DESeq2 results is empty (row names)
+        write_table_folder(module, Path(args['--comparisons']), '.csv', output_dir / 'deseq2_comparisons', 'gene_id', sample_list)
+    if args['--summaries']:
+        write_table_folder(module, Path(args['--summaries']), '.tsv', output_dir / 'summary', 'gene_id', sample_list)
+
+
+if __name__ == '__main__':
+    main()
@@ -64,7 +64,7 @@ def create_navigationbar_js_object(versions_json: Path, snakefiles_path: Path, n
         f.write('  const nav = ')
 
         # Copy contents of versions.json into report_data.js.
-        f.write(json.dumps(nav, indent=2).replace('\n', '\n  '))
+        f.write(json.dumps(nav, separators=(',', ':')))
         f.write('\n')
 
         f.write('  return nav;\n')
@@ -83,7 +83,7 @@ def create_summary_js_object(output_path: Path, curare_version: str, runtime: ti
         f.write('    date: "{} ({})",\n'.format(datetime.strftime(time, "%Y-%m-%d %H:%M:%S"), time.tzinfo))
         f.write('    curare_version: "{}",\n'.format(curare_version))
         f.write('    runtime: {},\n'.format(runtime.total_seconds()))
-        f.write('    groups: {},\n'.format(json.dumps(groups, indent=2).replace('\n', '\n    ')))
+        f.write('    groups: {},\n'.format(json.dumps(groups, separators=(',', ':'))))
         f.write('  };\n')
         f.write('  return summary;\n')
         f.write('}());')
@@ -96,7 +96,7 @@ def create_versions_js_object(versions_json: Path, output_path: Path):
 
         # Copy contents of versions.json into report_data.js.
         with versions_json.open() as versions:
-            f.write(json.dumps(json.load(versions), indent=2).replace('\n', '\n  '))
+            f.write(json.dumps(json.load(versions), separators=(',', ':')))
         f.write('\n')
 
         f.write('  return versions;\n')
@@ -0,0 +1,114 @@
+"""
+Small index of GFF/GTF annotation files, which is created once per annotation and reused by all later runs.
+
+The index holds the number of features per feature type and per sequence (seqid). It is stored in the cache directory
+of the current user, CURARE_ANNOTATION_CACHE (default: ~/.cache/curare/annotations), in a subdirectory per annotation
+path. With CURARE_ANNOTATION_SIDECAR_CACHE=1, the cache directory is created next to the annotation
+(.<annotation name>.curare) if the annotation directory is writable. If the cache directory cannot be written, the
+index is built in memory for each call. The index is rebuilt if path, size or modification time of the annotation
+changed. The SHA-256 hash of the annotation identifies its content, e.g. for other cached files.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+INDEX_VERSION: int = 1
+INDEX_FILE_NAME: str = 'index.json'
+CACHE_ENVIRONMENT_VARIABLE: str = 'CURARE_ANNOTATION_CACHE'
+SIDECAR_ENVIRONMENT_VARIABLE: str = 'CURARE_ANNOTATION_SIDECAR_CACHE'
+DEFAULT_CACHE_ROOT: Path = Path.home() / '.cache' / 'curare' / 'annotations'
+READ_SIZE: int = 1024 * 1024
+
+
+def annotation_cache_directory(gff: Path) -> Path:
+    """Directory of cached files of an annotation (created if missing, only accessible by the current user)"""
+    gff = gff.resolve()
+    if os.environ.get(SIDECAR_ENVIRONMENT_VARIABLE, '') in ('1', 'yes', 'true') and os.access(str(gff.parent), os.W_OK):
+        cache_directory: Path = gff.parent / '.{}.curare'.format(gff.name)
+    else:
+        cache_root: Path = Path(os.environ.get(CACHE_ENVIRONMENT_VARIABLE, str(DEFAULT_CACHE_ROOT))).expanduser()
+        cache_directory = cache_root / hashlib.sha256(str(gff).encode()).hexdigest()[:16]
+    cache_directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    return cache_directory
+
+
+def file_key(gff: Path) -> Dict[str, Any]:
+    stat = gff.stat()
+    return {'version': INDEX_VERSION, 'path': str(gff.resolve()), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_index(gff: Path) -> Dict[str, Any]:
+    """Index of the annotation, built if missing or outdated"""
+    key: Dict[str, Any] = file_key(gff)
+    try:
+        index_file: Path = annotation_cache_directory(gff) / INDEX_FILE_NAME
+        index: Dict[str, Any] = json.loads(index_file.read_text())
+        if all(index.get(name) == value for name, value in key.items()):
+            return index
+    except (OSError, ValueError, AttributeError):
+        pass
+    index = dict(key, **build_index(gff))
+    try:
+        write_atomic(annotation_cache_directory(gff) / INDEX_FILE_NAME, json.dumps(index, indent=1))
+    except OSError:
+        pass
+    return index
+
+
+def build_index(gff: Path) -> Dict[str, Any]:
+    feature_types: Dict[str, int] = {}
+    seqids: Dict[str, int] = {}
+    sha256 = hashlib.sha256()
+    for line in read_lines(gff, sha256):
+        if line.startswith(b'#') or not line.strip():
+            continue
+        columns: List[bytes] = line.split(b'\t', 3)
+        if len(columns) < 4:
+            continue
+        feature_type: str = columns[2].decode()
+        seqid: str = columns[0].decode()
+        feature_types[feature_type] = feature_types.get(feature_type, 0) + 1
+        seqids[seqid] = seqids.get(seqid, 0) + 1
+    return {'sha256': sha256.hexdigest(), 'feature_types': feature_types, 'seqids': seqids}
+
+
+def read_lines(gff: Path, hash_object) -> Iterator[bytes]:
+    """Lines of a (gzip-compressed) file, read in large blocks. The hash is updated with the raw file content."""
+    with gff.open('rb') as raw_file:
+        reader = HashingReader(raw_file, hash_object)
+        stream = gzip.GzipFile(fileobj=reader) if gff.name.endswith('.gz') else reader
+        rest: bytes = b''
+        for block in iter(lambda: stream.read(READ_SIZE), b''):
+            lines: List[bytes] = (rest + block).split(b'\n')
+            rest = lines.pop()
+            yield from lines
+        if rest:
+            yield rest
+
+
+class HashingReader:
+    """Binary file wrapper which updates a hash with all read bytes"""
+
+    def __init__(self, file, hash_object):
+        self.file = file
+        self.hash_object = hash_object
+
+    def read(self, size: int = -1) -> bytes:
+        data: bytes = self.file.read(size)
+        self.hash_object.update(data)
+        return data
+
+
+def write_atomic(path: Path, content: str):
+    tmp_path: Path = path.with_name('{}.{}.tmp'.format(path.name, os.getpid()))
+    tmp_path.write_text(content)
+    tmp_path.replace(path)
+
+
+def feature_types(gff: Path) -> List[str]:
+    return list(load_index(gff)['feature_types'].keys())
@@ -0,0 +1,166 @@
+"""
+Reader of GFF3 and GTF annotation files (may be gzip-compressed), shared by the module scripts.
+
+Only the requested attributes are extracted from column 9, with one compiled regular expression per attribute key.
+GTF files are recognized by their file extension (.gtf, .gtf.gz); their attributes are separated by ';' and keys and
+values by whitespace (key "value"). Values keep their quotes like in the annotation file.
+
+load_features() caches the selected features as JSON file in the cache directory of the annotation (see
+gff_index.py). The cache file name contains the SHA-256 hash of the annotation and the selection (feature types and
+attributes), so all scripts and runs of the user with the same annotation and selection reuse it. A cache file which
+cannot be read or parsed is treated as missing, and the annotation is read again. Loaded features are also kept in
+memory for further calls of the same process (the returned list must not be changed).
+"""
+
+import gc
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Pattern, TextIO
+
+from gff_index import annotation_cache_directory, load_index
+
+CACHE_VERSION: int = 2
+
+
+class Feature(NamedTuple):
+    seqid: str
+    source: str
+    type: str
+    start: int
+    end: int
+    score: str
+    strand: str
+    phase: str
+    # Selected attributes (key as requested)
+    attributes: Dict[str, str]
+    # Complete column 9
+    raw_attributes: str
+
+
+# Features loaded by this process (e.g. several scripts run by report_worker.py), by cache file
+_loaded_features: Dict[Path, List[Feature]] = {}
+
+
+def is_gtf(path: Path) -> bool:
+    return path.name.endswith('.gtf') or path.name.endswith('.gtf.gz')
+
+
+def open_annotation(path: Path) -> TextIO:
+    return gzip.open(path, 'rt') if path.name.endswith('.gz') else path.open()
+
+
+@lru_cache(maxsize=None)
+def attribute_pattern(key: str, gtf: bool, ignore_case: bool) -> Pattern:
+    """
+    Pattern of one attribute. Values may contain the separator ';' inside quotes, so the preceding attributes are
+    skipped as a whole and keys inside quoted values are not matched.
+    """
+    key_value_separator: str = r'\s+' if gtf else r'\s*=\s*'
+    return re.compile(r'^(?:(?:"[^"]*"|[^;"])*;)*?\s*{}{}((?:"[^"]*"|[^;"])*)'.format(re.escape(key), key_value_separator),
+                      re.IGNORECASE if ignore_case else 0)
+
+
+def attribute_value(attributes: str, key: str, gtf: bool = False, ignore_case: bool = False) -> Optional[str]:
+    """Value of one attribute (without surrounding whitespace) or None if missing"""
+    match = attribute_pattern(key, gtf, ignore_case).search(attributes)
+    return match.group(1).strip() if match else None
+
+
+def parse_attributes(attributes: str, gtf: bool = False) -> Dict[str, str]:
+    """All attributes of column 9"""
+    key_value_separator: str = r'\s+' if gtf else r'\s*=\s*'
+    pattern: Pattern = re.compile(r'\s*([^;=\s]+){}((?:"[^"]*"|[^;"])*)'.format(key_value_separator))
+    return {match.group(1): match.group(2).strip() for match in pattern.finditer(attributes)}
+
+
+def read_features(path: Path, feature_types: Optional[List[str]] = None, attributes: Optional[List[str]] = None,
+                  ignore_case: bool = False) -> Iterator[Feature]:
+    """
+    Features of the annotation file, optionally only of the given feature types. Only the given attributes are
+    extracted (all attributes if None). Attributes missing in a feature are missing in its attribute dictionary.
+    """
+    gtf: bool = is_gtf(path)
+    selected_types = set(feature_types) if feature_types is not None else None
+    with open_annotation(path) as annotation:
+        for line in annotation:
+            if line.startswith('#'):
+                continue
+            columns: List[str] = line.rstrip('\r\n').split('\t')
+            if len(columns) != 9 or (selected_types is not None and columns[2] not in selected_types):
+                continue
+            if attributes is None:
+                feature_attributes: Dict[str, str] = parse_attributes(columns[8], gtf)
+            else:
+                feature_attributes = {}
+                for key in attributes:
+                    value: Optional[str] = attribute_value(columns[8], key, gtf, ignore_case)
+                    if value is not None:
+                        feature_attributes[key] = value
+            yield Feature(columns[0], columns[1], columns[2], int(columns[3]), int(columns[4]), columns[5], columns[6],
+                          columns[7], feature_attributes, columns[8])
+
+
+def load_features(path: Path, feature_types: Optional[List[str]] = None, attributes: Optional[List[str]] = None,
+                  ignore_case: bool = False) -> List[Feature]:
+    """Like read_features(), but cached for each annotation and selection"""
+    selection: str = repr((CACHE_VERSION, sorted(feature_types) if feature_types is not None else None, attributes, ignore_case))
+    cache_name: str = 'features_{}_{}.json'.format(load_index(path)['sha256'][:16],
+                                                    hashlib.sha256(selection.encode()).hexdigest()[:16])
+    try:
+        cache_file: Optional[Path] = annotation_cache_directory(path) / cache_name
+    except OSError:
+        cache_file = None
+    if cache_file in _loaded_features:
+        return _loaded_features[cache_file]
+    with paused_garbage_collection():
+        features: Optional[List[Feature]] = read_cache(cache_file) if cache_file is not None else None
+        if features is not None:
+            _loaded_features[cache_file] = features
+            return features
+        features = list(read_features(path, feature_types, attributes, ignore_case))
+    if cache_file is not None:
+        write_cache(cache_file, features)
+        _loaded_features[cache_file] = features
+    return features
+
+
+def read_cache(cache_file: Path) -> Optional[List[Feature]]:
+    """Cached features or None if the cache file is missing or invalid"""
+    try:
+        with cache_file.open() as cache:
+            features: List[Feature] = [Feature._make(feature) for feature in json.load(cache)]
+        if not all(isinstance(feature.start, int) and isinstance(feature.end, int) and isinstance(feature.attributes, dict)
+                   for feature in features):
+            return None
+        return features
+    except Exception:
+        return None
+
+
+def write_cache(cache_file: Path, features: List[Feature]):
+    tmp_file: Path = cache_file.with_name('{}.{}.tmp'.format(cache_file.name, os.getpid()))
+    try:
+        with tmp_file.open('w') as cache:
+            json.dump(features, cache, separators=(',', ':'))
+        tmp_file.replace(cache_file)
+    except OSError:
+        tmp_file.unlink(missing_ok=True)
+
+
+@contextmanager
+def paused_garbage_collection():
+    """The cyclic garbage collector is not needed while creating millions of features, but slows it down"""
+    enabled: bool = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
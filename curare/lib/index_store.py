@@ -0,0 +1,293 @@
+"""
+Content-addressed store for genome indexes shared between Curare runs.
+
+Every index lives in its own directory <store>/<tool>/<key>. The key is a hash over the content of the genome
+(and any other input file), the indexing tool, its version and all settings that influence the index. Therefore,
+the same index is reused even if the genome is located somewhere else, and it is rebuilt as soon as anything
+relevant changes. Each entry contains a metadata file which is also used for a least-recently-used eviction.
+
+Several Curare runs may use the store at the same time:
+    - Indexes are built by the index rule of a run in a temporary directory, while the run holds the build lock of
+      the entry. The finished directory gets a completion marker, its files are made read-only and it is renamed
+      into the store. A run waiting for the lock uses the index of the other run instead of building it again.
+    - Entries without completion marker are ignored by "index list" and "index prune".
+    - Every Curare run holds a shared usage lock of its entries until it ends, so "index prune" skips them.
+    - Metadata, the file hash cache and the removal of entries are changed under the lock of the store.
+
+Usage:
+    index_store.py build --entry <entry> --command <command>
+    index_store.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    --entry <entry>         Store directory of the index
+    --command <command>     Shell command building the index. Paths in the entry directory are redirected into the temporary build directory
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from docopt import docopt
+from pathlib import Path
+from typing import Dict, IO, Iterator, List, Optional
+
+INDEX_STORE_ENVIRONMENT_VARIABLE: str = 'CURARE_INDEX_STORE'
+ENTRY_METADATA_FILE: str = 'curare_index.json'
+ENTRY_COMPLETE_FILE: str = 'curare_index.complete'
+STORE_LOCK_FILE: str = '.lock'
+FILE_HASHES_CACHE: str = 'file_hashes.json'
+HASH_CHUNK_SIZE: int = 16 * 1024 * 1024
+
+SIZE_UNITS: Dict[str, int] = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+@dataclass
+class IndexEntry:
+    path: Path
+    tool: str
+    tool_version: str
+    genome: str
+    parameters: Dict[str, str]
+    created: str
+    last_used: str
+    size: int
+
+
+# Usage locks of the entries used by this process. They are released when the process ends.
+_used_entries: List[IO] = []
+
+
+@contextmanager
+def locked(lock_path: Path) -> Iterator[None]:
+    """Hold an exclusive lock of the file for the duration of the context."""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open('a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def try_lock(lock_path: Path) -> Optional[IO]:
+    """Exclusive lock of the file if no other process holds a lock, otherwise None. Closing the file releases the lock."""
+    lock_file: IO = lock_path.open('a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def usage_lock_path(entry: Path) -> Path:
+    return entry.with_name('.{}.lock'.format(entry.name))
+
+
+def build_lock_path(entry: Path) -> Path:
+    return entry.with_name('.{}.build.lock'.format(entry.name))
+
+
+def is_complete(entry: Path) -> bool:
+    return (entry / ENTRY_COMPLETE_FILE).is_file()
+
+
+def get_index_store(command_line_value: Optional[str]) -> Optional[Path]:
+    """Index store from the command line, otherwise from the environment variable CURARE_INDEX_STORE."""
+    store: Optional[str] = command_line_value or os.environ.get(INDEX_STORE_ENVIRONMENT_VARIABLE)
+    return Path(store).resolve() if store else None
+
+
+def file_content_hash(store: Path, file: Path) -> str:
+    """SHA-256 of the file content. Hashes are cached in the store by path, size and modification time."""
+    file = file.resolve()
+    stat = file.stat()
+    cache_key: str = '{}:{}:{}'.format(file, stat.st_size, stat.st_mtime_ns)
+    cache_path: Path = store / FILE_HASHES_CACHE
+    cache: Dict[str, str] = json.loads(cache_path.read_text()) if cache_path.is_file() else {}
+    if cache_key in cache:
+        return cache[cache_key]
+
+    sha256 = hashlib.sha256()
+    with file.open('rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    # The cache is read again under the lock, so hashes added by other runs in the meantime are kept
+    with locked(store / STORE_LOCK_FILE):
+        cache = json.loads(cache_path.read_text()) if cache_path.is_file() else {}
+        cache[cache_key] = sha256.hexdigest()
+        write_json_atomically(cache_path, cache)
+    return cache[cache_key]
+
+
+def index_key(genome_hash: str, tool: str, tool_version: str, parameters: Dict[str, str]) -> str:
+    description: str = json.dumps({'genome': genome_hash, 'tool': tool, 'tool_version': tool_version, 'parameters': parameters},
+                                  sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()[:32]
+
+
+def resolve_index(store: Path, genome: Path, tool: str, tool_version: str, parameters: Dict[str, str],
+                  parameter_files: Dict[str, str] = None) -> Path:
+    """Return the store directory of an index, mark it as used and hold its usage lock until the process ends.
+
+    Files in parameter_files (e.g. annotations) are part of the key by their content, not by their path.
+    The directory of an index which is not built yet only contains the metadata.
+    """
+    key_parameters: Dict[str, str] = dict(parameters)
+    for name, file in (parameter_files or {}).items():
+        key_parameters[name] = 'sha256:' + file_content_hash(store, Path(file)) if file else ''
+    genome_hash: str = file_content_hash(store, genome)
+    entry: Path = store / tool / index_key(genome_hash, tool, tool_version, key_parameters)
+    entry.parent.mkdir(parents=True, exist_ok=True)
+
+    # An index which is built by another run right now is used as soon as it is complete
+    build_lock: Optional[IO] = try_lock(build_lock_path(entry))
+    if build_lock is None:
+        print('Waiting for the genome index built by another Curare run: {}'.format(entry), file=sys.stderr)
+        with locked(build_lock_path(entry)):
+            pass
+    else:
+        build_lock.close()
+
+    with locked(store / STORE_LOCK_FILE):
+        usage_lock: IO = usage_lock_path(entry).open('a')
+        fcntl.flock(usage_lock, fcntl.LOCK_SH)
+        _used_entries.append(usage_lock)
+        entry.mkdir(exist_ok=True)
+        metadata_path: Path = entry / ENTRY_METADATA_FILE
+        now: str = datetime.now().isoformat(timespec='seconds')
+        if metadata_path.is_file():
+            metadata: Dict = json.loads(metadata_path.read_text())
+        else:
+            metadata = {'tool': tool, 'tool_version': tool_version, 'genome': str(genome), 'genome_sha256': genome_hash,
+                        'parameters': key_parameters, 'created': now}
+        metadata['last_used'] = now
+        write_json_atomically(metadata_path, metadata)
+    return entry
+
+
+def build_index(entry: Path, command: str) -> int:
+    """Run the index command of a Snakemake rule in a temporary directory and move the result into the store.
+
+    Returns the exit code of the command. If another run completed the index in the meantime, nothing is built.
+    """
+    store: Path = entry.parent.parent
+    with locked(build_lock_path(entry)):
+        if is_complete(entry):
+            print('Genome index was built by another Curare run: {}'.format(entry), file=sys.stderr)
+            return 0
+        build_dir: Path = entry.with_name('.{}.{}.tmp'.format(entry.name, os.getpid()))
+        shutil.rmtree(str(build_dir), ignore_errors=True)
+        build_dir.mkdir(parents=True)
+        # Same shell options as Snakemake, so a failing index tool is not hidden by "| tee {log}"
+        build = subprocess.run(['bash', '-euo', 'pipefail', '-c', command.replace(str(entry), str(build_dir))])
+        if build.returncode != 0:
+            shutil.rmtree(str(build_dir), ignore_errors=True)
+            return build.returncode
+        # Read-only files are neither changed by other runs nor removed by Snakemake before rerunning a rule
+        for file in build_dir.rglob('*'):
+            if file.is_file():
+                file.chmod(file.stat().st_mode & ~0o222)
+
+        with locked(store / STORE_LOCK_FILE):
+            metadata_path: Path = entry / ENTRY_METADATA_FILE
+            if metadata_path.is_file():
+                shutil.copyfile(str(metadata_path), str(build_dir / ENTRY_METADATA_FILE))
+            (build_dir / ENTRY_COMPLETE_FILE).touch()
+            if entry.exists():
+                shutil.rmtree(str(entry))
+            build_dir.rename(entry)
+    return 0
+
+
+def list_indexes(store: Path) -> List[IndexEntry]:
+    entries: List[IndexEntry] = []
+    if not store.is_dir():
+        return entries
+    for metadata_path in sorted(store.glob('*/*/' + ENTRY_METADATA_FILE)):
+        if not is_complete(metadata_path.parent):
+            continue
+        metadata: Dict = json.loads(metadata_path.read_text())
+        entries.append(IndexEntry(
+            path=metadata_path.parent,
+            tool=metadata['tool'],
+            tool_version=metadata['tool_version'],
+            genome=metadata['genome'],
+            parameters=metadata['parameters'],
+            created=metadata['created'],
+            last_used=metadata['last_used'],
+            size=directory_size(metadata_path.parent)
+        ))
+    return entries
+
+
+def prune(store: Path, max_size: int, dry_run: bool = False) -> List[IndexEntry]:
+    """Remove least recently used indexes until the store is not larger than max_size bytes.
+
+    Indexes used by a running Curare run are kept.
+    """
+    if not store.is_dir():
+        return []
+    removed: List[IndexEntry] = []
+    with locked(store / STORE_LOCK_FILE):
+        entries: List[IndexEntry] = sorted(list_indexes(store), key=lambda entry: entry.last_used)
+        total_size: int = sum(entry.size for entry in entries)
+        for entry in entries:
+            if total_size <= max_size:
+                break
+            usage_lock: Optional[IO] = try_lock(usage_lock_path(entry.path))
+            if usage_lock is None:
+                continue
+            with usage_lock:
+                if not dry_run:
+                    shutil.rmtree(str(entry.path))
+                    usage_lock_path(entry.path).unlink()
+            total_size -= entry.size
+            removed.append(entry)
+    return removed
+
+
+def directory_size(directory: Path) -> int:
+    return sum(file.stat().st_size for file in directory.rglob('*') if file.is_file() and not file.is_symlink())
+
+
+def parse_size(size: str) -> int:
+    """Convert sizes like "500G" or "1.5T" into bytes."""
+    size = size.strip().upper().rstrip('B')
+    unit: str = size[-1] if size and size[-1] in SIZE_UNITS else ''
+    try:
+        return int(float(size[:len(size) - len(unit)]) * SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError('Invalid size "{}". Examples of valid sizes: 800M, 50G, 1.5T'.format(size))
+
+
+def format_size(size: int) -> str:
+    for unit in ('', 'K', 'M', 'G'):
+        if size < 1024:
+            return '{:.1f}{}'.format(size, unit) if unit else '{}B'.format(size)
+        size /= 1024
+    return '{:.1f}T'.format(size)
+
+
+def write_json_atomically(path: Path, content: Dict):
+    # Several Curare runs may use the same store at the same time.
+    tmp_path: Path = path.with_name('{}.{}.tmp'.format(path.name, os.getpid()))
+    with tmp_path.open('w') as f:
+        json.dump(content, f, indent=2)
+    tmp_path.replace(path)
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    sys.exit(build_index(Path(args['--entry']), args['--command']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Merge the statistics of chunked mappings (see pipeline setting "chunk_reads") into one file per sample.
+
+The format is detected from the content of the first file:
+    samtools flagstat   all counts are summed up, percentages are recalculated
+    bowtie2 summary     all counts are summed up, percentages are recalculated relative to their parent line
+    bowtie summary      all counts are summed up, percentages are recalculated relative to the processed reads
+    segemehl summary    all counts of the "all" and "pair" lines are summed up, percentages are recalculated
+Other files (e.g. plain aligner logs) are concatenated.
+
+Usage:
+    merge_chunk_statistics.py --output <file> <chunk_file>...
+    merge_chunk_statistics.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    -o <file> --output <file>       Merged statistics file
+"""
+
+import re
+
+from docopt import docopt
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+FLAGSTAT_LINE = re.compile(r'^(\d+) \+ (\d+) (.+?)(?: \((.+) : (.+)\))?$')
+# Percentages of flagstat lines relative to other lines
+FLAGSTAT_DENOMINATORS: Dict[str, str] = {
+    'mapped': 'in total (QC-passed reads + QC-failed reads)',
+    'primary mapped': 'primary',
+    'properly paired': 'paired in sequencing',
+    'singletons': 'paired in sequencing'
+}
+BOWTIE2_COUNT_LINE = re.compile(r'^(\s*)(\d+)( \([\d.]+%\))?(.*)$')
+BOWTIE2_OVERALL_RATE_LINE = re.compile(r'^([\d.]+)% overall alignment rate$')
+BOWTIE_COUNT_LINE = re.compile(r'^(# [^:]+: |Reported )(\d+)( \([\d.]+%\))?(.*)$')
+SEGEMEHL_LABELS: Tuple[str, str] = ('all', 'pair')
+
+
+def percentage(count: int, total: int) -> float:
+    return count / total * 100 if total else 0.0
+
+
+def merge_flagstat(chunks: List[List[str]]) -> List[str]:
+    descriptions: List[str] = []
+    qc_passed: Dict[str, int] = {}
+    qc_failed: Dict[str, int] = {}
+    for chunk in chunks:
+        for line in chunk:
+            match = FLAGSTAT_LINE.match(line)
+            if not match:
+                continue
+            description = match.group(3)
+            if description not in qc_passed:
+                descriptions.append(description)
+                qc_passed[description] = qc_failed[description] = 0
+            qc_passed[description] += int(match.group(1))
+            qc_failed[description] += int(match.group(2))
+
+    merged: List[str] = []
+    for description in descriptions:
+        line = '{} + {} {}'.format(qc_passed[description], qc_failed[description], description)
+        denominator = FLAGSTAT_DENOMINATORS.get(description)
+        if denominator in qc_passed:
+            line += ' ({} : {})'.format(format_flagstat_percentage(qc_passed[description], qc_passed[denominator]),
+                                        format_flagstat_percentage(qc_failed[description], qc_failed[denominator]))
+        merged.append(line)
+    return merged
+
+
+def format_flagstat_percentage(count: int, total: int) -> str:
+    return '{:.2f}%'.format(percentage(count, total)) if total else 'N/A'
+
+
+def merge_bowtie2(chunks: List[List[str]]) -> List[str]:
+    summaries: List[List[str]] = [bowtie2_summary(chunk) for chunk in chunks]
+    counts: List[int] = [0] * len(summaries[0])
+    reads: List[int] = []
+    weighted_overall_rate: float = 0.0
+    for summary in summaries:
+        if len(summary) != len(counts):
+            raise ValueError('bowtie2 summaries of the chunks differ in their structure')
+        for i, line in enumerate(summary):
+            match = BOWTIE2_COUNT_LINE.match(line)
+            if match and not BOWTIE2_OVERALL_RATE_LINE.match(line):
+                counts[i] += int(match.group(2))
+        chunk_reads = int(BOWTIE2_COUNT_LINE.match(summary[0]).group(2))
+        reads.append(chunk_reads)
+        overall_rate = BOWTIE2_OVERALL_RATE_LINE.match(summary[-1])
+        if overall_rate:
+            weighted_overall_rate += float(overall_rate.group(1)) * chunk_reads
+
+    merged: List[str] = []
+    # (indentation, count) of all parent lines
+    parents: List[Tuple[int, int]] = []
+    for i, line in enumerate(summaries[0]):
+        match = BOWTIE2_COUNT_LINE.match(line)
+        if BOWTIE2_OVERALL_RATE_LINE.match(line):
+            merged.append('{:.2f}% overall alignment rate'.format(weighted_overall_rate / sum(reads) if sum(reads) else 0.0))
+        elif match:
+            indentation = len(match.group(1))
+            while parents and parents[-1][0] >= indentation:
+                parents.pop()
+            relative = ' ({:.2f}%)'.format(percentage(counts[i], parents[-1][1] if parents else counts[i])) if match.group(3) else ''
+            merged.append('{}{}{}{}'.format(match.group(1), counts[i], relative, match.group(4)))
+            parents.append((indentation, counts[i]))
+        else:
+            merged.append(line)
+    return merged
+
+
+def bowtie2_summary(lines: List[str]) -> List[str]:
+    """Alignment summary without warnings, which may differ between chunks."""
+    start: int = next(i for i, line in enumerate(lines) if re.match(r'^\d+ reads; of these:$', line))
+    end: int = next(i for i, line in enumerate(lines) if BOWTIE2_OVERALL_RATE_LINE.match(line))
+    return lines[start:end + 1]
+
+
+def merge_bowtie(chunks: List[List[str]]) -> List[str]:
+    counts: Dict[str, int] = {}
+    for chunk in chunks:
+        for line in chunk:
+            match = BOWTIE_COUNT_LINE.match(line)
+            if match:
+                key = match.group(1) + match.group(4)
+                counts[key] = counts.get(key, 0) + int(match.group(2))
+
+    merged: List[str] = []
+    processed_reads: int = 0
+    for line in chunks[0]:
+        match = BOWTIE_COUNT_LINE.match(line)
+        if not match:
+            merged.append(line)
+            continue
+        count = counts[match.group(1) + match.group(4)]
+        if match.group(1) == '# reads processed: ':
+            processed_reads = count
+        relative = ' ({:.2f}%)'.format(percentage(count, processed_reads)) if match.group(3) else ''
+        merged.append('{}{}{}{}'.format(match.group(1), count, relative, match.group(4)))
+    return merged
+
+
+def merge_segemehl(chunks: List[List[str]]) -> List[str]:
+    counts: Dict[str, List[int]] = {}
+    for chunk in chunks:
+        for line in chunk:
+            fields = line.split('\t')
+            if fields[0] in SEGEMEHL_LABELS:
+                # total, followed by pairs of count and percentage
+                values = [int(fields[1])] + [int(count) for count in fields[2::2]]
+                counts[fields[0]] = [a + b for a, b in zip(counts[fields[0]], values)] if fields[0] in counts else values
+
+    merged: List[str] = []
+    for line in chunks[0]:
+        fields = line.split('\t')
+        if fields[0] not in SEGEMEHL_LABELS:
+            merged.append(line)
+            continue
+        total, *values = counts[fields[0]]
+        merged_fields = [fields[0], str(total)]
+        for value, original_percentage in zip(values, fields[3::2]):
+            merged_fields.extend([str(value), '{:.2f}{}'.format(percentage(value, total), '%' if original_percentage.endswith('%') else '')])
+        merged.append('\t'.join(merged_fields))
+    return merged
+
+
+def detect_format(lines: List[str]) -> Optional[str]:
+    if any(FLAGSTAT_LINE.match(line) and 'in total' in line for line in lines):
+        return 'flagstat'
+    if any(BOWTIE2_OVERALL_RATE_LINE.match(line) for line in lines):
+        return 'bowtie2'
+    if any(line.startswith('# reads processed: ') for line in lines):
+        return 'bowtie'
+    if any(line.split('\t')[0] in SEGEMEHL_LABELS for line in lines):
+        return 'segemehl'
+    return None
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    chunks: List[List[str]] = [Path(file).read_text().splitlines() for file in args['<chunk_file>']]
+    mergers = {'flagstat': merge_flagstat, 'bowtie2': merge_bowtie2, 'bowtie': merge_bowtie, 'segemehl': merge_segemehl}
+    statistics_format: Optional[str] = detect_format(chunks[0])
+    if statistics_format is None:
+        merged: List[str] = [line for chunk in chunks for line in chunk]
+    else:
+        merged = mergers[statistics_format](chunks)
+    with open(args['--output'], 'w') as output_file:
+        output_file.writelines(line + '\n' for line in merged)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Merge featureCounts tables of single samples into one count table with the same layout as a featureCounts run on all
+samples (<counts> and <counts>.summary). All tables must be created with the same annotation and options.
+
+The tables are streamed line by line, so only one line of each sample is in memory at the same time.
+
+Usage:
+    merge_feature_counts.py --output <counts> <sample_counts>...
+    merge_feature_counts.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    -o <counts> --output <counts>           Merged count table. The merged summary is written to <counts>.summary
+"""
+
+from contextlib import ExitStack
+from docopt import docopt
+from pathlib import Path
+from typing import List, TextIO
+
+# Geneid, Chr, Start, End, Strand, Length
+ANNOTATION_COLUMNS: int = 6
+
+
+def merge_count_tables(sample_tables: List[Path], output: Path):
+    with ExitStack() as stack:
+        inputs: List[TextIO] = [stack.enter_context(table.open()) for table in sample_tables]
+        output_file: TextIO = stack.enter_context(output.open('w'))
+
+        program_lines: List[str] = [next(file).rstrip('\n') for file in inputs]
+        output_file.write('{}; Command: merged from {} per-sample count tables\n'.format(program_lines[0].split(';')[0], len(inputs)))
+        for line_number, lines in enumerate(zip(*inputs), start=2):
+            columns: List[List[str]] = [line.rstrip('\n').split('\t') for line in lines]
+            annotation: List[str] = columns[0][:ANNOTATION_COLUMNS]
+            for table, sample_columns in zip(sample_tables, columns):
+                if sample_columns[:ANNOTATION_COLUMNS] != annotation:
+                    raise ValueError('{} differs from {} in line {}. All tables must use the same annotation.'.format(table, sample_tables[0], line_number))
+            output_file.write('\t'.join(annotation + [value for sample_columns in columns for value in sample_columns[ANNOTATION_COLUMNS:]]) + '\n')
+        if any(next(file, None) is not None for file in inputs):
+            raise ValueError('Count tables differ in their number of features')
+
+
+def merge_summaries(sample_summaries: List[Path], output: Path):
+    with ExitStack() as stack:
+        inputs: List[TextIO] = [stack.enter_context(summary.open()) for summary in sample_summaries]
+        output_file: TextIO = stack.enter_context(output.open('w'))
+        for lines in zip(*inputs):
+            columns: List[List[str]] = [line.rstrip('\n').split('\t') for line in lines]
+            if any(sample_columns[0] != columns[0][0] for sample_columns in columns):
+                raise ValueError('Summaries differ in their status categories')
+            output_file.write('\t'.join([columns[0][0]] + [value for sample_columns in columns for value in sample_columns[1:]]) + '\n')
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    sample_tables: List[Path] = [Path(table) for table in args['<sample_counts>']]
+    output: Path = Path(args['--output'])
+    merge_count_tables(sample_tables, output)
+    merge_summaries([table.with_name(table.name + '.summary') for table in sample_tables], output.with_name(output.name + '.summary'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Bar charts (SVG) of the module scripts, drawn with pandas into one reused figure per process.
+
+DataFrame.plot() without an axes creates a new pyplot figure for every chart, which is kept until it is closed, so the
+memory grows with the number of charts. Here, every process draws all of its charts into the same figure and axes,
+which are cleared between the charts and freed at the end. The figure is not registered in pyplot. Charts are rendered
+in a process pool (threads > 1), or all together as small multiples in one SVG file (render_small_multiples).
+
+Example:
+    charts = [BarChart(data_frame, output_dir / 'sample.svg', ylabel='# Assigned Reads', log=True, legend=False)]
+    render_bar_charts(charts, threads=4)
+"""
+
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import matplotlib
+matplotlib.use('Agg')
+matplotlib.rcParams.update({'figure.autolayout': True})
+import pandas as pd
+
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+
+# Size of a single chart (inches) in the small multiples
+SMALL_MULTIPLE_SIZE: List[float] = [4.0, 3.0]
+
+# Figure and axes of the current process (see reused_axes)
+_figure: Optional[Figure] = None
+_axes: Optional[Axes] = None
+
+
+class BarChart:
+    def __init__(self, data: pd.DataFrame, output: Path, ylabel: str = '', xlabel: str = '', title: str = '',
+                 legend_options: Optional[Dict[str, Any]] = None, **plot_options: Any):
+        """
+        Bar chart of the columns of data (x: index or column plot_options['x']). plot_options are passed to
+        DataFrame.plot.bar (e.g. stacked, log, color, colormap, legend), legend_options to Axes.legend.
+        """
+        self.data: pd.DataFrame = data
+        self.output: Path = output
+        self.ylabel: str = ylabel
+        self.xlabel: str = xlabel
+        self.title: str = title
+        self.legend_options: Optional[Dict[str, Any]] = legend_options
+        self.plot_options: Dict[str, Any] = plot_options
+
+    def draw(self, axes: Axes):
+        self.data.plot.bar(ax=axes, **self.plot_options)
+        if self.legend_options is not None:
+            axes.legend(**self.legend_options)
+        axes.set_xlabel(self.xlabel)
+        axes.set_ylabel(self.ylabel)
+        if self.title:
+            axes.set_title(self.title)
+
+
+def reused_axes() -> Axes:
+    """Empty axes of the figure of the current process (created once)"""
+    global _figure, _axes
+    if _figure is None:
+        _figure = Figure()
+        _axes = _figure.add_subplot()
+    else:
+        _axes.clear()
+    return _axes
+
+
+def free_figure():
+    global _figure, _axes
+    if _figure is not None:
+        _figure.clear()
+    _figure = None
+    _axes = None
+
+
+def render_chunk(charts: List[BarChart]):
+    try:
+        for chart in charts:
+            axes: Axes = reused_axes()
+            chart.draw(axes)
+            axes.figure.savefig(str(chart.output))
+    finally:
+        free_figure()
+
+
+def render_bar_charts(charts: List[BarChart], threads: int = 1):
+    """Write each chart into its SVG file, in threads processes"""
+    if threads <= 1 or len(charts) <= 1:
+        render_chunk(charts)
+        return
+    processes: int = min(threads, len(charts))
+    with Pool(processes) as pool:
+        # one chunk per process, so each process uses a single figure
+        pool.map(render_chunk, [charts[i::processes] for i in range(processes)], chunksize=1)
+
+
+def render_small_multiples(charts: List[BarChart], output: Path, columns: int = 4):
+    """Write all charts into one SVG file as a grid of charts (titles: chart titles or their file names)"""
+    if not charts:
+        return
+    columns = max(1, min(columns, len(charts)))
+    rows: int = -(-len(charts) // columns)
+    figure: Figure = Figure(figsize=(SMALL_MULTIPLE_SIZE[0] * columns, SMALL_MULTIPLE_SIZE[1] * rows))
+    try:
+        all_axes = figure.subplots(rows, columns, squeeze=False).flatten()
+        for chart, axes in zip(charts, all_axes):
+            chart.draw(axes)
+            if not chart.title:
+                axes.set_title(chart.output.stem)
+        for axes in all_axes[len(charts):]:
+            axes.set_visible(False)
+        figure.savefig(str(output))
+    finally:
+        figure.clear()
@@ -0,0 +1,37 @@
+"""
+Report data of the modules (.report/data) as compact JavaScript files.
+
+Report pages are often opened from the file system (file://), where browsers do not allow fetch() of JSON files, so the
+data is written as JavaScript without indentation. Large arrays (e.g. the featureCounts statistics of all samples or
+the fold change distributions of all comparisons) are split into chunk files of chunk_rows rows, which the page loads
+when they are shown (Curare.loadRows and Curare.loadRow of js/data_loader.js). The module data only contains their index:
+    {"files": [<chunk file relative to .report/data>, ...], "rows": <number of rows>, "chunk_rows": <rows per chunk>}
+"""
+
+import json
+
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'))
+
+
+def write_data_js(output: Path, name: str, data: Dict[str, Any]):
+    """Module data as window.Curare.<name>"""
+    with output.open('w') as f:
+        f.write('window.Curare.{} = {};\n'.format(name, compact_json(data)))
+
+
+def write_chunks(rows: List[Any], data_dir: Path, chunk_dir: Path, name: str, chunk_rows: int) -> Dict[str, Any]:
+    """Write rows into chunk files <chunk_dir>/<name>_<number>.js and return their index"""
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+    files: List[str] = []
+    for number, start in enumerate(range(0, len(rows), chunk_rows)):
+        chunk: Path = chunk_dir / '{}_{}.js'.format(name, number)
+        file: str = chunk.resolve().relative_to(data_dir.resolve()).as_posix()
+        with chunk.open('w') as f:
+            f.write('Curare.addChunk({},{});\n'.format(compact_json(file), compact_json(rows[start:start + chunk_rows])))
+        files.append(file)
+    return {'files': files, 'rows': len(rows), 'chunk_rows': chunk_rows}
@@ -0,0 +1,107 @@
+"""
+Run the conversion scripts of a batch manifest in one Python interpreter (used for the XLSX summaries of all conditions
+of the DGE modules).
+
+Every module script started with "python3 <script>" imports pandas, xlsxwriter, matplotlib, etc. again, and on cluster
+runs each of these jobs also activates the conda environment again. Here, the scripts of a batch manifest are executed
+one after another in the same interpreter, like "python3 <script> <args>" (as __main__, with sys.argv set), so imported
+modules and in-memory caches are shared between them. sys.argv and sys.path are restored and open pyplot figures are
+closed after each script. All scripts are run, failed scripts (exception or non-zero exit code) are reported at the end.
+
+Manifest (JSON): {"tasks": [[<script>, <arg>, ...], ...]}, e.g. written in a Snakemake run block with write_manifest().
+
+Usage:
+    report_worker.py --manifest <manifest>
+    report_worker.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    -m <manifest> --manifest <manifest>         JSON file with the scripts and their arguments
+"""
+
+import json
+import runpy
+import sys
+import time
+import traceback
+
+from docopt import docopt
+from pathlib import Path
+from typing import List, Union
+
+
+def write_manifest(manifest: Union[str, Path], tasks: List[List[str]]):
+    with open(str(manifest), 'w') as manifest_file:
+        json.dump({'tasks': [[str(value) for value in task] for task in tasks]}, manifest_file, indent=2)
+
+
+def read_manifest(manifest: Path) -> List[List[str]]:
+    with manifest.open() as manifest_file:
+        return json.load(manifest_file)['tasks']
+
+
+def exit_code(code) -> int:
+    """Exit code of sys.exit(code) (messages are printed by the script, see SystemExit)"""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def close_figures():
+    pyplot = sys.modules.get('matplotlib.pyplot')
+    if pyplot is not None:
+        pyplot.close('all')
+
+
+def run_task(task: List[str]) -> int:
+    """Run one script like "python3 <script> <args>" and return its exit code"""
+    script: str = task[0]
+    argv: List[str] = list(sys.argv)
+    path: List[str] = list(sys.path)
+    sys.argv = list(task)
+    # the directory of the script is the first entry of sys.path (like for python3 <script>)
+    sys.path.insert(0, str(Path(script).resolve().parent))
+    try:
+        runpy.run_path(script, run_name='__main__')
+        return 0
+    except SystemExit as e:
+        return exit_code(e.code)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.argv = argv
+        sys.path[:] = path
+        close_figures()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+
+def run_tasks(tasks: List[List[str]]) -> int:
+    failed: List[str] = []
+    for task in tasks:
+        start: float = time.time()
+        code: int = run_task(task)
+        print('[{}] {} ({:.1f}s)'.format('ok' if code == 0 else 'exit code {}'.format(code), ' '.join(task), time.time() - start))
+        if code != 0:
+            failed.append(' '.join(task))
+    if failed:
+        print('{} of {} scripts failed:'.format(len(failed), len(tasks)), file=sys.stderr)
+        for task in failed:
+            print('\t- {}'.format(task), file=sys.stderr)
+        return 1
+    return 0
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    sys.exit(run_tasks(read_manifest(Path(args['--manifest']))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Resource estimation of Curare runs before launching Snakemake (curare --plan).
+
+The number of jobs is taken from a Snakemake dry run. CPU-hours and disk usage are estimated from the size of the
+input FASTQ files and throughput coefficients per module. Default coefficients are shipped with Curare
+(snakefiles/misc/calibration.yaml) and replaced by values measured in previous runs: after each run, the wall time
+of all jobs (from the Snakemake metadata in .snakemake/metadata) multiplied by the threads of their rules and the
+size of the module results are stored in the calibration file.
+
+The CPU time of a module is estimated as a fixed part plus a part per GB of input, fitted by least squares over the
+calibration runs with at least MIN_CALIBRATION_INPUT_GB of input (smaller runs are dominated by one-off work). Rules
+which run once per reference (reference_rules of the module YAML file, e.g. genome index builds) are measured
+separately and estimated per planned job, so a run which built an index does not raise the rate per GB.
+"""
+
+import json
+import os
+import yaml
+
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+CALIBRATION_ENVIRONMENT_VARIABLE: str = 'CURARE_CALIBRATION'
+DEFAULT_CALIBRATION_FILE: Path = Path.home() / '.config' / 'curare' / 'calibration.yaml'
+MAX_CALIBRATION_RUNS: int = 50
+# Runs with less input are not used to calibrate the CPU time per GB and the result sizes
+MIN_CALIBRATION_INPUT_GB: float = 0.1
+# Uncompressed FASTQ files are counted with their approximate gzip-compressed size
+GZIP_RATIO: float = 4.0
+GB: int = 1024 ** 3
+# Coefficients of modules without an entry in the calibration file
+DEFAULT_COEFFICIENTS: str = 'default'
+
+
+@dataclass
+class PlannedModule:
+    name: str
+    rule_prefix: str
+    directory: Path
+    threads: Dict[str, int] = field(default_factory=dict)
+    mem_mb: Dict[str, int] = field(default_factory=dict)
+    # Rules which run once per reference, independent of the input size
+    reference_rules: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Coefficients:
+    cpu_seconds_per_gb: float
+    final_disk_factor: float
+    intermediate_disk_factor: float
+    memory_mb: int
+    cpu_seconds_fixed: float = 0.0
+    cpu_seconds_per_reference_job: float = 0.0
+    measured: bool = False
+
+
+@dataclass
+class ModuleEstimate:
+    name: str
+    jobs: int
+    cpu_hours: float
+    peak_memory_mb: int
+    final_gb: float
+    intermediate_gb: float
+    measured: bool
+
+
+def get_calibration_file(command_line_value: Optional[str]) -> Path:
+    """Calibration file from the command line, the environment variable CURARE_CALIBRATION or the default location."""
+    calibration_file: Optional[str] = command_line_value or os.environ.get(CALIBRATION_ENVIRONMENT_VARIABLE)
+    return Path(calibration_file).resolve() if calibration_file else DEFAULT_CALIBRATION_FILE
+
+
+def input_size_gb(samples: Dict[str, Dict[str, Dict[str, str]]]) -> float:
+    size: float = 0.0
+    for modules in samples.values():
+        for columns in modules.values():
+            for column in ['reads', 'forward_reads', 'reverse_reads']:
+                if column in columns and Path(columns[column]).is_file():
+                    file_size = Path(columns[column]).stat().st_size
+                    size += file_size if columns[column].endswith('.gz') else file_size / GZIP_RATIO
+    return size / GB
+
+
+def load_coefficients(default_calibration: Path, calibration_file: Path) -> Dict[str, Coefficients]:
+    """Default coefficients of all modules, CPU time and result sizes replaced by measurements of previous runs."""
+    defaults = yaml.safe_load(default_calibration.read_text())
+    coefficients: Dict[str, Coefficients] = {}
+    for module_name, module_defaults in dict(defaults['modules'], **{DEFAULT_COEFFICIENTS: {}}).items():
+        values = dict(defaults['default'], **(module_defaults or {}))
+        coefficients[module_name] = Coefficients(values['cpu_seconds_per_gb'], values['final_disk_factor'],
+                                                 values['intermediate_disk_factor'], values['memory_mb'],
+                                                 values['cpu_seconds_fixed'], values['cpu_seconds_per_reference_job'])
+
+    # (input GB, statistics) of all runs per module
+    measurements: Dict[str, List[Tuple[float, Dict[str, float]]]] = {}
+    for run in load_calibration(calibration_file).values():
+        for module_name, statistics in run['modules'].items():
+            measurements.setdefault(module_name, []).append((run['input_gb'], statistics))
+    for module_name, runs in measurements.items():
+        default = coefficients.get(module_name, coefficients[DEFAULT_COEFFICIENTS])
+        module_coefficients: Coefficients = replace(default)
+        reference_jobs: float = sum(statistics.get('reference_jobs', 0) for _, statistics in runs)
+        if reference_jobs > 0:
+            module_coefficients.cpu_seconds_per_reference_job = sum(statistics.get('reference_cpu_seconds', 0.0) for _, statistics in runs) / reference_jobs
+            module_coefficients.measured = True
+        calibration_runs = [(input_gb, statistics) for input_gb, statistics in runs if input_gb >= MIN_CALIBRATION_INPUT_GB]
+        if calibration_runs:
+            module_coefficients.cpu_seconds_fixed, module_coefficients.cpu_seconds_per_gb = \
+                fit_line([input_gb for input_gb, _ in calibration_runs], [statistics['cpu_seconds'] for _, statistics in calibration_runs])
+            module_coefficients.final_disk_factor = sum(statistics['final_gb'] for _, statistics in calibration_runs) / \
+                sum(input_gb for input_gb, _ in calibration_runs)
+            module_coefficients.measured = True
+        coefficients[module_name] = module_coefficients
+    return coefficients
+
+
+def fit_line(x: List[float], y: List[float]) -> Tuple[float, float]:
+    """
+    Non-negative intercept and slope of the least squares line through the points. With a single input size, the line
+    goes through the origin.
+    """
+    mean_x: float = sum(x) / len(x)
+    mean_y: float = sum(y) / len(y)
+    variance: float = sum((value - mean_x) ** 2 for value in x)
+    if variance <= 1e-12 * mean_x ** 2:
+        return 0.0, sum(y) / sum(x)
+    slope: float = sum((x_value - mean_x) * (y_value - mean_y) for x_value, y_value in zip(x, y)) / variance
+    intercept: float = mean_y - slope * mean_x
+    if slope < 0:
+        return mean_y, 0.0
+    if intercept < 0:
+        return 0.0, sum(y) / sum(x)
+    return intercept, slope
+
+
+def parse_job_counts(dry_run_output: str) -> Dict[str, int]:
+    """Job counts per rule of the "Job stats" table of a Snakemake dry run."""
+    job_counts: Dict[str, int] = {}
+    lines: List[str] = dry_run_output.splitlines()
+    if 'Job stats:' not in lines:
+        return job_counts
+    for line in lines[lines.index('Job stats:') + 3:]:
+        fields: List[str] = line.split()
+        if len(fields) < 2 or not fields[1].isdigit() or fields[0] == 'total':
+            break
+        job_counts[fields[0]] = int(fields[1])
+    return job_counts
+
+
+def estimate(modules: List[PlannedModule], job_counts: Dict[str, int], input_gb: float, coefficients: Dict[str, Coefficients],
+             cores: Optional[int], mem_mb: Optional[int]) -> List[ModuleEstimate]:
+    estimates: List[ModuleEstimate] = []
+    for module in modules:
+        module_coefficients = coefficients.get(module.name, coefficients[DEFAULT_COEFFICIENTS])
+        rule_counts = {rule_name[len(module.rule_prefix) + 2:]: count for rule_name, count in job_counts.items()
+                       if rule_name.startswith(module.rule_prefix + '__')}
+        peak_memory_mb: int = 0
+        for rule_name, count in rule_counts.items():
+            threads = module.threads.get(rule_name, 1)
+            parallel_jobs = max(1, min(count, cores // threads if cores else count))
+            rule_memory = parallel_jobs * module.mem_mb.get(rule_name, module_coefficients.memory_mb)
+            peak_memory_mb = max(peak_memory_mb, min(rule_memory, mem_mb) if mem_mb else rule_memory)
+        reference_jobs: int = sum(count for rule_name, count in rule_counts.items() if rule_name in module.reference_rules)
+        cpu_seconds: float = (module_coefficients.cpu_seconds_fixed + input_gb * module_coefficients.cpu_seconds_per_gb
+                              + reference_jobs * module_coefficients.cpu_seconds_per_reference_job)
+        estimates.append(ModuleEstimate(module.name, sum(rule_counts.values()), cpu_seconds / 3600, peak_memory_mb,
+                                        input_gb * module_coefficients.final_disk_factor,
+                                        input_gb * module_coefficients.intermediate_disk_factor,
+                                        module_coefficients.measured))
+    return estimates
+
+
+def format_plan(estimates: List[ModuleEstimate], job_counts: Dict[str, int], input_gb: float) -> List[str]:
+    lines: List[str] = ['Input: {:.2f} GB (gzip-compressed FASTQ)'.format(input_gb), '',
+                        '{:<24}{:>8}{:>12}{:>16}{:>14}{:>18}  {}'.format('module', 'jobs', 'CPU-hours', 'peak memory', 'results', 'temporary files', 'coefficients')]
+    for module_estimate in estimates:
+        lines.append('{:<24}{:>8}{:>12.1f}{:>16}{:>14}{:>18}  {}'.format(
+            module_estimate.name, module_estimate.jobs, module_estimate.cpu_hours, format_mb(module_estimate.peak_memory_mb),
+            format_gb(module_estimate.final_gb), format_gb(module_estimate.intermediate_gb),
+            'measured' if module_estimate.measured else 'default'))
+    final_gb = sum(module_estimate.final_gb for module_estimate in estimates)
+    intermediate_gb = max([module_estimate.intermediate_gb for module_estimate in estimates], default=0.0)
+    lines.append('{:<24}{:>8}{:>12.1f}{:>16}{:>14}{:>18}'.format(
+        'total', sum(job_counts.values()), sum(module_estimate.cpu_hours for module_estimate in estimates),
+        format_mb(max([module_estimate.peak_memory_mb for module_estimate in estimates], default=0)),
+        format_gb(final_gb), format_gb(intermediate_gb)))
+    peak_gb, peak_module = peak_disk_usage(estimates)
+    lines.extend(['', 'Peak disk usage: {} (results of all modules up to {} and its temporary files)'.format(format_gb(peak_gb), peak_module)])
+    if any(rule_name.startswith('chunked_mapping__') for rule_name in job_counts):
+        lines.append('Jobs after checkpoints (chunked mapping) are not included in the job counts.')
+    return lines
+
+
+def peak_disk_usage(estimates: List[ModuleEstimate]) -> Tuple[float, str]:
+    """Largest disk usage while a module runs and the name of this module.
+
+    Modules run in pipeline order. While a module runs, the results of all previous modules are kept and its own
+    temporary files exist in addition to its results.
+    """
+    peak_gb: float = 0.0
+    peak_module: str = ''
+    results_gb: float = 0.0
+    for module_estimate in estimates:
+        results_gb += module_estimate.final_gb
+        if results_gb + module_estimate.intermediate_gb > peak_gb or not peak_module:
+            peak_gb = results_gb + module_estimate.intermediate_gb
+            peak_module = module_estimate.name
+    return peak_gb, peak_module
+
+
+def format_mb(size_mb: int) -> str:
+    return '{:.1f} GB'.format(size_mb / 1024) if size_mb >= 1024 else '{} MB'.format(size_mb)
+
+
+def format_gb(size_gb: float) -> str:
+    return '{:.2f} GB'.format(size_gb)
+
+
+def collect_run_statistics(output_folder: Path, modules: List[PlannedModule]) -> Dict[str, Dict[str, float]]:
+    """
+    CPU seconds of all jobs of the last execution of each output file and the result size of every module. Jobs of
+    rules which run once per reference are counted separately (reference_cpu_seconds, reference_jobs).
+    """
+    statistics: Dict[str, Dict[str, float]] = {module.name: {'cpu_seconds': 0.0, 'reference_cpu_seconds': 0.0, 'reference_jobs': 0,
+                                                             'final_gb': directory_size(output_folder / module.directory) / GB}
+                                               for module in modules}
+    metadata_directory: Path = output_folder / '.snakemake' / 'metadata'
+    if not metadata_directory.is_dir():
+        return statistics
+    jobs = set()
+    for metadata_file in metadata_directory.iterdir():
+        try:
+            metadata = json.loads(metadata_file.read_text())
+        except (ValueError, OSError):
+            continue
+        if metadata.get('starttime') is None or metadata.get('endtime') is None or metadata.get('incomplete'):
+            continue
+        # Jobs with multiple output files have one metadata file per output
+        jobs.add((metadata['rule'], metadata['starttime'], metadata['endtime']))
+    for rule_name, start_time, end_time in jobs:
+        for module in modules:
+            if rule_name.startswith(module.rule_prefix + '__'):
+                module_rule_name: str = rule_name[len(module.rule_prefix) + 2:]
+                cpu_seconds: float = (end_time - start_time) * module.threads.get(module_rule_name, 1)
+                if module_rule_name in module.reference_rules:
+                    statistics[module.name]['reference_cpu_seconds'] += cpu_seconds
+                    statistics[module.name]['reference_jobs'] += 1
+                else:
+                    statistics[module.name]['cpu_seconds'] += cpu_seconds
+    return statistics
+
+
+def update_calibration(calibration_file: Path, output_folder: Path, modules: List[PlannedModule], input_gb: float):
+    """Store the statistics of a finished run. A rerun in the same output folder replaces its previous entry."""
+    if input_gb <= 0:
+        return
+    runs = load_calibration(calibration_file)
+    runs[str(output_folder.resolve())] = {'updated': datetime.now().isoformat(timespec='seconds'),
+                                          'input_gb': input_gb,
+                                          'modules': collect_run_statistics(output_folder, modules)}
+    runs = dict(sorted(runs.items(), key=lambda run: run[1]['updated'], reverse=True)[:MAX_CALIBRATION_RUNS])
+    calibration_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path: Path = calibration_file.with_name('{}.{}.tmp'.format(calibration_file.name, os.getpid()))
+    with tmp_path.open('w') as f:
+        yaml.safe_dump({'runs': runs}, f, default_flow_style=False)
+    tmp_path.replace(calibration_file)
+
+
+def load_calibration(calibration_file: Path) -> Dict[str, Dict]:
+    if not calibration_file.is_file():
+        return {}
+    calibration = yaml.safe_load(calibration_file.read_text()) or {}
+    return calibration.get('runs', {})
+
+
+def directory_size(directory: Path) -> int:
+    if not directory.is_dir():
+        return 0
+    return sum(file.stat().st_size for file in directory.rglob('*') if file.is_file() and not file.is_symlink())
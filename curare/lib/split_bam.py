@@ -0,0 +1,177 @@
+"""
+Split an alignment stream into proper pairs, singletons, discordant pairs and unmapped reads in a single pass.
+Every record is read exactly once and forwarded to concurrently running "samtools sort" processes.
+The alignment can be read from a named pipe or stdin, so aligners can stream into it without writing a SAM file.
+
+Paired-end classification (SAM flags):
+    mapped          both mates mapped and properly paired (-F 12 -f 2)
+    singleton       exactly one mate mapped (-f 4 -F 8 or -f 8 -F 4)
+    disconcordant   both mates mapped but not properly paired (-F 14)
+    unmapped        both mates unmapped (-f 12)
+If no disconcordant output is given, all records with both mates mapped are written to the mapped output (-F 12).
+
+Single-end classification (SAM flags):
+    mapped          read mapped (-F 4)
+    unmapped        read unmapped (-f 4)
+
+Usage:
+    split_bam.py --mapped <bam> [--singleton <bam>] [--disconcordant <bam>] [--unmapped <bam>] [--flagstat <file>] [--input <alignment>] [--threads <threads>] [--memory <memory>]
+    split_bam.py --single-end --mapped <bam> [--unmapped <bam>] [--flagstat <file>] [--input <alignment>] [--threads <threads>] [--memory <memory>]
+    split_bam.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    -i <alignment> --input <alignment>          SAM or BAM file to split (Default: SAM from stdin)
+    --mapped <bam>                              Sorted BAM file for mapped reads
+    --singleton <bam>                           Sorted BAM file for pairs with only one mapped mate
+    --disconcordant <bam>                       Sorted BAM file for pairs which are not properly paired
+    --unmapped <bam>                            Sorted BAM file for unmapped reads
+    --flagstat <file>                           Write "samtools flagstat" statistics of all records to this file
+    --single-end                                Input contains single-end reads
+    -t <threads> --threads <threads>            Threads shared by all sorting processes [Default: 4]
+    -m <memory> --memory <memory>               Maximum memory per sorting thread (samtools sort -m) [Default: 768M]
+"""
+
+import subprocess
+import sys
+
+from docopt import docopt
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+BGZF_MAGIC: bytes = b'\x1f\x8b'
+WRITE_BUFFER_SIZE: int = 1024 * 1024
+
+MAPPED: str = 'mapped'
+SINGLETON: str = 'singleton'
+DISCONCORDANT: str = 'disconcordant'
+UNMAPPED: str = 'unmapped'
+
+
+def classify_paired_end(flag: int, split_disconcordant: bool) -> str:
+    unmapped_mates: int = flag & 12
+    if unmapped_mates == 12:
+        return UNMAPPED
+    if unmapped_mates:
+        return SINGLETON
+    if split_disconcordant and not flag & 2:
+        return DISCONCORDANT
+    return MAPPED
+
+
+def classify_single_end(flag: int) -> str:
+    return UNMAPPED if flag & 4 else MAPPED
+
+
+def open_alignment(input_file: Optional[Path]) -> Tuple[BinaryIO, Optional[subprocess.Popen]]:
+    """Return a binary SAM stream. BAM/CRAM files are decoded by "samtools view"."""
+    if input_file is None:
+        return sys.stdin.buffer, None
+    if input_file.suffix not in ('.bam', '.cram'):
+        # Named pipes can only be opened once, so the magic bytes are peeked without consuming them.
+        alignment = input_file.open('rb', buffering=WRITE_BUFFER_SIZE)
+        if alignment.peek(2)[:2] != BGZF_MAGIC:
+            return alignment, None
+        alignment.close()
+    decoder = subprocess.Popen(['samtools', 'view', '-h', str(input_file)], stdout=subprocess.PIPE, bufsize=WRITE_BUFFER_SIZE)
+    return decoder.stdout, decoder
+
+
+def start_sorter(output_file: Path, threads: int, memory: str) -> subprocess.Popen:
+    return subprocess.Popen(['samtools', 'sort', '-@', str(threads), '-m', memory, '-o', str(output_file), '-'],
+                            stdin=subprocess.PIPE, bufsize=WRITE_BUFFER_SIZE)
+
+
+def start_flagstat(output_file: Path) -> subprocess.Popen:
+    with output_file.open('w') as flagstat_file:
+        return subprocess.Popen(['samtools', 'flagstat', '-'], stdin=subprocess.PIPE, stdout=flagstat_file, bufsize=WRITE_BUFFER_SIZE)
+
+
+def split_alignment(alignment: BinaryIO, sorters: Dict[str, subprocess.Popen], mirrors: List[BinaryIO], single_end: bool) -> Dict[str, int]:
+    """Route every record to the sorter of its category. Mirrors receive all records."""
+    sinks: Dict[str, BinaryIO] = {category: sorter.stdin for category, sorter in sorters.items()}
+    all_sinks: List[BinaryIO] = list(sinks.values()) + mirrors
+    split_disconcordant: bool = DISCONCORDANT in sinks
+    record_counts: Dict[str, int] = {category: 0 for category in (MAPPED, SINGLETON, DISCONCORDANT, UNMAPPED)}
+
+    # Flags repeat constantly, so each distinct flag field is only classified once.
+    routes: Dict[bytes, Tuple[str, Optional[BinaryIO]]] = {}
+    for line in alignment:
+        if line.startswith(b'@'):
+            for sink in all_sinks:
+                sink.write(line)
+            continue
+        flag_field: bytes = line.split(b'\t', 2)[1]
+        route = routes.get(flag_field)
+        if route is None:
+            flag: int = int(flag_field)
+            category: str = classify_single_end(flag) if single_end else classify_paired_end(flag, split_disconcordant)
+            route = (category, sinks.get(category))
+            routes[flag_field] = route
+        category, sink = route
+        record_counts[category] += 1
+        if sink is not None:
+            sink.write(line)
+        for mirror in mirrors:
+            mirror.write(line)
+    return record_counts
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    single_end: bool = args['--single-end']
+    outputs: Dict[str, str] = {
+        MAPPED: args['--mapped'],
+        SINGLETON: None if single_end else args['--singleton'],
+        DISCONCORDANT: None if single_end else args['--disconcordant'],
+        UNMAPPED: args['--unmapped']
+    }
+    outputs = {category: output for category, output in outputs.items() if output}
+    threads: int = max(1, int(args['--threads']))
+    # Every sorting process runs on its own main thread. The mapped reads are by far the largest output,
+    # so they get all additional threads.
+    threads_per_sorter: Dict[str, int] = {category: 0 for category in outputs}
+    threads_per_sorter[MAPPED] = max(0, threads - len(outputs))
+
+    alignment, decoder = open_alignment(Path(args['--input']) if args['--input'] else None)
+    sorters: Dict[str, subprocess.Popen] = {category: start_sorter(Path(output), threads_per_sorter[category], args['--memory'])
+                                            for category, output in outputs.items()}
+    helpers: Dict[str, subprocess.Popen] = {}
+    if args['--flagstat']:
+        helpers['flagstat'] = start_flagstat(Path(args['--flagstat']))
+    failed: bool = False
+    try:
+        record_counts = split_alignment(alignment, sorters, [helper.stdin for helper in helpers.values()], single_end)
+    except BrokenPipeError:
+        failed = True
+    finally:
+        for sorter in list(sorters.values()) + list(helpers.values()):
+            try:
+                sorter.stdin.close()
+            except BrokenPipeError:
+                failed = True
+        alignment.close()
+
+    for category, sorter in sorters.items():
+        if sorter.wait() != 0:
+            print('samtools sort failed for {} reads ({})'.format(category, outputs[category]), file=sys.stderr)
+            failed = True
+    for name, helper in helpers.items():
+        if helper.wait() != 0:
+            print('samtools {} failed'.format(name), file=sys.stderr)
+            failed = True
+    if decoder is not None and decoder.wait() != 0:
+        print('samtools view failed for {}'.format(args['--input']), file=sys.stderr)
+        failed = True
+    if failed:
+        sys.exit(1)
+
+    for category, count in record_counts.items():
+        if count or category in outputs:
+            print('{}\t{}'.format(category, count), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
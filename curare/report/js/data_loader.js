@@ -0,0 +1,46 @@
+'use strict';
+
+// Chunk files of the report data (see global_scripts/report_data.py) are loaded on demand with script elements, which
+// also works for reports opened from the file system (file://), where fetch() is not allowed.
+(function () {
+    const loaded = {}
+    const loading = {}
+
+    // Called by the chunk files
+    Curare.addChunk = function (file, rows) {
+        loaded[file] = rows
+    }
+
+    // Rows of a chunk file (path relative to dataPath), each file is loaded once
+    Curare.loadChunk = function (dataPath, file) {
+        if (!(file in loading)) {
+            loading[file] = new Promise(function (resolve, reject) {
+                const script = document.createElement('script')
+                script.type = 'text/javascript'
+                script.charset = 'utf8'
+                script.src = dataPath + file
+                script.onload = function () {
+                    script.remove()
+                    resolve(loaded[file])
+                }
+                script.onerror = function () {
+                    script.remove()
+                    delete loading[file]
+                    reject(new Error('Could not load report data ' + dataPath + file))
+                }
+                document.head.appendChild(script)
+            })
+        }
+        return loading[file]
+    }
+
+    // All rows of a chunk index ({files, rows, chunk_rows})
+    Curare.loadRows = function (dataPath, index) {
+        return Promise.all(index.files.map(file => Curare.loadChunk(dataPath, file))).then(chunks => [].concat(...chunks))
+    }
+
+    // Row number <row> of a chunk index, only its chunk is loaded
+    Curare.loadRow = function (dataPath, index, row) {
+        return Curare.loadChunk(dataPath, index.files[Math.floor(row / index.chunk_rows)]).then(rows => rows[row % index.chunk_rows])
+    }
+}())
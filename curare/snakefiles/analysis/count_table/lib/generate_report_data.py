@@ -2,7 +2,7 @@
 Convert featureCounts results to usable data for the large report
 
 Usage:
-    generate_report_data.py --stats <featureCounts_stats> --output <output> --fc_main_feature <fc_main_feature> --counttable <count_table> [--paired-end]
+    generate_report_data.py --stats <featureCounts_stats> --output <output> --fc_main_feature <fc_main_feature> --counttable <count_table> [--paired-end] [--parquet <parquet_dir>]
     generate_report_data.py (--version | --help)
 
 Options:
@@ -14,16 +14,23 @@ Options:
     -c <count_table> --counttable <count_table>                         Created count table
     -o <output> --output <output>                                       Created js containing featureCounts statistics
     --paired-end                                                        Paired-End run, else Single-End
+    --parquet <parquet_dir>                                             Parquet tables of the module (used instead of the TSV files if present)
 """
 
 import json
+import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from docopt import docopt
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'global_scripts'))
 
-def create_featurecounts_stats_js_object(stats_file: Path) -> Dict[str, Any]:
+
+def create_featurecounts_stats_js_object(stats_file: Path, parquet_dir: Optional[Path] = None) -> Dict[str, Any]:
+    if parquet_dir is not None and (parquet_dir / 'counts_summary.parquet').is_file():
+        from columnar_tables import featurecounts_stats
+        return featurecounts_stats(parquet_dir / 'counts_summary.parquet')
     stats_table: List[Dict[str, str]] = []
     with stats_file.open() as file:
         header = next(file).strip().split("\t")
@@ -38,8 +45,9 @@ def create_featurecounts_stats_js_object(stats_file: Path) -> Dict[str, Any]:
     return stats_table
 
 
-def generate_report_data(output_file: Path, stats_file: Path, fc_main_feature: str, count_table_file: Path, is_paired_end: bool):
-    stats = create_featurecounts_stats_js_object(stats_file)
+def generate_report_data(output_file: Path, stats_file: Path, fc_main_feature: str, count_table_file: Path, is_paired_end: bool,
+                         parquet_dir: Optional[Path] = None):
+    stats = create_featurecounts_stats_js_object(stats_file, parquet_dir)
 
     with output_file.open('w') as f:
         f.write('window.Curare.count_table = (function() {\n')
@@ -48,7 +56,7 @@ def generate_report_data(output_file: Path, stats_file: Path, fc_main_feature: s
         f.write('  const count_table_path = "{}"\n'.format(count_table_file))
         f.write('  const stats = ')
 
-        f.write(json.dumps(stats, indent=2).replace('\n', '\n  '))
+        f.write(json.dumps(stats, separators=(',', ':')))
         f.write('\n')
 
         f.write('  return {paired_end: paired_end, stats: stats, fc_main_feature: fc_main_feature, count_table_path: count_table_path};\n')
@@ -62,8 +70,9 @@ def main():
     output_file: Path = Path(args["--output"]).resolve()
     count_table_file: Path = Path(args["--counttable"])
     fc_main_feature: str = args["--fc_main_feature"]
+    parquet_dir: Optional[Path] = Path(args["--parquet"]).resolve() if args["--parquet"] else None
 
-    generate_report_data(output_file, stats_file, fc_main_feature, count_table_file, args["--paired-end"])
+    generate_report_data(output_file, stats_file, fc_main_feature, count_table_file, args["--paired-end"], parquet_dir)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,195 @@
+"""
+Create the count tables of multiple feature types with one featureCounts run, which reads every BAM file only once.
+
+All features of the selected types are written into one SAF annotation (one meta-feature per feature type and name).
+featureCounts assigns the reads to all overlapping meta-features (-O) and reports the assignment of every read
+(-R CORE). The assignments are split by feature type afterwards: reads with exactly one meta-feature of a type are
+assigned, reads without a meta-feature of the type are counted as "Unassigned_NoFeatures" and reads with multiple
+meta-features of the type as "Unassigned_Ambiguity" (unless -O is part of the featureCounts options). The results are
+written as <output>/<feature type>.txt and <output>/<feature type>.txt.summary in the format of featureCounts.
+
+Options of featureCounts which select between overlapping features (--largestOverlap), weight alignments (--fraction),
+count single features (-f) or replace the generated annotation and outputs (-t, -g, -F, -a, -o, -R, --Rpath) are not
+supported and rejected.
+
+Usage:
+    count_feature_types.py --gff <gff> --types <types> --attribute <attribute> --output <folder> [--threads <threads>] [--paired-end] [--featurecounts-options <options>] <bam>...
+    count_feature_types.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    --gff <gff>                                 Annotation file (GFF or GTF, may be gzip-compressed)
+    --types <types>                             Comma-separated list of feature types
+    --attribute <attribute>                     Attribute used as feature name (featureCounts -g)
+    --output <folder>                           Output folder of the count tables
+    --threads <threads>                         Number of threads [default: 1]
+    --paired-end                                Count read pairs instead of reads
+    --featurecounts-options <options>           Additional featureCounts options (e.g. strand specificity) [default: ]
+"""
+
+import shlex
+import subprocess
+import sys
+import tempfile
+
+from docopt import docopt
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'global_scripts'))
+from gff_reader import read_features
+
+SUMMARY_STATUS: List[str] = ['Assigned', 'Unassigned_Unmapped', 'Unassigned_Read_Type', 'Unassigned_Singleton',
+                             'Unassigned_MappingQuality', 'Unassigned_Chimera', 'Unassigned_FragmentLength',
+                             'Unassigned_Duplicate', 'Unassigned_MultiMapping', 'Unassigned_Secondary',
+                             'Unassigned_NonSplit', 'Unassigned_NoFeatures', 'Unassigned_Overlapping_Length',
+                             'Unassigned_Ambiguity']
+# featureCounts options whose results cannot be split by feature type or which conflict with the generated SAF file
+UNSUPPORTED_OPTIONS: List[str] = ['--largestOverlap', '--fraction', '-f', '-t', '-g', '-F', '-a', '-o', '-R', '--Rpath']
+
+
+class MetaFeature:
+    def __init__(self, feature_type: int, name: str):
+        self.feature_type: int = feature_type
+        self.name: str = name
+        # (chromosome, start, end, strand)
+        self.features: List[Tuple[str, int, int, str]] = []
+
+    def length(self) -> int:
+        """Length of the union of all features like featureCounts"""
+        length: int = 0
+        for chromosome in {feature[0] for feature in self.features}:
+            end: int = 0
+            for _, feature_start, feature_end, _ in sorted(feature for feature in self.features if feature[0] == chromosome):
+                if feature_end > end:
+                    length += feature_end - max(feature_start - 1, end)
+                    end = feature_end
+        return length
+
+    def table_columns(self) -> List[str]:
+        return [self.name] + [';'.join(str(feature[i]) for feature in self.features) for i in range(4)] + [str(self.length())]
+
+
+def read_meta_features(gff: Path, feature_types: List[str], attribute: str) -> List[MetaFeature]:
+    type_index: Dict[str, int] = {feature_type: i for i, feature_type in enumerate(feature_types)}
+    meta_features: Dict[Tuple[int, str], MetaFeature] = {}
+    for feature in read_features(gff, feature_types=feature_types, attributes=[attribute]):
+        name: str = feature.attributes.get(attribute, '').strip('"')
+        if not name:
+            continue
+        key: Tuple[int, str] = (type_index[feature.type], name)
+        if key not in meta_features:
+            meta_features[key] = MetaFeature(*key)
+        meta_features[key].features.append((feature.seqid, feature.start, feature.end, feature.strand))
+    return list(meta_features.values())
+
+
+def write_saf(meta_features: List[MetaFeature], saf: Path):
+    with saf.open('w') as saf_file:
+        saf_file.write('GeneID\tChr\tStart\tEnd\tStrand\n')
+        for i, meta_feature in enumerate(meta_features):
+            for chromosome, start, end, strand in meta_feature.features:
+                saf_file.write('{}\t{}\t{}\t{}\t{}\n'.format(i, chromosome, start, end, strand))
+
+
+def split_assignments(assignment_file: Path, meta_feature_types: List[int], number_of_types: int, multiple_overlaps: bool) \
+        -> Tuple[List[int], Dict[str, int], List[int], List[int]]:
+    """
+    Counts per meta-feature, number of reads per featureCounts status, and number of assigned and ambiguous reads per
+    feature type
+    """
+    counts: List[int] = [0] * len(meta_feature_types)
+    status_counts: Dict[str, int] = {}
+    assigned: List[int] = [0] * number_of_types
+    ambiguous: List[int] = [0] * number_of_types
+    with assignment_file.open() as assignments:
+        for line in assignments:
+            fields: List[str] = line.rstrip('\n').split('\t')
+            status_counts[fields[1]] = status_counts.get(fields[1], 0) + 1
+            if fields[1] != 'Assigned':
+                continue
+            targets: List[str] = fields[3].split(',')
+            if len(targets) == 1:
+                target: int = int(targets[0])
+                counts[target] += 1
+                assigned[meta_feature_types[target]] += 1
+                continue
+            targets_by_type: Dict[int, List[int]] = {}
+            for target_name in targets:
+                target = int(target_name)
+                targets_by_type.setdefault(meta_feature_types[target], []).append(target)
+            for feature_type, type_targets in targets_by_type.items():
+                if len(type_targets) == 1 or multiple_overlaps:
+                    assigned[feature_type] += 1
+                    for target in type_targets:
+                        counts[target] += 1
+                else:
+                    ambiguous[feature_type] += 1
+    return counts, status_counts, assigned, ambiguous
+
+
+def type_summary(status_counts: Dict[str, int], assigned: int, ambiguous: int, statuses: List[str]) -> Dict[str, int]:
+    """Summary of one feature type. All reads assigned to other feature types have no feature of this type."""
+    summary: Dict[str, int] = {status: status_counts.get(status, 0) for status in statuses}
+    summary['Unassigned_NoFeatures'] += summary['Assigned'] - assigned - ambiguous
+    summary['Assigned'] = assigned
+    summary['Unassigned_Ambiguity'] += ambiguous
+    return summary
+
+
+def unsupported_options(options: List[str]) -> List[str]:
+    return [option for option in options if option in UNSUPPORTED_OPTIONS]
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    feature_types: List[str] = [feature_type.strip() for feature_type in args['--types'].split(',') if feature_type.strip()]
+    bam_files: List[str] = args['<bam>']
+    output_folder: Path = Path(args['--output'])
+    output_folder.mkdir(parents=True, exist_ok=True)
+    options: List[str] = shlex.split(args['--featurecounts-options'])
+    rejected_options: List[str] = unsupported_options(options)
+    if rejected_options:
+        sys.exit('The featureCounts options {} are not supported by count_feature_types.py. Create the count tables of each '
+                 'feature type with featureCounts instead.'.format(', '.join(rejected_options)))
+    threads: int = int(args['--threads'])
+
+    meta_features: List[MetaFeature] = read_meta_features(Path(args['--gff']), feature_types, args['--attribute'])
+    meta_feature_types: List[int] = [meta_feature.feature_type for meta_feature in meta_features]
+    with tempfile.TemporaryDirectory(dir=output_folder, prefix='.count_feature_types_') as tmp_directory:
+        tmp_path: Path = Path(tmp_directory)
+        write_saf(meta_features, tmp_path / 'features.saf')
+        command: List[str] = ['featureCounts', '-F', 'SAF', '-a', str(tmp_path / 'features.saf'), '-O', '-R', 'CORE',
+                              '--Rpath', tmp_directory, '-T', str(threads), '-o', str(tmp_path / 'all_features.txt')]
+        command += (['-p', '--countReadPairs'] if args['--paired-end'] else []) + options + bam_files
+        print(' '.join(shlex.quote(part) for part in command), flush=True)
+        if subprocess.run(command).returncode != 0:
+            sys.exit('featureCounts failed')
+        with (tmp_path / 'all_features.txt').open() as all_features:
+            program: str = all_features.readline().split(';')[0]
+
+        with Pool(min(threads, len(bam_files))) as pool:
+            results = pool.starmap(split_assignments, [(tmp_path / (Path(bam).name + '.featureCounts'), meta_feature_types,
+                                                        len(feature_types), '-O' in options) for bam in bam_files])
+
+    statuses: List[str] = SUMMARY_STATUS + sorted({status for result in results for status in result[1]} - set(SUMMARY_STATUS))
+    for type_index, feature_type in enumerate(feature_types):
+        with (output_folder / (feature_type + '.txt')).open('w') as table:
+            table.write('{}; Command: count_feature_types.py (one featureCounts run for {})\n'.format(program, ','.join(feature_types)))
+            table.write('\t'.join(['Geneid', 'Chr', 'Start', 'End', 'Strand', 'Length'] + bam_files) + '\n')
+            for i, meta_feature in enumerate(meta_features):
+                if meta_feature.feature_type == type_index:
+                    table.write('\t'.join(meta_feature.table_columns() + [str(result[0][i]) for result in results]) + '\n')
+        summaries: List[Dict[str, int]] = [type_summary(status_counts, assigned[type_index], ambiguous[type_index], statuses)
+                                           for _, status_counts, assigned, ambiguous in results]
+        with (output_folder / (feature_type + '.txt.summary')).open('w') as summary_file:
+            summary_file.write('\t'.join(['Status'] + bam_files) + '\n')
+            for status in statuses:
+                summary_file.write('\t'.join([status] + [str(summary[status]) for summary in summaries]) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,13 +15,16 @@ import importlib.util
 import sys
 import csv
 import argparse
-import gzip
 
 from importlib import util
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'global_scripts'))
+from gff_reader import attribute_value, is_gtf, read_features
 
 missing_modules = []
-for module in ['pandas', 'xlsxwriter']:
+for module in ['xlsxwriter']:
     if importlib.util.find_spec(module) is None:
         missing_modules.append(module)
 if len(missing_modules) != 0:
@@ -31,7 +34,10 @@ if len(missing_modules) != 0:
     print('\nPlease use "conda" mode or install missing python packages.\n\n'.format(module), file=sys.stderr)
     sys.exit(4)
 
-import pandas as pd
+import xlsxwriter
+
+# Number of rows (evenly distributed over the table) used for estimating the column widths
+WIDTH_SAMPLE_ROWS: int = 1000
 
 
 def parse_arguments():
@@ -46,15 +52,55 @@ def parse_arguments():
     return parser.parse_args()
 
 
-def get_col_widths(df):
-    widths: List[int] = []
-    for col in df.columns:
-        entry_widths: List[int] = [len(col)]
-        for x in df[col]:
-            if x is not None:
-                entry_widths.append(len(x))
-        widths.append(max(entry_widths))
-    return widths
+def read_tsv_ids(tsv: str) -> List[str]:
+    """IDs (first column) of all data rows"""
+    with open(tsv, "r") as tsv_stream:
+        return [row[0] for index, row in enumerate(csv.reader(tsv_stream, delimiter="\t")) if index > 0 and row]
+
+
+def read_annotations(gff_file: str, identifier: str, wanted_gff_attributes: List[str], ids: Set[str]) -> Dict[str, List[str]]:
+    """
+    Annotation columns (chromosome, start, end, strand, wanted attributes in reversed order) and raw attributes of the
+    features whose identifier is in ids. The annotation is streamed and only the identifier is extracted from the other
+    features, so memory depends on the number of IDs and not on the size of the annotation.
+    """
+    annotations: Dict[str, List[str]] = {}
+    identifier_found: bool = False
+    gtf: bool = is_gtf(Path(gff_file))
+    try:
+        for feature in read_features(Path(gff_file), attributes=[identifier], ignore_case=True):
+            if identifier in feature.attributes:
+                identifier_found = True
+                stripped_identifier: str = feature.attributes[identifier].strip('"\'')
+                if stripped_identifier in ids:
+                    annotation: List[str] = [feature.seqid, str(feature.start), str(feature.end), feature.strand]
+                    for attr in reversed(wanted_gff_attributes):
+                        value: Optional[str] = attribute_value(feature.raw_attributes, attr, gtf, ignore_case=True) if attr else None
+                        annotation.append(value if value is not None else "-")
+                    annotations[stripped_identifier] = annotation + [feature.raw_attributes.replace(';', '; ')]
+    except Exception as e:
+        print('Error while reading GFF file "{}"'.format(gff_file), file=sys.stderr)
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    if not identifier_found:
+        print('No identifier "{}" found in GFF file "{}"'.format(identifier, gff_file), file=sys.stderr)
+        sys.exit(2)
+    return annotations
+
+
+def annotated_rows(tsv: str, annotations: Dict[str, List[str]], wanted_gff_attributes: List[str]) -> Iterator[List[str]]:
+    """Header and data rows of the TSV with the annotation columns after the ID and the raw attributes at the end"""
+    missing_annotation: List[str] = ["-"] * (4 + len(wanted_gff_attributes)) + [""]
+    with open(tsv, "r") as tsv_stream:
+        for index, row in enumerate(csv.reader(tsv_stream, delimiter="\t")):
+            if index == 0:
+                annotation: List[str] = ['Chromosome', 'Start', 'End', 'Strand'] + \
+                                        [attr.capitalize() for attr in reversed(wanted_gff_attributes)] + ['Attributes']
+            elif not row:
+                continue
+            else:
+                annotation = annotations.get(row[0], missing_annotation)
+            yield row[:1] + annotation[:-1] + row[1:] + annotation[-1:]
 
 
 def main():
@@ -74,201 +120,100 @@ def main():
     # e.g. gene or CDS
     wanted_gff_attributes = [arg.strip().upper() for arg in args.attributes.split(",")]
 
-    annotations = {}
-    if gff_file.endswith(".gz"):
-        gff = gzip.open(gff_file, "rt")
-        gtf_or_gff = "gtf" if gff_file.endswith("gtf.gz") else "gff"
-    else:
-        gff = open(gff_file, "r")
-        gtf_or_gff = "gtf" if gff_file.endswith("gtf") else "gff"
-    attribute_separator: str = ';' if gtf_or_gff == "gtf" else ';'
-    key_value_separator: str = ' ' if gtf_or_gff == "gtf" else '='
-    for line in gff:
-        try:
-            if line.startswith("#"):
-                continue
-            columns = line.strip().split("\t")
-            if len(columns) != 9:
-                continue
-            
-            wanted_gff_attributes_plus_id = wanted_gff_attributes + [identifier]
-            attributes_string = columns[8]
-            parsed_attributes = parse_attributes(attributes_string, attribute_separator=attribute_separator, key_value_separator=key_value_separator).items()
-            attributes = {a.strip().upper(): b.strip() for a, b in parsed_attributes
-                            if a.strip().upper() in wanted_gff_attributes_plus_id}
-            if identifier in attributes:
-                stripped_identifier: str = attributes[identifier].strip('"\'')
-                annotations[stripped_identifier] = {}
-                annotations[stripped_identifier]['attr'] = attributes_string.replace(';', '; ')
-                annotations[stripped_identifier]['gff_chr'] = columns[0]
-                annotations[stripped_identifier]['gff_start'] = columns[3]
-                annotations[stripped_identifier]['gff_stop'] = columns[4]
-                annotations[stripped_identifier]['gff_strand'] = columns[6]
-                for attr in wanted_gff_attributes:
-                    if attr in attributes:
-                        annotations[stripped_identifier][attr] = attributes[attr]
-                    else:
-                        annotations[stripped_identifier][attr] = "-"
-        except Exception as e:
-            print('Error while reading GFF file "{}"'.format(gff_file), file=sys.stderr)
-            print(e, file=sys.stderr)
-            sys.exit(1)
-    gff.close()
-    if len(annotations) == 0:
-        print('No identifier "{}" found in GFF file "{}"'.format(identifier, gff_file), file=sys.stderr)
-        sys.exit(2)
-
-    # fill list of lists:
-    # first element = 1st row: header
-    # second to n-th element: data
-    list_data = []
-    with open(tsv, "r") as tsv_stream:
-        tsv_table = csv.reader(tsv_stream, delimiter="\t")
-        for index, row in enumerate(tsv_table):
-            if index == 0:
-                for attr in wanted_gff_attributes:
-                    row.insert(1, attr.capitalize())
-                row.insert(1, 'Strand')
-                row.insert(1, 'End')
-                row.insert(1, 'Start')
-                row.insert(1, 'Chromosome')
-                row.append("Attributes")
-            else:
-                if row[0] in annotations:
-                    for attr in wanted_gff_attributes:
-                        row.insert(1, annotations[row[0]][attr])
-                    row.insert(1, annotations[row[0]]['gff_strand'])
-                    row.insert(1, annotations[row[0]]['gff_stop'])
-                    row.insert(1, annotations[row[0]]['gff_start'])
-                    row.insert(1, annotations[row[0]]['gff_chr'])
-                    row.append(annotations[row[0]]['attr'])
-                else:
-                    row.insert(1, "-")
-            list_data.append(row)
-    if len(list_data) < 2:
+    ids: List[str] = read_tsv_ids(tsv)
+    if len(ids) == 0:
         print('TSV file "{}" is empty or only contains a header'.format(tsv), file=sys.stderr)
         sys.exit(3)
+    annotations: Dict[str, List[str]] = read_annotations(gff_file, identifier, wanted_gff_attributes, set(ids))
+
+    # number of rows (including header)
+    rows = len(ids) + 1
+    width_sample_step: int = max(1, len(ids) // WIDTH_SAMPLE_ROWS)
+
+    # rows are written one after another and flushed to disk (constant_memory)
+    workbook = xlsxwriter.Workbook(outfile, {'constant_memory': True, 'strings_to_numbers': True})
+    worksheet = workbook.add_worksheet(sheet_name)
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    widths: List[int] = []
+    for index, row in enumerate(annotated_rows(tsv, annotations, wanted_gff_attributes)):
+        if index == 0:
+            worksheet.write_row(0, 0, row, header_format)
+            widths = [len(value) for value in row]
+            continue
+        worksheet.write_row(index, 0, row)
+        if index % width_sample_step == 0:
+            for column, value in enumerate(row[:len(widths)]):
+                widths[column] = max(widths[column], len(value))
+
+    columns = len(widths) - 1  # last column (attributes) is not formatted
+    for i, width in enumerate(widths):
+        worksheet.set_column(i, i, width + 5)
+
+    p_value_format = {'type': '3_color_scale',
+                    'min_color': "#7FFFAD",
+                    'mid_color': "#EDE97E",
+                    'max_color': "#FF0000",
+                    'mid_type': 'num',
+                    'min_type': 'num',
+                    'max_type': 'num',
+                    'min_value': 0.01,
+                    'max_value': 1,
+                    'mid_value': 0.05}
+
+    log_fold_format = {'type': '3_color_scale',
+                    'min_color': "#7FFFAD",
+                    'mid_color': "#FFFFFF",
+                    'mid_type': 'num',
+                    'mid_value': 0,
+                    'max_color': "#FF0000"}
+
+    count_format = {'type': '3_color_scale',
+                    'min_color': "#FFFFFF",
+                    'mid_color': "#EDE97E",
+                    'max_color': "#FF0000",
+                    'mid_type': 'num',
+                    'max_type': 'num',
+                    'min_type': 'num',
+                    'min_value': 0,
+                    'mid_value': 100,
+                    'max_value': 1000}
+
+    # conditional formatting
+    worksheet.conditional_format(1, 5 + len(wanted_gff_attributes), rows - 1, 5 + len(wanted_gff_attributes) + number_of_conditions - 1,
+                                p_value_format)
+    worksheet.conditional_format(1, 5 + len(wanted_gff_attributes) + number_of_conditions, rows - 1,
+                                5 + len(wanted_gff_attributes) + 2 * number_of_conditions - 1, log_fold_format)
+    worksheet.conditional_format(1, 5 + len(wanted_gff_attributes) + 2 * number_of_conditions, rows - 1, columns - 1, count_format)
+
+    # freeze first row and column
+    worksheet.freeze_panes(1, 1)
+
+    # autofilter for each column
+    worksheet.autofilter(0, 0, rows - 1, columns)
+
+    # legend sheet (written row by row because of constant_memory)
+    legend_sheet = workbook.add_worksheet("legend")
+    legend_sheet.write(0, 0, "p-values")
+    legend_sheet.write(0, 1, "lfc")
+    legend_sheet.write(0, 2, "counts")
+
+    legend_sheet.write(1, 0, 0.01)
+    legend_sheet.write(1, 1, "min", workbook.add_format({'bg_color': "#7FFFAD"}))
+    legend_sheet.write(1, 2, 0)
+    legend_sheet.write(2, 0, 0.05)
+    legend_sheet.write(2, 1, 0, workbook.add_format({'bg_color': "#FFFFFF"}))
+    legend_sheet.write(2, 2, 100)
+    legend_sheet.write(3, 0, 1)
+    legend_sheet.write(3, 1, "max", workbook.add_format({'bg_color': "#FF0000"}))
+    legend_sheet.write(3, 2, 1000)
+    legend_sheet.conditional_format(1, 0, 3, 0, p_value_format)
+    legend_sheet.conditional_format(1, 2, 3, 2, count_format)
+
+    legend_sheet.write(5, 0, "Fold changes:")
+    legend_sheet.write(6, 0, "FC = B/A with A: Filename and B: Column name")
+
+    workbook.close()
 
-    # get number of rows & columns
-    rows = len(list_data)
-    columns = len(list_data[1])
-
-    # convert to pandas data frame, so pandas ExcelWriter is usable
-    df = pd.DataFrame(list_data[1:], columns=list_data[0])
-    with pd.ExcelWriter(outfile, engine='xlsxwriter', engine_kwargs={'options': {'strings_to_numbers': True}}) as writer:
-        df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-        columns -= 1  # because of removing of first column
-        workbook = writer.book
-        worksheet = writer.sheets[sheet_name]
-
-        for i, width in enumerate(get_col_widths(df)):
-            worksheet.set_column(i, i, width + 5)
-
-        p_value_format = {'type': '3_color_scale',
-                        'min_color': "#7FFFAD",
-                        'mid_color': "#EDE97E",
-                        'max_color': "#FF0000",
-                        'mid_type': 'num',
-                        'min_type': 'num',
-                        'max_type': 'num',
-                        'min_value': 0.01,
-                        'max_value': 1,
-                        'mid_value': 0.05}
-
-        log_fold_format = {'type': '3_color_scale',
-                        'min_color': "#7FFFAD",
-                        'mid_color': "#FFFFFF",
-                        'mid_type': 'num',
-                        'mid_value': 0,
-                        'max_color': "#FF0000"}
-
-        count_format = {'type': '3_color_scale',
-                        'min_color': "#FFFFFF",
-                        'mid_color': "#EDE97E",
-                        'max_color': "#FF0000",
-                        'mid_type': 'num',
-                        'max_type': 'num',
-                        'min_type': 'num',
-                        'min_value': 0,
-                        'mid_value': 100,
-                        'max_value': 1000}
-
-        # conditional formatting
-        worksheet.conditional_format(1, 5 + len(wanted_gff_attributes), rows - 1, 5 + len(wanted_gff_attributes) + number_of_conditions - 1,
-                                    p_value_format)
-        worksheet.conditional_format(1, 5 + len(wanted_gff_attributes) + number_of_conditions, rows - 1,
-                                    5 + len(wanted_gff_attributes) + 2 * number_of_conditions - 1, log_fold_format)
-        worksheet.conditional_format(1, 5 + len(wanted_gff_attributes) + 2 * number_of_conditions, rows - 1, columns - 1, count_format)
-
-        # freeze first row and column
-        worksheet.freeze_panes(1, 1)
-
-        # autofilter for each column
-        worksheet.autofilter(0, 0, rows - 1, columns)
-
-        # legend sheet
-        legend_sheet = workbook.add_worksheet("legend")
-        legend_sheet.write(0, 0, "p-values")
-        legend_sheet.write(0, 1, "lfc")
-        legend_sheet.write(0, 2, "counts")
-
-        legend_sheet.write(1, 0, 0.01)
-        legend_sheet.write(2, 0, 0.05)
-        legend_sheet.write(3, 0, 1)
-        legend_sheet.conditional_format(1, 0, 3, 0, p_value_format)
-
-        legend_sheet.write(1, 1, "min", workbook.add_format({'bg_color': "#7FFFAD"}))
-        legend_sheet.write(2, 1, 0, workbook.add_format({'bg_color': "#FFFFFF"}))
-        legend_sheet.write(3, 1, "max", workbook.add_format({'bg_color': "#FF0000"}))
-
-        legend_sheet.write(1, 2, 0)
-        legend_sheet.write(2, 2, 100)
-        legend_sheet.write(3, 2, 1000)
-        legend_sheet.conditional_format(1, 2, 3, 2, count_format)
-
-        legend_sheet.write(5, 0, "Fold changes:")
-        legend_sheet.write(6, 0, "FC = B/A with A: Filename and B: Column name")
-        
-
-def parse_attributes(attributes: str, attribute_separator: str=';', key_value_separator: str='=', quotes: str='"') -> Dict[str,str]:
-    state: str = 'first_letter_key'  # first_letter_key, key, value, quotes
-    splitted_attributes: Dict[str, str] = {}
-    key: str = ""
-    value: str = ""
-
-    for char in attributes:
-        if state == 'first_letter_key':
-            if char.isspace() or char in [attribute_separator, key_value_separator]:
-                continue
-            else:
-                key += char
-                state = 'key'
-        elif state == 'key':
-            if char == key_value_separator:
-                state = 'value'
-            else:
-                key += char
-        elif state == 'value':
-            if char == quotes:
-                value += char
-                state = 'quotes'
-            elif char == attribute_separator:
-                splitted_attributes[key] = value
-                key = ''
-                value = ''
-                state = 'first_letter_key'
-            else:
-                value += char
-        else:  # quotes
-            if char == quotes:
-                value += char
-                state = 'value'
-            else:
-                value += char
-    if state == 'value':
-        splitted_attributes[key] = value
-    return splitted_attributes
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,199 @@
+"""
+Gene body coverage of multiple BAM files, written in the format of RSeQC's geneBody_coverage.py.
+
+Each feature of the BED12 file (mRNA length >= 100 bases) is divided into 100 percentiles like in RSeQC, reversed for
+features on the minus strand. The coverage at all percentile positions is summed up for each BAM file. If the BED file
+contains more features than --features, a fixed random sample of features is used (0: all features).
+
+Only the regions of the used features are read from the BAM files (with their BAI or CSI index). The coverage of all
+positions of a region is computed at once from the sorted start and end positions of the aligned blocks of all reads
+(NumPy searchsorted), so it does not depend on the read depth per position. Alignments which are unmapped, secondary,
+duplicates or failed QC are skipped like in RSeQC, as well as alignments with a mapping quality below --min-mapq. BAM
+files and chromosomes are processed in parallel.
+
+Output files:
+    <prefix>.geneBodyCoverage.txt           Percentiles (header) and summed coverage per BAM file
+    <prefix>.geneBodyCoverage.curves.pdf    Normalized coverage curves
+
+Usage:
+    gene_body_coverage.py --bed <bed> --output <prefix> [--features <features>] [--min-mapq <mapq>] [--threads <threads>] <bam>...
+    gene_body_coverage.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    -r <bed> --bed <bed>                            Features in BED12 format
+    -o <prefix> --output <prefix>                   Prefix of the output files
+    -n <features> --features <features>             Maximal number of used features (0: all) [default: 0]
+    -q <mapq> --min-mapq <mapq>                     Minimal mapping quality of alignments [default: 0]
+    -t <threads> --threads <threads>                Number of processes [default: 1]
+"""
+
+import random
+import sys
+
+from docopt import docopt
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pysam
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+PERCENTILES: int = 100
+SAMPLING_SEED: int = 0
+# Features closer than this are read from the BAM file as one region
+MAX_REGION_GAP: int = 10000
+
+
+class Transcript:
+    def __init__(self, chromosome: str, strand: str, exon_starts: np.ndarray, exon_ends: np.ndarray):
+        self.chromosome: str = chromosome
+        self.strand: str = strand
+        # 0-based, end exclusive
+        self.exon_starts: np.ndarray = exon_starts
+        self.exon_ends: np.ndarray = exon_ends
+
+    def length(self) -> int:
+        return int((self.exon_ends - self.exon_starts).sum())
+
+    def percentile_positions(self) -> np.ndarray:
+        """
+        0-based genomic positions of the 100 percentiles of the mRNA (interpolated between neighbouring bases like
+        RSeQC), from 5' to 3'
+        """
+        length: int = self.length()
+        k: np.ndarray = (length - 1) * np.arange(1, PERCENTILES + 1) / PERCENTILES
+        floor: np.ndarray = np.floor(k).astype(np.int64)
+        ceil: np.ndarray = np.ceil(k).astype(np.int64)
+        floor_positions: np.ndarray = self.mrna_to_genome(floor)
+        ceil_positions: np.ndarray = self.mrna_to_genome(ceil)
+        # interpolated with 1-based positions and rounded like RSeQC
+        positions: np.ndarray = np.where(floor == ceil, floor_positions,
+                                         np.round((floor_positions + 1) * (ceil - k) + (ceil_positions + 1) * (k - floor)) - 1)
+        positions = positions.astype(np.int64)
+        return positions[::-1] if self.strand == '-' else positions
+
+    def mrna_to_genome(self, mrna_positions: np.ndarray) -> np.ndarray:
+        exon_offsets: np.ndarray = np.concatenate([[0], np.cumsum(self.exon_ends - self.exon_starts)])
+        exons: np.ndarray = np.searchsorted(exon_offsets, mrna_positions, side='right') - 1
+        return self.exon_starts[exons] + (mrna_positions - exon_offsets[exons])
+
+
+def read_bed(bed: Path) -> List[Transcript]:
+    transcripts: List[Transcript] = []
+    with bed.open() as bed_file:
+        for line in bed_file:
+            if line.startswith(('#', 'track', 'browser')) or not line.strip():
+                continue
+            fields: List[str] = line.rstrip('\n').split('\t')
+            start: int = int(fields[1])
+            block_sizes: np.ndarray = np.array([int(size) for size in fields[10].rstrip(',').split(',')], dtype=np.int64)
+            block_starts: np.ndarray = np.array([int(block_start) for block_start in fields[11].rstrip(',').split(',')], dtype=np.int64)
+            transcripts.append(Transcript(fields[0], fields[5], start + block_starts, start + block_starts + block_sizes))
+    return transcripts
+
+
+def sample_transcripts(transcripts: List[Transcript], max_features: int) -> List[Transcript]:
+    transcripts = [transcript for transcript in transcripts if transcript.length() >= PERCENTILES]
+    if 0 < max_features < len(transcripts):
+        transcripts = [transcripts[i] for i in sorted(random.Random(SAMPLING_SEED).sample(range(len(transcripts)), max_features))]
+    return transcripts
+
+
+def chromosome_positions(transcripts: List[Transcript]) -> Dict[str, np.ndarray]:
+    """Percentile positions (transcripts x percentiles) per chromosome"""
+    positions: Dict[str, List[np.ndarray]] = {}
+    for transcript in transcripts:
+        positions.setdefault(transcript.chromosome, []).append(transcript.percentile_positions())
+    return {chromosome: np.vstack(chromosome_list) for chromosome, chromosome_list in positions.items()}
+
+
+def regions(sorted_positions: np.ndarray) -> List[Tuple[int, int]]:
+    """Merged regions (0-based, end exclusive) around all (sorted) positions"""
+    breaks: np.ndarray = np.nonzero(np.diff(sorted_positions) > MAX_REGION_GAP)[0]
+    starts: np.ndarray = np.concatenate([[sorted_positions[0]], sorted_positions[breaks + 1]])
+    ends: np.ndarray = np.concatenate([sorted_positions[breaks], [sorted_positions[-1]]]) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def coverage(bam: str, chromosome: str, positions: np.ndarray, min_mapq: int) -> np.ndarray:
+    """Summed coverage per percentile of all transcripts of one chromosome"""
+    summed_coverage: np.ndarray = np.zeros(PERCENTILES, dtype=np.int64)
+    order: np.ndarray = np.argsort(positions, axis=None, kind='stable')
+    sorted_positions: np.ndarray = positions.ravel()[order]
+    sorted_percentiles: np.ndarray = np.tile(np.arange(PERCENTILES), positions.shape[0])[order]
+    with pysam.AlignmentFile(bam, 'rb') as bam_file:
+        if chromosome not in bam_file.references:
+            return summed_coverage
+        for region_start, region_end in regions(sorted_positions):
+            block_starts: List[int] = []
+            block_ends: List[int] = []
+            for read in bam_file.fetch(chromosome, region_start, region_end):
+                if read.is_unmapped or read.is_secondary or read.is_qcfail or read.is_duplicate or read.mapping_quality < min_mapq:
+                    continue
+                for block_start, block_end in read.get_blocks():
+                    block_starts.append(block_start)
+                    block_ends.append(block_end)
+            if not block_starts:
+                continue
+            starts: np.ndarray = np.sort(np.array(block_starts, dtype=np.int64))
+            ends: np.ndarray = np.sort(np.array(block_ends, dtype=np.int64))
+            first, last = np.searchsorted(sorted_positions, [region_start, region_end])
+            region_positions: np.ndarray = sorted_positions[first:last]
+            # blocks starting at or before the position minus blocks ending at or before the position
+            position_coverage: np.ndarray = (np.searchsorted(starts, region_positions, side='right')
+                                             - np.searchsorted(ends, region_positions, side='right'))
+            summed_coverage += np.bincount(sorted_percentiles[first:last], weights=position_coverage,
+                                           minlength=PERCENTILES).astype(np.int64)
+    return summed_coverage
+
+
+def plot_curves(sample_names: List[str], coverages: List[np.ndarray], output: Path):
+    figure, ax = plt.subplots(figsize=(8, 6))
+    x: np.ndarray = np.arange(1, PERCENTILES + 1)
+    for sample_name, sample_coverage in zip(sample_names, coverages):
+        value_range = sample_coverage.max() - sample_coverage.min()
+        ax.plot(x, (sample_coverage - sample_coverage.min()) / value_range if value_range else np.zeros(PERCENTILES), label=sample_name)
+    ax.set_xlabel("Gene body percentile (5'->3')")
+    ax.set_ylabel('Coverage')
+    if len(sample_names) <= 20:
+        ax.legend(fontsize='small')
+    figure.savefig(output)
+    plt.close(figure)
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    bam_files: List[str] = args['<bam>']
+    min_mapq: int = int(args['--min-mapq'])
+    transcripts: List[Transcript] = sample_transcripts(read_bed(Path(args['--bed'])), int(args['--features']))
+    if not transcripts:
+        print('No features with a length of at least {} bases in {}'.format(PERCENTILES, args['--bed']), file=sys.stderr)
+    positions: Dict[str, np.ndarray] = chromosome_positions(transcripts)
+
+    tasks: List[Tuple[str, str, np.ndarray, int]] = [(bam, chromosome, chromosome_positions_array, min_mapq)
+                                                     for bam in bam_files for chromosome, chromosome_positions_array in positions.items()]
+    with Pool(max(1, min(int(args['--threads']), len(tasks)))) as pool:
+        results: List[np.ndarray] = pool.starmap(coverage, tasks)
+    coverages: Dict[str, np.ndarray] = {bam: np.zeros(PERCENTILES, dtype=np.int64) for bam in bam_files}
+    for (bam, _, _, _), chromosome_coverage in zip(tasks, results):
+        coverages[bam] += chromosome_coverage
+
+    sample_names: List[str] = [Path(bam).name.replace('.bam', '') for bam in bam_files]
+    prefix: str = args['--output']
+    Path(prefix).parent.mkdir(parents=True, exist_ok=True)
+    with open(prefix + '.geneBodyCoverage.txt', 'w') as output_file:
+        output_file.write('Percentile\t' + '\t'.join(str(i) for i in range(1, PERCENTILES + 1)) + '\n')
+        for sample_name, bam in zip(sample_names, bam_files):
+            output_file.write(sample_name + '\t' + '\t'.join(str(value) for value in coverages[bam].tolist()) + '\n')
+    plot_curves(sample_names, [coverages[bam] for bam in bam_files], Path(prefix + '.geneBodyCoverage.curves.pdf'))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 Convert DESeq2 results to usable data for the large report
 
 Usage:
-    generate_report_data.py --fc_stats <featureCounts_stats> --fc_main_feature <fc_main_feature> --comparison_dir <deseq2_comparison_dir> --visualization <vis_dir> --output <output> --counttable <count_table> [--paired-end]
+    generate_report_data.py --fc_stats <featureCounts_stats> --fc_main_feature <fc_main_feature> --comparison_dir <deseq2_comparison_dir> --visualization <vis_dir> --output <output> --chunks <chunk_dir> --counttable <count_table> [--paired-end] [--threads <threads>] [--parquet <parquet_dir>]
     generate_report_data.py (--version | --help)
 
 Options:
@@ -15,18 +15,34 @@ Options:
     -v <vis_dir> --visualization <vis_dir>                              Folder containing all visualization
     -c <count_table> --counttable <count_table>                         Created count table
     -o <output> --output <output>                                       Created js containing featureCounts statistics
+    --chunks <chunk_dir>                                                Folder for the chunk files of the report data (in the folder of the output)
     --paired-end                                                        Paired-End run, else Single-End
+    --threads <threads>                                                 Number of processes reading the DESeq2 comparisons [default: 1]
+    --parquet <parquet_dir>                                             Parquet tables of the module (used instead of the TSV files if present)
 """
 
-import json
 import math
+import sys
+from multiprocessing import Pool
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
+import numpy as np
+import pandas as pd
 from docopt import docopt
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'global_scripts'))
+from report_data import write_chunks, write_data_js
 
-def parse_featurecounts_stats(stats_file: Path) -> List[Dict[str, str]]:
+# Rows per chunk file of the report data (see global_scripts/report_data.py)
+FEATURECOUNTS_CHUNK_ROWS: int = 500
+LFC_DISTRIBUTION_CHUNK_ROWS: int = 20
+
+
+def parse_featurecounts_stats(stats_file: Path, parquet_dir: Optional[Path] = None) -> List[Dict[str, str]]:
+    if parquet_dir is not None and (parquet_dir / 'counts_summary.parquet').is_file():
+        from columnar_tables import featurecounts_stats
+        return featurecounts_stats(parquet_dir / 'counts_summary.parquet')
     stats_table: List[Dict[str, str]] = []
     with stats_file.open() as file:
         header = next(file).strip().split("\t")
@@ -41,96 +57,95 @@ def parse_featurecounts_stats(stats_file: Path) -> List[Dict[str, str]]:
     return stats_table
 
 
-def parse_deseq2_comparison(comp_folder: Path) -> List[Dict[str, str]]:
-    summary_table: List[Dict[str, str]] = []
-    for child in comp_folder.iterdir():
-        if child.is_file() and str(child).endswith('.csv'):
-            name_splitted: List[str] = child.name[len('deseq2_results_'):-len('.csv')].split('_Vs_')
-            summary: Dict[str, Any] = {
-                'comparison': '{} Vs. {}'.format(name_splitted[0], name_splitted[1]),
-                'adjP_smaller_5': 0,
-                'adjP_smaller_1': 0,
-                'adjP_smaller_0.1': 0,
-                'lowest_lfc': 0,
-                'lowest_lfc_name': '',
-                'highest_lfc': 0,
-                'highest_lfc_name': ''
-            }
-            with child.open() as file:
-                comp_file: List[str] = file.readlines()
-
-            header: List[str] = comp_file[0].strip().split('\t')
-            comp_file = comp_file[1:]
-            for line in comp_file:
-                name, baseMean, log2FC, lfcSE, stat, pvalue, padj = line.strip().split('\t')
-                if padj != 'NA':
-                    padj = float(padj)
-                    if padj < 0.05:
-                        summary['adjP_smaller_5'] += 1
-                    if padj < 0.01:
-                        summary['adjP_smaller_1'] += 1
-                    if padj < 0.001:
-                        summary['adjP_smaller_0.1'] += 1
-                if log2FC != 'NA':
-                    log2FC = float(log2FC)
-                    if log2FC > summary['highest_lfc']:
-                        summary['highest_lfc'] = log2FC
-                        summary['highest_lfc_name'] = name.strip('"')
-                    elif log2FC < summary['lowest_lfc']:
-                        summary['lowest_lfc'] = log2FC
-                        summary['lowest_lfc_name'] = name.strip('"')
-
-            lfc_dist_label: List[str] = []
-            stepsize: int = 5    # real_stepsize = stepsize / 10
-            for i in range(min(0, math.floor(summary['lowest_lfc'])*10), max(0, math.ceil(summary['highest_lfc'])*10), stepsize):
-                lfc_dist_label.append(str(i / 10))
-            lfc_dist_data: List[float] = [0 for x in range(len(lfc_dist_label))]
-            for line in comp_file:
-                name, baseMean, log2FC, lfcSE, stat, pvalue, padj = line.strip().split('\t')
-                if log2FC != 'NA':
-                    log2FC: float = float(log2FC)
-                    baseline: float = (float(log2FC) - float(lfc_dist_label[0])) * 10
-                    bucket: int = int(baseline // stepsize)
-                    lfc_dist_data[bucket] += 1
-            lfc_dist_label.append(str(float(lfc_dist_label[-1]) + 0.5))  # need one additional label for x-axis
-            summary['lfc_distribution'] = {'label': lfc_dist_label, 'data': lfc_dist_data}
-
-            summary_table.append(summary)
-
-    return summary_table
+def comparison_name(comparison_file: Path) -> str:
+    name_splitted: List[str] = comparison_file.stem[len('deseq2_results_'):].split('_Vs_')
+    return '{} Vs. {}'.format(name_splitted[0], name_splitted[1])
+
+
+def read_comparison(comparison_file: Path) -> pd.DataFrame:
+    """Name, log2FoldChange and padj of a DESeq2 result table (first header field is empty) or its Parquet file"""
+    if comparison_file.suffix == '.parquet':
+        return pd.read_parquet(comparison_file, columns=['gene_id', 'log2FoldChange', 'padj']).set_axis(['name', 'log2FC', 'padj'], axis=1)
+    return pd.read_csv(comparison_file, sep='\t', header=None, skiprows=1, usecols=[0, 2, 6], names=['name', 'log2FC', 'padj'],
+                       dtype={'name': str, 'log2FC': np.float64, 'padj': np.float64}, keep_default_na=False,
+                       na_values={'log2FC': ['NA'], 'padj': ['NA']}, float_precision='round_trip')
+
+
+def summarize_comparison(comparison_file: Path) -> Dict[str, Any]:
+    table: pd.DataFrame = read_comparison(comparison_file)
+    padj: np.ndarray = table['padj'].to_numpy()
+    padj = padj[~np.isnan(padj)]
+    summary: Dict[str, Any] = {
+        'comparison': comparison_name(comparison_file),
+        'adjP_smaller_5': int(np.count_nonzero(padj < 0.05)),
+        'adjP_smaller_1': int(np.count_nonzero(padj < 0.01)),
+        'adjP_smaller_0.1': int(np.count_nonzero(padj < 0.001)),
+        'lowest_lfc': 0,
+        'lowest_lfc_name': '',
+        'highest_lfc': 0,
+        'highest_lfc_name': ''
+    }
+
+    lfc_defined: np.ndarray = ~np.isnan(table['log2FC'].to_numpy())
+    log2FC: np.ndarray = table['log2FC'].to_numpy()[lfc_defined]
+    names: np.ndarray = table['name'].to_numpy()[lfc_defined]
+    if log2FC.size:
+        # first gene with the most extreme fold change, the limits stay 0 if all fold changes are on one side
+        highest: int = int(np.argmax(log2FC))
+        lowest: int = int(np.argmin(log2FC))
+        if log2FC[highest] > 0:
+            summary['highest_lfc'] = float(log2FC[highest])
+            summary['highest_lfc_name'] = names[highest].strip('"')
+        if log2FC[lowest] < 0:
+            summary['lowest_lfc'] = float(log2FC[lowest])
+            summary['lowest_lfc_name'] = names[lowest].strip('"')
+
+    stepsize: int = 5    # real_stepsize = stepsize / 10
+    lfc_dist_label: List[str] = [str(i / 10) for i in range(min(0, math.floor(summary['lowest_lfc'])*10),
+                                                            max(0, math.ceil(summary['highest_lfc'])*10), stepsize)]
+    if not lfc_dist_label:
+        lfc_dist_label = ['0.0']
+    # histogram of the fold changes with buckets of the label width, the highest fold change falls into the last bucket
+    buckets: np.ndarray = np.floor_divide((log2FC - float(lfc_dist_label[0])) * 10, stepsize).astype(np.int64)
+    buckets = np.minimum(buckets, len(lfc_dist_label) - 1)
+    lfc_dist_data: List[int] = np.bincount(buckets, minlength=len(lfc_dist_label)).tolist()
+    lfc_dist_label.append(str(float(lfc_dist_label[-1]) + 0.5))  # need one additional label for x-axis
+    summary['lfc_distribution'] = {'label': lfc_dist_label, 'data': lfc_dist_data}
+    return summary
+
+
+def parse_deseq2_comparison(comp_folder: Path, threads: int = 1, parquet_dir: Optional[Path] = None) -> List[Dict[str, Any]]:
+    suffix: str = '.csv'
+    if parquet_dir is not None and (parquet_dir / 'deseq2_comparisons').is_dir():
+        comp_folder, suffix = parquet_dir / 'deseq2_comparisons', '.parquet'
+    comparison_files: List[Path] = [child for child in comp_folder.iterdir() if child.is_file() and str(child).endswith(suffix)]
+    if threads <= 1 or len(comparison_files) <= 1:
+        return [summarize_comparison(comparison_file) for comparison_file in comparison_files]
+    with Pool(min(threads, len(comparison_files))) as pool:
+        return pool.map(summarize_comparison, comparison_files)
 
 
 def parse_feat_assignment_folder(folder: Path) -> Dict[str, str]:
     return {file.name[:-len('.svg')]: file.name for file in folder.iterdir() if file.name.endswith('svg')}
 
 
-def generate_report_data(output_file: Path, fc_file: Path, comnparison_folder: Path, vis_folder: Path, is_paired_end: bool, fc_main_feature: str, count_table_file: Path):
-    featurecounts: List[Dict[str, str]] = parse_featurecounts_stats(fc_file)
-    deseq2_summary: List[Dict[str, str]] = parse_deseq2_comparison(comnparison_folder.resolve())
+def generate_report_data(output_file: Path, fc_file: Path, comnparison_folder: Path, vis_folder: Path, is_paired_end: bool, fc_main_feature: str, count_table_file: Path, chunk_dir: Path, threads: int = 1, parquet_dir: Optional[Path] = None):
+    featurecounts: List[Dict[str, str]] = parse_featurecounts_stats(fc_file, parquet_dir)
+    deseq2_summary: List[Dict[str, str]] = parse_deseq2_comparison(comnparison_folder.resolve(), threads, parquet_dir)
     feature_assignemnt: Dict[str, str] = parse_feat_assignment_folder(vis_folder / "feature_assignments")
 
-    with output_file.open('w') as f:
-        f.write('window.Curare.deseq2 = (function() {\n')
-        f.write('  const paired_end = {}\n'.format("true" if is_paired_end else "false"))
-        f.write('  const fc_main_feature = "{}"\n'.format(fc_main_feature))
-        f.write('  const count_table_path = "{}"\n'.format(count_table_file))
-        f.write('  const deseq2_dir_path = "{}"\n'.format(comnparison_folder))
-
-
-        f.write('  const featurecounts = ')
-        f.write(json.dumps(featurecounts, indent=2).replace('\n', '\n  '))
-        f.write('\n')
-
-        f.write('  const deseq2_summary = ')
-        f.write(json.dumps(deseq2_summary, indent=2).replace('\n', '\n  '))
-        f.write('\n')
-
-        f.write('  const feature_assignment = ')
-        f.write(json.dumps(feature_assignemnt, indent=2).replace('\n', '\n  '))
-        f.write('\n')
-
-        f.write('  return {paired_end: paired_end, fc_main_feature: fc_main_feature, featurecounts: featurecounts, deseq2_summary: deseq2_summary, feature_assignment: feature_assignment, count_table_path: count_table_path, deseq2_dir_path: deseq2_dir_path};\n')
-        f.write('}());')
+    # the fold change distributions of the comparisons are loaded by the report page when they are shown
+    lfc_distributions: List[Dict[str, Any]] = [comparison.pop('lfc_distribution') for comparison in deseq2_summary]
+    write_data_js(output_file, 'deseq2', {
+        'paired_end': is_paired_end,
+        'fc_main_feature': fc_main_feature,
+        'count_table_path': str(count_table_file),
+        'deseq2_dir_path': str(comnparison_folder),
+        'featurecounts': write_chunks(featurecounts, output_file.parent, chunk_dir, 'featurecounts', FEATURECOUNTS_CHUNK_ROWS),
+        'deseq2_summary': deseq2_summary,
+        'lfc_distributions': write_chunks(lfc_distributions, output_file.parent, chunk_dir, 'lfc_distributions', LFC_DISTRIBUTION_CHUNK_ROWS),
+        'feature_assignment': feature_assignemnt
+    })
 
 
 def main():
@@ -141,9 +156,11 @@ def main():
     output_file = Path(args["--output"]).resolve()
     visualization = Path(args["--visualization"]).resolve()
     count_table_file: Path = Path(args["--counttable"])
+    chunk_dir: Path = Path(args["--chunks"]).resolve()
+    parquet_dir: Optional[Path] = Path(args["--parquet"]).resolve() if args["--parquet"] else None
 
 
-    generate_report_data(output_file, fc_file, comparison_dir, visualization, args["--paired-end"], fc_main_feature, count_table_file)
+    generate_report_data(output_file, fc_file, comparison_dir, visualization, args["--paired-end"], fc_main_feature, count_table_file, chunk_dir, int(args["--threads"]), parquet_dir)
 
 
 if __name__ == '__main__':
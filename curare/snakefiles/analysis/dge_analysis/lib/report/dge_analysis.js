@@ -1,9 +1,12 @@
 'use strict';
 
+// Chunk files of the module data are loaded from here (see js/data_loader.js)
+const DATA_PATH = '../data/'
+
 new Vue({
     el: '#deseq2',
     data: {
-        counttable: Curare.deseq2.featurecounts,
+        counttable: [],
         deseq2_comparisons: Curare.deseq2.deseq2_summary,
         feature_assignment: Curare.deseq2.feature_assignment,
         paired_end: Curare.deseq2.paired_end,
@@ -162,7 +165,8 @@ new Vue({
                         break
                     }
                 }
-                if (all_zero) {
+                // the rows are loaded after the page (see mounted)
+                if (all_zero && data.length > 0) {
                     col['visible'] = false
                 }
             }
@@ -273,56 +277,58 @@ new Vue({
         create_lfc_distribution_chart() {
             const vue = this
             const active_menu = vue.active_comparison_menu
-            const comparison = vue.deseq2_comparisons[vue.deseq2_keys[active_menu][1]]
-            const data_label = comparison['lfc_distribution']['label']
-            const data = comparison['lfc_distribution']['data']
-
-            if (typeof comparison === 'undefined' || typeof data_label === 'undefined' || typeof data === 'undefined') {
-                return
-            }
+            const comparison_index = vue.deseq2_keys[active_menu][1]
+            Curare.loadRow(DATA_PATH, Curare.deseq2.lfc_distributions, comparison_index).then(function (lfc_distribution) {
+                // another comparison was selected while loading
+                if (vue.active_comparison_menu !== active_menu || typeof lfc_distribution === 'undefined') {
+                    return
+                }
+                const data_label = lfc_distribution['label']
+                const data = lfc_distribution['data']
 
-            this.createChart(
-                'lfc_distribution',
-                'bar',
-                {
-                    labels: data_label,
-                    datasets: [{
-                        data: data,
-                        backgroundColor: 'rgba(72,120,208,1)',
-                        barPercentage: 0.95,
-                        categoryPercentage: 1,
-                        xAxisID: "xA"
-                    }],
-                },
-                {
-                    plugins: {
-                        legend: {
-                            display: false
-                        }
+                vue.createChart(
+                    'lfc_distribution',
+                    'bar',
+                    {
+                        labels: data_label,
+                        datasets: [{
+                            data: data,
+                            backgroundColor: 'rgba(72,120,208,1)',
+                            barPercentage: 0.95,
+                            categoryPercentage: 1,
+                            xAxisID: "xA"
+                        }],
                     },
-                    scales: {
-                        xA: {
-                            display: false,
-                            position: 'bottom',
-                            max: data_label.length - 2,
-                        },
-                        x: {
-                            display: true,
-                            offset: false,
-                            grid: {
-      	                        offset: false
+                    {
+                        plugins: {
+                            legend: {
+                                display: false
                             }
                         },
-                        y: {
-                            title: {
+                        scales: {
+                            xA: {
+                                display: false,
+                                position: 'bottom',
+                                max: data_label.length - 2,
+                            },
+                            x: {
                                 display: true,
-                                text: '#Features',
+                                offset: false,
+                                grid: {
+          	                        offset: false
+                                }
                             },
-                            beginAtZero: true
+                            y: {
+                                title: {
+                                    display: true,
+                                    text: '#Features',
+                                },
+                                beginAtZero: true
+                            }
                         }
                     }
-                }
-            )
+                )
+            })
 
         }
     },
@@ -333,6 +339,9 @@ new Vue({
     },
     mounted: function () {
         const vue = this
+        Curare.loadRows(DATA_PATH, Curare.deseq2.featurecounts).then(function (rows) {
+            vue.counttable = rows
+        })
         this.$nextTick(function () {
             this.create_lfc_distribution_chart()
         })
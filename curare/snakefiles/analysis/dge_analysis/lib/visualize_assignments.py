@@ -1,8 +1,10 @@
 """
 Create barchart from multiple count tables
 
+One SVG file per sample (<sample>.svg) or, with --combined, the charts of all samples in one SVG file (all_samples.svg).
+
 Usage:
-    generate_report_data.py --input <count_table_folder> --output <image_output>
+    generate_report_data.py --input <count_table_folder> --output <image_output> [--threads <threads>] [--combined]
     generate_report_data.py (--version | --help)
 
 Options:
@@ -11,6 +13,8 @@ Options:
 
     -i <count_table_folder> --input <count_table_folder>           Directory containing all count tables
     -o <image_output> --output <image_output>                      SVG output file
+    -t <threads> --threads <threads>                               Number of processes [default: 1]
+    --combined                                                     Write all samples into one SVG file
 """
 
 from pathlib import Path
@@ -22,13 +26,13 @@ import matplotlib
 matplotlib.use('Agg')
 matplotlib.rcParams.update({'figure.autolayout': True})
 matplotlib.rcParams.update({'font.size': 12})
-import matplotlib.pyplot as plt
 import pandas
-import numpy as np
 
 
 from docopt import docopt
-from matplotlib.colors import ListedColormap
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'global_scripts'))
+from plotting import BarChart, render_bar_charts, render_small_multiples
 
 PP = pprint.PrettyPrinter(indent=2)
 
@@ -78,15 +82,18 @@ def parse_input(files: List[Path]) -> Dict[str, Dict[str, int]]:
     return assigned_alignments
 
 
-def print_visualizations(assignment_data: Dict[str, Dict[str, int]], output_folder: Path):
+def print_visualizations(assignment_data: Dict[str, Dict[str, int]], output_folder: Path, threads: int = 1, combined: bool = False):
+    charts: List[BarChart] = []
     for sample in assignment_data.keys():
         keys: List[str] = list(assignment_data[sample].keys())
         values: List[int] = [assignment_data[sample][key]for key in keys]
         df: pandas.DataFrame = pandas.DataFrame({'keys': keys, 'values': values})
-        ax: plt.Axes = df.plot.bar(x='keys', y='values', legend=False, log=True, color='#4878d0')
-        ax.set_xlabel("")
-        ax.set_ylabel("# Assigned Reads")
-        plt.savefig(output_folder / (sample + '.svg'))
+        charts.append(BarChart(df, output_folder / (sample + '.svg'), ylabel="# Assigned Reads",
+                               x='keys', y='values', legend=False, log=True, color='#4878d0'))
+    if combined:
+        render_small_multiples(charts, output_folder / 'all_samples.svg')
+    else:
+        render_bar_charts(charts, threads)
 
 
 def main():
@@ -102,7 +109,7 @@ def main():
 
     selected_files: List[Path] = select_files(input_dir)
     assignment_data: Dict[str, Dict[str, int]] = parse_input(selected_files)
-    print_visualizations(assignment_data, output_folder)
+    print_visualizations(assignment_data, output_folder, int(args["--threads"]), args["--combined"])
 
 
 if __name__ == '__main__':
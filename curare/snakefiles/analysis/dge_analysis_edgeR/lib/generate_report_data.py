@@ -2,7 +2,7 @@
 Convert edgeR results to usable data for the large report
 
 Usage:
-    generate_report_data.py --fc_stats <featureCounts_stats> --fc_main_feature <fc_main_feature> --comparison_dir <edger_comparison_dir> --visualization <vis_dir> --output <output> --counttable <count_table> [--paired-end]
+    generate_report_data.py --fc_stats <featureCounts_stats> --fc_main_feature <fc_main_feature> --comparison_dir <edger_comparison_dir> --visualization <vis_dir> --output <output> --chunks <chunk_dir> --counttable <count_table> [--paired-end]
     generate_report_data.py (--version | --help)
 
 Options:
@@ -15,16 +15,24 @@ Options:
     -v <vis_dir> --visualization <vis_dir>                              Folder containing all visualization
     -c <count_table> --counttable <count_table>                         Created count table
     -o <output> --output <output>                                       Created js containing featureCounts statistics
+    --chunks <chunk_dir>                                                Folder for the chunk files of the report data (in the folder of the output)
     --paired-end                                                        Paired-End run, else Single-End
 """
 
-import json
 import math
+import sys
 from pathlib import Path
 from typing import Any, Dict, List
 
 from docopt import docopt
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'global_scripts'))
+from report_data import write_chunks, write_data_js
+
+# Rows per chunk file of the report data (see global_scripts/report_data.py)
+FEATURECOUNTS_CHUNK_ROWS: int = 500
+LFC_DISTRIBUTION_CHUNK_ROWS: int = 20
+
 
 def parse_featurecounts_stats(stats_file: Path) -> List[Dict[str, str]]:
     stats_table: List[Dict[str, str]] = []
@@ -104,33 +112,23 @@ def parse_feat_assignment_folder(folder: Path) -> Dict[str, str]:
     return {file.name[:-len('.svg')]: file.name for file in folder.iterdir() if file.name.endswith('svg')}
 
 
-def generate_report_data(output_file: Path, fc_file: Path, comnparison_folder: Path, vis_folder: Path, is_paired_end: bool, fc_main_feature: str, count_table_file: Path):
+def generate_report_data(output_file: Path, fc_file: Path, comnparison_folder: Path, vis_folder: Path, is_paired_end: bool, fc_main_feature: str, count_table_file: Path, chunk_dir: Path):
     featurecounts: List[Dict[str, str]] = parse_featurecounts_stats(fc_file)
     edger_summary: List[Dict[str, str]] = parse_edger_comparison(comnparison_folder.resolve())
     feature_assignemnt: Dict[str, str] = parse_feat_assignment_folder(vis_folder / "feature_assignments")
 
-    with output_file.open('w') as f:
-        f.write('window.Curare.edger = (function() {\n')
-        f.write('  const paired_end = {}\n'.format("true" if is_paired_end else "false"))
-        f.write('  const fc_main_feature = "{}"\n'.format(fc_main_feature))
-        f.write('  const count_table_path = "{}"\n'.format(count_table_file))
-        f.write('  const edger_dir_path = "{}"\n'.format(comnparison_folder))
-
-
-        f.write('  const featurecounts = ')
-        f.write(json.dumps(featurecounts, indent=2).replace('\n', '\n  '))
-        f.write('\n')
-
-        f.write('  const edger_summary = ')
-        f.write(json.dumps(edger_summary, indent=2).replace('\n', '\n  '))
-        f.write('\n')
-
-        f.write('  const feature_assignment = ')
-        f.write(json.dumps(feature_assignemnt, indent=2).replace('\n', '\n  '))
-        f.write('\n')
-
-        f.write('  return {paired_end: paired_end, fc_main_feature: fc_main_feature, featurecounts: featurecounts, edger_summary: edger_summary, feature_assignment: feature_assignment, count_table_path: count_table_path, edger_dir_path: edger_dir_path};\n')
-        f.write('}());')
+    # the fold change distributions of the comparisons are loaded by the report page when they are shown
+    lfc_distributions: List[Dict[str, Any]] = [comparison.pop('lfc_distribution') for comparison in edger_summary]
+    write_data_js(output_file, 'edger', {
+        'paired_end': is_paired_end,
+        'fc_main_feature': fc_main_feature,
+        'count_table_path': str(count_table_file),
+        'edger_dir_path': str(comnparison_folder),
+        'featurecounts': write_chunks(featurecounts, output_file.parent, chunk_dir, 'featurecounts', FEATURECOUNTS_CHUNK_ROWS),
+        'edger_summary': edger_summary,
+        'lfc_distributions': write_chunks(lfc_distributions, output_file.parent, chunk_dir, 'lfc_distributions', LFC_DISTRIBUTION_CHUNK_ROWS),
+        'feature_assignment': feature_assignemnt
+    })
 
 
 def main():
@@ -141,9 +139,10 @@ def main():
     output_file = Path(args["--output"]).resolve()
     visualization = Path(args["--visualization"]).resolve()
     count_table_file: Path = Path(args["--counttable"])
+    chunk_dir: Path = Path(args["--chunks"]).resolve()
 
 
-    generate_report_data(output_file, fc_file, comparison_dir, visualization, args["--paired-end"], fc_main_feature, count_table_file)
+    generate_report_data(output_file, fc_file, comparison_dir, visualization, args["--paired-end"], fc_main_feature, count_table_file, chunk_dir)
 
 
 if __name__ == '__main__':
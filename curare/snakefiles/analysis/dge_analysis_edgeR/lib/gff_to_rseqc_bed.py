@@ -1,79 +1,64 @@
 #! /usr/bin/env python3
 
 import argparse
-from typing import Dict
+import os
+import shutil
 import sys
+import tempfile
+
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'global_scripts'))
+from gff_index import annotation_cache_directory, load_index
+from gff_reader import Feature, read_features
+
+REVERSE_STRAND: Dict[str, str] = {"+": "-", "-": "+"}
 
-def main(gff_file: str, feature_type: str, reverse_strand: bool):
-    with open(gff_file, 'r') as gff:
-        for line in gff:
-            try:
-                if line.startswith("#"):
-                    continue
-                columns = line.strip().split("\t")
-                if len(columns) != 9 or columns[2] != feature_type:
-                    continue
 
-                parsed_attributes = parse_attributes(columns[8])
-                reverse_strand_dict: Dict[str, str] = {"+": "-", "-": "+"}
-                print("{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}".format(
-                    columns[0],
-                    columns[3],
-                    columns[4],
-                    parsed_attributes.get("ID", "-"),
-                    max(min(int(columns[4]), 1000), 0),
-                    reverse_strand_dict[columns[6]] if reverse_strand else columns[6],
-                    columns[3],
-                    columns[4],
-                    "255,0,0",
-                    1,
-                    int(columns[4])-int(columns[3]),
-                    0
-                ))
-            except Exception as e:
-                print('Error while reading GFF file "{}"'.format(gff_file), file=sys.stderr)
-                print(e, file=sys.stderr)
-                sys.exit(1)
+def bed_line(feature: Feature, reverse_strand: bool) -> str:
+    start: str = str(feature.start)
+    end: str = str(feature.end)
+    return "\t".join([feature.seqid, start, end, feature.attributes.get("ID", "-"), str(max(min(feature.end, 1000), 0)),
+                      REVERSE_STRAND[feature.strand] if reverse_strand else feature.strand, start, end, "255,0,0", "1",
+                      str(feature.end - feature.start), "0"]) + "\n"
 
 
-def parse_attributes(attributes: str, attribute_separator: str=';', key_value_separator: str='=', quotes: str='"') -> Dict[str,str]:
-    state: str = 'first_letter_key'  # first_letter_key, key, value, quotes
-    splitted_attributes: Dict[str, str] = {}
-    key: str = ""
-    value: str = ""
+def main(gff_file: str, feature_type: str, reverse_strand: bool):
+    try:
+        for feature in read_features(Path(gff_file), feature_types=[feature_type], attributes=["ID"]):
+            sys.stdout.write(bed_line(feature, reverse_strand))
+    except Exception as e:
+        print('Error while reading GFF file "{}"'.format(gff_file), file=sys.stderr)
+        print(e, file=sys.stderr)
+        sys.exit(1)
 
-    for char in attributes:
-        if state == 'first_letter_key':
-            if char.isspace() or char in [attribute_separator, key_value_separator]:
-                continue
-            else:
-                key += char
-                state = 'key'
-        elif state == 'key':
-            if char == key_value_separator:
-                state = 'value'
-            else:
-                key += char
-        elif state == 'value':
-            if char == quotes:
-                value += char
-                state = 'quotes'
-            elif char == attribute_separator:
-                splitted_attributes[key] = value
-                key = ''
-                value = ''
-                state = 'first_letter_key'
-            else:
-                value += char
-        else:  # quotes
-            if char == quotes:
-                value += char
-                state = 'value'
-            else:
-                value += char
-    if state == 'value':
-        splitted_attributes[key] = value
-    return splitted_attributes
+
+def write_all_types(gff_file: str, feature_types: List[str], reverse_strand: bool, output_dir: str):
+    """
+    Write ref_<feature type>.bed of all feature types in one pass over the GFF. The BED files are cached in the cache
+    directory of the annotation (see global_scripts/gff_index.py) and copied from there by later runs.
+    """
+    gff: Path = Path(gff_file)
+    cache_directory: Path = annotation_cache_directory(gff) / 'rseqc_bed_{}{}'.format(load_index(gff)['sha256'][:16], '_reverse' if reverse_strand else '')
+    missing_types: List[str] = [feature_type for feature_type in feature_types if not (cache_directory / 'ref_{}.bed'.format(feature_type)).is_file()]
+    if missing_types:
+        bed_lines: Dict[str, List[str]] = {feature_type: [] for feature_type in missing_types}
+        try:
+            for feature in read_features(gff, feature_types=missing_types, attributes=["ID"]):
+                bed_lines[feature.type].append(bed_line(feature, reverse_strand))
+        except Exception as e:
+            print('Error while reading GFF file "{}"'.format(gff_file), file=sys.stderr)
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        cache_directory.mkdir(exist_ok=True)
+        for feature_type, lines in bed_lines.items():
+            with tempfile.NamedTemporaryFile('w', dir=str(cache_directory), delete=False) as bed_file:
+                bed_file.writelines(lines)
+            os.replace(bed_file.name, str(cache_directory / 'ref_{}.bed'.format(feature_type)))
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    for feature_type in feature_types:
+        shutil.copyfile(str(cache_directory / 'ref_{}.bed'.format(feature_type)), str(Path(output_dir) / 'ref_{}.bed'.format(feature_type)))
 
 
 if __name__ == '__main__':
@@ -81,7 +66,9 @@ if __name__ == '__main__':
 
     required = parser.add_argument_group("Required arguments")
     required.add_argument("-g", "--gff", required=True, help="GFF File")
-    required.add_argument("-t", "--type", required=True, help="GFF feature type")
+    required.add_argument("-t", "--type", help="GFF feature type (BED is written to stdout)")
+    required.add_argument("--types", help="Comma-separated GFF feature types. Writes <output-dir>/ref_<type>.bed for each type in one pass over the GFF")
+    required.add_argument("-o", "--output-dir", help="Output directory of --types")
     required.add_argument("-r", "--reverse", action='store_true', help="Reverse strand of features")
     try:
         args = parser.parse_args()
@@ -89,5 +76,11 @@ if __name__ == '__main__':
         print("\n" + str(sys.exc_info()[1]) + "\n")
         parser.print_help()
         exit(1)
-    main(args.gff, args.type, args.reverse)
-
+    if args.types is not None:
+        if args.output_dir is None:
+            parser.error("--types requires --output-dir")
+        write_all_types(args.gff, [feature_type for feature_type in args.types.split(",") if feature_type], args.reverse, args.output_dir)
+    elif args.type is not None:
+        main(args.gff, args.type, args.reverse)
+    else:
+        parser.error("one of --type or --types is required")
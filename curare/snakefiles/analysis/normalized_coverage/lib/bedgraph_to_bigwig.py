@@ -0,0 +1,73 @@
+"""
+Convert a bedGraph file of bamCoverage into bigWig, so both formats are created from one coverage computation.
+
+The chromosome sizes are taken from the header of the BAM file. Intervals must be grouped by chromosome (in the order of
+the BAM header, like the bedGraph output of bamCoverage) and sorted by start position. They are added to the bigWig
+file in blocks of numpy arrays.
+
+Usage:
+    bedgraph_to_bigwig.py --bam <bam> --bedgraph <bedgraph> --output <bigwig>
+    bedgraph_to_bigwig.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    -b <bam> --bam <bam>                        BAM file of the coverage (chromosome sizes)
+    -i <bedgraph> --bedgraph <bedgraph>         bedGraph file
+    -o <bigwig> --output <bigwig>               bigWig file
+"""
+
+from docopt import docopt
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import pyBigWig
+import pysam
+
+# Number of intervals added to the bigWig file at once
+BLOCK_SIZE: int = 100000
+
+
+def chromosome_sizes(bam: Path) -> List[Tuple[str, int]]:
+    with pysam.AlignmentFile(str(bam), 'rb') as bam_file:
+        return list(zip(bam_file.references, bam_file.lengths))
+
+
+def bedgraph_to_bigwig(bam: Path, bedgraph: Path, output: Path):
+    bigwig = pyBigWig.open(str(output), 'w')
+    bigwig.addHeader(chromosome_sizes(bam), maxZooms=10)
+    chromosome: str = ''
+    starts: List[int] = []
+    ends: List[int] = []
+    values: List[float] = []
+
+    def add_block():
+        if starts:
+            bigwig.addEntries([chromosome] * len(starts), np.array(starts, dtype=np.int64), ends=np.array(ends, dtype=np.int64),
+                              values=np.array(values, dtype=np.float64))
+            starts.clear()
+            ends.clear()
+            values.clear()
+
+    with bedgraph.open() as bedgraph_file:
+        for line in bedgraph_file:
+            fields: List[str] = line.split()
+            if fields[0] != chromosome or len(starts) == BLOCK_SIZE:
+                add_block()
+                chromosome = fields[0]
+            starts.append(int(fields[1]))
+            ends.append(int(fields[2]))
+            values.append(float(fields[3]))
+    add_block()
+    bigwig.close()
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    bedgraph_to_bigwig(Path(args['--bam']), Path(args['--bedgraph']), Path(args['--output']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Normalized coverage of a BAM file as bedGraph and/or bigWig, computed in-process without deepTools.
+
+The chromosomes are split into windows of about 10 Mb, which are read through the BAM index (BAI or CSI) and counted
+in a process pool. Like bamCoverage (without --extendReads), every aligned block of a read adds one to all bins it
+overlaps, and a read is counted only once per bin. Unmapped reads are skipped. Normalization methods (see deepTools):
+    CPM:    count / (mapped reads / 10^6)
+    RPKM:   count / (mapped reads / 10^6 * bin size / 1000)
+    BPM:    count / (sum of all bin counts / 10^6)
+    None:   count
+The number of mapped reads is taken from the index statistics. Consecutive bins with the same value are written as one
+interval.
+
+Usage:
+    coverage.py --bam <bam> [--bedgraph <bedgraph>] [--bigwig <bigwig>] [--bin-size <bin_size>] [--normalize <method>] [--threads <threads>]
+    coverage.py (--version | --help)
+
+Options:
+    -h --help               Show this help message and exit
+    --version               Show version and exit
+
+    -b <bam> --bam <bam>                        Sorted and indexed BAM file
+    --bedgraph <bedgraph>                       Output bedGraph file
+    --bigwig <bigwig>                           Output bigWig file
+    -s <bin_size> --bin-size <bin_size>         Bin size [default: 1]
+    -n <method> --normalize <method>            Normalization method: CPM, RPKM, BPM or None [default: None]
+    -t <threads> --threads <threads>            Number of processes [default: 1]
+"""
+
+import sys
+
+from docopt import docopt
+from multiprocessing import Pool
+from pathlib import Path
+from typing import List, Optional, TextIO, Tuple
+
+import numpy as np
+import pyBigWig
+import pysam
+
+NORMALIZE_METHODS: List[str] = ['CPM', 'RPKM', 'BPM', 'None']
+WINDOW_SIZE: int = 10000000
+
+
+class Window:
+    def __init__(self, chromosome: str, start: int, end: int):
+        self.chromosome: str = chromosome
+        # 0-based, end exclusive, start is a multiple of the bin size
+        self.start: int = start
+        self.end: int = end
+
+
+def windows(bam: Path, bin_size: int) -> List[Window]:
+    window_size: int = -(-WINDOW_SIZE // bin_size) * bin_size
+    with pysam.AlignmentFile(str(bam), 'rb') as bam_file:
+        return [Window(chromosome, start, min(start + window_size, length))
+                for chromosome, length in zip(bam_file.references, bam_file.lengths)
+                for start in range(0, length, window_size)]
+
+
+def mapped_reads(bam: Path) -> int:
+    with pysam.AlignmentFile(str(bam), 'rb') as bam_file:
+        return bam_file.mapped
+
+
+def window_coverage(bam: Path, window: Window, bin_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Read counts of the bins of a window, run-length encoded (start bins of the runs relative to the window, counts)"""
+    first_bin: int = window.start // bin_size
+    bins: int = -(-(window.end - window.start) // bin_size)
+    read_ids: List[int] = []
+    block_starts: List[int] = []
+    block_ends: List[int] = []
+    with pysam.AlignmentFile(str(bam), 'rb') as bam_file:
+        for read_id, read in enumerate(bam_file.fetch(window.chromosome, window.start, window.end)):
+            if read.is_unmapped:
+                continue
+            for block_start, block_end in read.get_blocks():
+                read_ids.append(read_id)
+                block_starts.append(block_start)
+                block_ends.append(block_end)
+    counts: np.ndarray = np.zeros(bins + 1, dtype=np.int64)
+    if block_starts:
+        ids: np.ndarray = np.array(read_ids, dtype=np.int64)
+        # first and last bin of each block (relative to the window)
+        start_bins: np.ndarray = np.array(block_starts, dtype=np.int64) // bin_size - first_bin
+        end_bins: np.ndarray = (np.array(block_ends, dtype=np.int64) - 1) // bin_size - first_bin
+        # count a read only once per bin: blocks (sorted by position) start after the last bin of the previous block
+        # of the same read
+        same_read: np.ndarray = np.concatenate([[False], ids[1:] == ids[:-1]])
+        previous_end_bins: np.ndarray = np.concatenate([[-1], end_bins[:-1]])
+        start_bins = np.where(same_read, np.maximum(start_bins, previous_end_bins + 1), start_bins)
+        start_bins = np.maximum(start_bins, 0)
+        end_bins = np.minimum(end_bins, bins - 1)
+        counted: np.ndarray = start_bins <= end_bins
+        counts += np.bincount(start_bins[counted], minlength=bins + 1)
+        counts -= np.bincount(end_bins[counted] + 1, minlength=bins + 1)
+    counts = np.cumsum(counts[:-1])
+    run_starts: np.ndarray = np.concatenate([[0], np.nonzero(np.diff(counts))[0] + 1])
+    return run_starts, counts[run_starts]
+
+
+def coverage_task(task: Tuple[Path, Window, int]) -> Tuple[np.ndarray, np.ndarray]:
+    return window_coverage(*task)
+
+
+def scale_factor(method: str, mapped: int, bin_count_sum: int, bin_size: int) -> float:
+    if method == 'CPM':
+        return 1e6 / mapped if mapped else 0.0
+    if method == 'RPKM':
+        return 1e9 / (mapped * bin_size) if mapped else 0.0
+    if method == 'BPM':
+        return 1e6 / bin_count_sum if bin_count_sum else 0.0
+    return 1.0
+
+
+def run_intervals(window: Window, bin_size: int, run_starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    starts: np.ndarray = window.start + run_starts * bin_size
+    ends: np.ndarray = np.append(starts[1:], window.end)
+    return starts, ends
+
+
+def write_coverage(bam: Path, bedgraph: Optional[Path], bigwig: Optional[Path], bin_size: int, method: str, threads: int):
+    bam_windows: List[Window] = windows(bam, bin_size)
+    with Pool(max(1, min(threads, len(bam_windows)))) as pool:
+        results: List[Tuple[np.ndarray, np.ndarray]] = pool.map(coverage_task, [(bam, window, bin_size) for window in bam_windows], chunksize=1)
+
+    bin_count_sum: int = 0
+    if method == 'BPM':
+        for window, (run_starts, run_counts) in zip(bam_windows, results):
+            run_bins: np.ndarray = np.diff(np.append(run_starts, -(-(window.end - window.start) // bin_size)))
+            bin_count_sum += int((run_bins * run_counts).sum())
+    scale: float = scale_factor(method, mapped_reads(bam), bin_count_sum, bin_size)
+
+    bedgraph_file: Optional[TextIO] = bedgraph.open('w') if bedgraph else None
+    bigwig_file = None
+    if bigwig:
+        bigwig_file = pyBigWig.open(str(bigwig), 'w')
+        with pysam.AlignmentFile(str(bam), 'rb') as bam_file:
+            bigwig_file.addHeader(list(zip(bam_file.references, bam_file.lengths)), maxZooms=10)
+    # the last run of a window is written with the next window, which may continue it
+    pending: Optional[Tuple[str, int, int, float]] = None
+    for window, (run_starts, run_counts) in zip(bam_windows, results):
+        starts, ends = run_intervals(window, bin_size, run_starts)
+        values: np.ndarray = run_counts * scale
+        if pending is not None and pending[0] == window.chromosome and pending[3] == values[0]:
+            starts[0] = pending[1]
+        elif pending is not None:
+            write_intervals(bedgraph_file, bigwig_file, pending[0], np.array([pending[1]]), np.array([pending[2]]), np.array([pending[3]]))
+        write_intervals(bedgraph_file, bigwig_file, window.chromosome, starts[:-1], ends[:-1], values[:-1])
+        pending = (window.chromosome, int(starts[-1]), int(ends[-1]), float(values[-1]))
+    if pending is not None:
+        write_intervals(bedgraph_file, bigwig_file, pending[0], np.array([pending[1]]), np.array([pending[2]]), np.array([pending[3]]))
+    if bedgraph_file is not None:
+        bedgraph_file.close()
+    if bigwig_file is not None:
+        bigwig_file.close()
+
+
+def write_intervals(bedgraph_file: Optional[TextIO], bigwig_file, chromosome: str, starts: np.ndarray, ends: np.ndarray, values: np.ndarray):
+    if len(starts) == 0:
+        return
+    if bigwig_file is not None:
+        bigwig_file.addEntries([chromosome] * len(starts), starts.astype(np.int64), ends=ends.astype(np.int64), values=values.astype(np.float64))
+    if bedgraph_file is not None:
+        bedgraph_file.writelines('{}\t{}\t{}\t{:g}\n'.format(chromosome, start, end, value)
+                                 for start, end, value in zip(starts.tolist(), ends.tolist(), values.tolist()))
+
+
+def main():
+    args = docopt(__doc__, version='1.0')
+    method: str = args['--normalize']
+    if method not in NORMALIZE_METHODS:
+        print('Normalization method "{}" is not supported (supported: {})'.format(method, ', '.join(NORMALIZE_METHODS)), file=sys.stderr)
+        sys.exit(1)
+    if not args['--bedgraph'] and not args['--bigwig']:
+        print('No output file (--bedgraph or --bigwig)', file=sys.stderr)
+        sys.exit(1)
+    write_coverage(Path(args['--bam']), Path(args['--bedgraph']) if args['--bedgraph'] else None,
+                   Path(args['--bigwig']) if args['--bigwig'] else None, int(args['--bin-size']), method, int(args['--threads']))
+
+
+if __name__ == '__main__':
+    main()
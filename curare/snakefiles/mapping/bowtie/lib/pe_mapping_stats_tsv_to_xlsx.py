@@ -2,13 +2,15 @@ import csv
 import matplotlib
 matplotlib.use('Agg')
 matplotlib.rcParams.update({'figure.autolayout': True})
-import matplotlib.pyplot as plt
 import pandas as pd
 import sys
 
 from pathlib import Path
 from typing import Dict, List, Union
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'global_scripts'))
+from plotting import BarChart, render_bar_charts
+
 
 def get_col_widths(df: pd.DataFrame) -> List[int]:
     return [max(y) for y in [[len(col)] + [len(x) for x in df[col]] for col in df.columns]]
@@ -26,23 +28,20 @@ def format_w2c(min_color: str = '#FFFFFF', max_color: str = '#000000', min_value
 
 
 def create_charts(df: pd.DataFrame, output_dir: Path):
+    charts: List[BarChart] = []
     absolute_alignments: pd.DataFrame = df[["sample", "aligned_at_least_1_time", "aligned_0_times"]]
     absolute_alignments = absolute_alignments.set_index("sample")
     absolute_alignments.index.names = [None]
     absolute_alignments = absolute_alignments.apply(pd.to_numeric, errors="ignore")
     absolute_alignments = absolute_alignments.rename(columns={"aligned_0_times": "Aligned 0 Times",
                                                               "aligned_at_least_1_time": "Aligned At Least 1 Time"})
-    ax = absolute_alignments.plot(kind='bar', stacked=True, alpha=0.7)
-    ax.legend(loc='lower center', bbox_to_anchor=(0.5, 1.05), fancybox=True, shadow=False, ncol=2)
-
-    ax.set_ylabel("#Read Pairs")
-    plt.savefig(str(output_dir / "alignment_stats.svg"))
+    charts.append(BarChart(absolute_alignments, output_dir / "alignment_stats.svg", ylabel="#Read Pairs", stacked=True, alpha=0.7,
+                           legend_options=dict(loc='lower center', bbox_to_anchor=(0.5, 1.05), fancybox=True, shadow=False, ncol=2)))
 
     relative_alignments = absolute_alignments.div(other=absolute_alignments.sum(axis=1), axis=0).mul(100)
-    ax = relative_alignments.plot(kind='bar', stacked=True, alpha=0.7)
-    ax.legend(loc='lower center', bbox_to_anchor=(0.5, 1.05), fancybox=True, shadow=False, ncol=2)
-    ax.set_ylabel("Read Pairs [%]")
-    plt.savefig(str(output_dir / "alignment_stats_relative.svg"))
+    charts.append(BarChart(relative_alignments, output_dir / "alignment_stats_relative.svg", ylabel="Read Pairs [%]", stacked=True, alpha=0.7,
+                           legend_options=dict(loc='lower center', bbox_to_anchor=(0.5, 1.05), fancybox=True, shadow=False, ncol=2)))
+    render_bar_charts(charts)
 
 
 
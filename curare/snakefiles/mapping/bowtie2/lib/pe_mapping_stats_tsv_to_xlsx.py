@@ -2,7 +2,6 @@ import csv
 import matplotlib
 matplotlib.use('Agg')
 matplotlib.rcParams.update({'figure.autolayout': True})
-import matplotlib.pyplot as plt
 import pandas as pd
 import sys
 
@@ -10,6 +9,9 @@ from pathlib import Path
 from typing import Dict, List, Union
 from matplotlib.colors import ListedColormap
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'global_scripts'))
+from plotting import BarChart, render_bar_charts
+
 
 def get_col_widths(df: pd.DataFrame) -> List[int]:
     return [max(y) for y in [[len(col)] + [len(x) for x in df[col]] for col in df.columns]]
@@ -27,6 +29,7 @@ def format_w2c(min_color: str = '#FFFFFF', max_color: str = '#000000', min_value
 
 
 def create_charts(df: pd.DataFrame, output_dir: Path):
+    charts: List[BarChart] = []
     colors = ListedColormap(['#4878d0', '#dc7ec0', '#ff7f00', '#e41a1c'])
     absolute_alignments: pd.DataFrame = df[["sample", "aligned_conc_1_time", "aligned_conc_more_than_1_times", "aligned_disconc_1_time", "pairs_aligned_0_times_conc_or_disconc"]]
     absolute_alignments = absolute_alignments.set_index("sample")
@@ -36,17 +39,13 @@ def create_charts(df: pd.DataFrame, output_dir: Path):
                                                               "aligned_conc_more_than_1_times": "Aligned Conc. >1 Times",
                                                               "aligned_disconc_1_time": "Aligned Disconc.",
                                                               "pairs_aligned_0_times_conc_or_disconc": "Not Aligned Conc. Or Disconc."})
-    ax = absolute_alignments.plot(kind='bar', stacked=True, colormap=colors)
-    ax.legend(loc='lower center', bbox_to_anchor=(0.5, 1.01), frameon=False, ncols=2)
-
-    ax.set_ylabel("#Read Pairs")
-    plt.savefig(str(output_dir / "alignment_stats.svg"))
+    charts.append(BarChart(absolute_alignments, output_dir / "alignment_stats.svg", ylabel="#Read Pairs", stacked=True, colormap=colors,
+                           legend_options=dict(loc='lower center', bbox_to_anchor=(0.5, 1.01), frameon=False, ncols=2)))
 
     relative_alignments = absolute_alignments.div(other=absolute_alignments.sum(axis=1), axis=0).mul(100)
-    ax = relative_alignments.plot(kind='bar', stacked=True, colormap=colors)
-    ax.legend(loc='lower center', bbox_to_anchor=(0.5, 1.01), frameon= False, ncols=2)
-    ax.set_ylabel("Read Pairs [%]")
-    plt.savefig(str(output_dir / "alignment_stats_relative.svg"))
+    charts.append(BarChart(relative_alignments, output_dir / "alignment_stats_relative.svg", ylabel="Read Pairs [%]", stacked=True, colormap=colors,
+                           legend_options=dict(loc='lower center', bbox_to_anchor=(0.5, 1.01), frameon= False, ncols=2)))
+    render_bar_charts(charts)
 
 
 
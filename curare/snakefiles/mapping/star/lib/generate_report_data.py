@@ -41,11 +41,11 @@ def generate_report_data(output_file: Path, stats_file: Path, settings_file: Pat
         f.write('  const paired_end = {}\n'.format("true" if is_paired_end else "false"))
         
         f.write('  const stats = ')
-        f.write(json.dumps(stats, indent=2).replace('\n', '\n  '))
+        f.write(json.dumps(stats, separators=(',', ':')))
         f.write('\n')
 
         f.write('  const settings = ')
-        f.write(json.dumps(settings, indent=2).replace('\n', '\n  '))
+        f.write(json.dumps(settings, separators=(',', ':')))
         f.write('\n')
 
         f.write('  return {paired_end: paired_end, stats: stats, settings: settings};\n')
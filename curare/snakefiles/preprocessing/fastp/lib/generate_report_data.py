@@ -43,7 +43,7 @@ def generate_report_data(output_file: Path, reports_file: Path, is_paired_end: b
         f.write('  const paired_end = {}\n'.format("true" if is_paired_end else "false"))
         f.write('  const reports = ')
 
-        f.write(json.dumps(reports, indent=2).replace('\n', '\n  '))
+        f.write(json.dumps(reports, separators=(',', ':')))
         f.write('\n')
 
         f.write('  return {paired_end: paired_end, reports: reports};\n')
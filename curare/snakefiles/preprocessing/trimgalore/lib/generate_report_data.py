@@ -186,7 +186,7 @@ def generate_report_data(output_file: Path, stats_file: Path, is_paired_end: boo
         f.write('  const paired_end = {}\n'.format("true" if is_paired_end else "false"))
         f.write('  const stats = ')
 
-        f.write(json.dumps(stats, indent=2).replace('\n', '\n  '))
+        f.write(json.dumps(stats, separators=(',', ':')))
         f.write('\n')
 
         f.write('  return {paired_end: paired_end, stats: stats};\n')
@@ -0,0 +1,15 @@
+#!/usr/bin/env bash
+# Minimal batch queue for testing the cluster mode of Curare on a single machine.
+# The submitted Snakemake job script (last argument) is executed in the background and its PID is printed as job id.
+# All other arguments (e.g. "{threads} {resources.mem_mb}") are written into the job log to check the resource templates.
+#
+# Usage: curare ... --executor cluster --cluster-command "<path>/fake_queue.sh --threads {threads} --mem-mb {resources.mem_mb}"
+
+JOBSCRIPT="${@: -1}"
+LOG_DIR="${FAKE_QUEUE_LOGS:-fake_queue_logs}"
+mkdir -p "${LOG_DIR}"
+LOG="${LOG_DIR}/$(basename "${JOBSCRIPT}").log"
+
+echo "Submitted with: ${@:1:$#-1}" > "${LOG}"
+nohup bash "${JOBSCRIPT}" >> "${LOG}" 2>&1 &
+echo $!
@@ -4,4 +4,6 @@ SCRIPTPATH=`readlink -f $0`
 SCRIPTDIR=`dirname $SCRIPTPATH`
 
 rm -r ${SCRIPTDIR}/output_dir
-${SCRIPTDIR}/../../../../bin/curare --samples ${SCRIPTDIR}/samples.tsv --pipeline ${SCRIPTDIR}/pipeline.yml --output ${SCRIPTDIR}/output_dir -t 2 --cluster-nodes 4 --cluster-command 'qsub -V -b y -pe multislot {cluster.slots} -l {cluster.queue}=1 -l virtual_free={cluster.virtual_free} -N {cluster.name} -terse' --cluster-config-file cluster_config.yml --latency-wait 60
+# Jobs are submitted to a fake queue which runs them on this machine. For an SGE cluster, use e.g.
+# --cluster-command 'qsub -V -b y -pe multislot {threads} -l virtual_free={resources.mem_mb}M -N curare_{rule} -terse'
+FAKE_QUEUE_LOGS=${SCRIPTDIR}/output_dir/fake_queue_logs ${SCRIPTDIR}/../../../../bin/curare --samples ${SCRIPTDIR}/samples.tsv --pipeline ${SCRIPTDIR}/pipeline.yaml --output ${SCRIPTDIR}/output_dir -t 2 --executor cluster --cluster-nodes 4 --node-cores 4 --cluster-command "${SCRIPTDIR}/../fake_queue.sh --threads {threads} --mem-mb {resources.mem_mb}" --latency-wait 60
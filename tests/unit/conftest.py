@@ -0,0 +1,31 @@
+"""
+Unit tests of the scripts in curare/lib (global scripts) and the module libraries (curare/snakefiles/*/*/lib).
+
+Global scripts import each other by module name, like in snakemake_lib/global_scripts of a run, so curare/lib is added
+to sys.path. Module scripts are loaded from their file with load_script(). The repository root is added for tests of the
+Curare package (curare.curare).
+"""
+
+import importlib.util
+import sys
+
+from pathlib import Path
+from types import ModuleType
+
+ROOT: Path = Path(__file__).resolve().parents[2]
+GLOBAL_SCRIPTS: Path = ROOT / 'curare' / 'lib'
+SNAKEFILES: Path = ROOT / 'curare' / 'snakefiles'
+
+sys.path.insert(0, str(GLOBAL_SCRIPTS))
+sys.path.insert(0, str(ROOT))
+
+
+def load_script(path: Path) -> ModuleType:
+    """Module script (e.g. SNAKEFILES / 'analysis/dge_analysis/lib/count_feature_types.py') as module"""
+    name: str = 'curare_test_{}_{}'.format(path.parent.parent.name, path.stem).replace('-', '_')
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, str(path))
+        module: ModuleType = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
@@ -0,0 +1,63 @@
+import gzip
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from pathlib import Path
+from typing import List
+
+from conftest import ROOT, SNAKEFILES
+
+GENOME: Path = ROOT / 'tests' / 'resources' / 'reference' / 'GCF_000007445.1_ASM744v1_genomic.fna'
+CHUNKED_SNAKEFILES: List[Path] = sorted(path for path in (SNAKEFILES / 'mapping').glob('*/*_[ps]e') if 'chunk_reads = ' in path.read_text())
+
+
+@pytest.mark.parametrize('snakefile', CHUNKED_SNAKEFILES, ids=lambda path: path.name)
+def test_all_filtered_bams_of_chunks_are_requested(snakefile: Path):
+    content: str = snakefile.read_text()
+    side_outputs: List[str] = sorted(re.findall(r'chunked_output\("(mapping/(?:unmapped|singleton|disconcordantly)/\{sample\}_\w+\.bam)"\)', content))
+    requested: List[str] = sorted(re.search(r'^chunk_filtered_bams = \[(.*)\]$', content, re.MULTILINE).group(1).replace('"', '').split(', '))
+    assert requested == [path.replace('{sample}', '{A}') for path in side_outputs]
+    assert "expand(chunk_filtered_bams if chunk_reads else [], A=sorted(config['entries'].keys()))," in content
+
+
+def snakemake(output: Path, *arguments: str) -> subprocess.CompletedProcess:
+    return subprocess.run(['snakemake', '--snakefile', str(output / 'Snakefile'), '--directory', str(output), '--cores', '2'] + list(arguments),
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+
+
+@pytest.mark.skipif(shutil.which('snakemake') is None, reason='Snakemake is not installed')
+def test_dag_is_reevaluated_after_splitting_the_reads(tmp_path: Path):
+    reads = []
+    for mate in (1, 2):
+        reads_file: Path = tmp_path / 'sample_R{}.fastq.gz'.format(mate)
+        with gzip.open(str(reads_file), 'wt') as fastq:
+            fastq.writelines('@read{}\nACGTACGTAC\n+\nIIIIIIIIII\n'.format(i) for i in range(5))
+        reads.append(str(reads_file))
+    samples_file: Path = tmp_path / 'samples.tsv'
+    samples_file.write_text('name\tforward_reads\treverse_reads\nsample\t{}\t{}\n'.format(*reads))
+    pipeline_file: Path = tmp_path / 'pipeline.yml'
+    pipeline_file.write_text('pipeline:\n  paired_end: true\npreprocessing:\n  modules: ["none"]\npremapping:\n  modules: []\n'
+                             'mapping:\n  modules: ["bowtie2"]\n  chunk_reads: 2\n  bowtie2:\n    genome_fasta: "{}"\n'
+                             'analysis:\n  modules: []\n'.format(GENOME))
+    output: Path = tmp_path / 'output'
+    plan = subprocess.run([sys.executable, '-m', 'curare.curare', '--samples', str(samples_file), '--pipeline', str(pipeline_file),
+                           '--output', str(output), '--cores', '2', '--no-conda', '--plan'],
+                          env=dict(os.environ, PYTHONPATH=str(ROOT)), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    assert plan.returncode == 0, plan.stdout
+
+    split = snakemake(output, '--until', 'bowtie2__chunked_mapping__split_reads')
+    assert split.returncode == 0, split.stdout
+    assert sorted(path.name for path in (output / 'mapping' / 'chunks' / 'reads' / 'sample').glob('*.fastq.gz')) == \
+           ['00000_R1.fastq.gz', '00000_R2.fastq.gz', '00001_R1.fastq.gz', '00001_R2.fastq.gz', '00002_R1.fastq.gz', '00002_R2.fastq.gz']
+
+    dry_run = snakemake(output, '--dry-run')
+    assert dry_run.returncode == 0, dry_run.stdout
+    for chunk in ['00000', '00001', '00002']:
+        assert 'mapping/chunks/sample/{}.bam'.format(chunk) in dry_run.stdout
+    for filtered_bam in ['mapping/unmapped/sample_unmapped.bam', 'mapping/singleton/sample_singletons.bam', 'mapping/disconcordantly/sample_disconc.bam']:
+        assert filtered_bam in dry_run.stdout
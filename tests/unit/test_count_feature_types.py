@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing import List
+
+from conftest import SNAKEFILES, load_script
+
+count_feature_types = load_script(SNAKEFILES / 'analysis/dge_analysis/lib/count_feature_types.py')
+
+
+def write_assignments(directory: Path, rows: List[str]) -> Path:
+    """featureCounts -R CORE file: read name, status, number of targets, targets"""
+    assignments: Path = directory / 'sample.bam.featureCounts'
+    assignments.write_text(''.join(row + '\n' for row in rows))
+    return assignments
+
+
+def test_meta_feature_length_is_union_of_features():
+    meta_feature = count_feature_types.MetaFeature(0, 'gene1')
+    meta_feature.features = [('NC_1', 1, 100, '+'), ('NC_1', 51, 150, '+'), ('NC_1', 201, 210, '+'), ('NC_2', 1, 10, '-')]
+    assert meta_feature.length() == 150 + 10 + 10
+    assert meta_feature.table_columns() == ['gene1', 'NC_1;NC_1;NC_1;NC_2', '1;51;201;1', '100;150;210;10', '+;+;+;-', '170']
+
+
+def test_assignments_are_split_by_feature_type(tmp_path: Path):
+    # Meta-features 0 and 1 are genes, 2 and 3 are CDS
+    assignments: Path = write_assignments(tmp_path, [
+        'read1\tAssigned\t1\t0',
+        'read2\tAssigned\t2\t0,2',
+        'read3\tAssigned\t2\t0,1',
+        'read4\tAssigned\t3\t1,2,3',
+        'read5\tUnassigned_NoFeatures\t-1\tNA',
+        'read6\tUnassigned_MultiMapping\t-1\tNA',
+    ])
+    counts, status_counts, assigned, ambiguous = count_feature_types.split_assignments(assignments, [0, 0, 1, 1], 2, False)
+    assert counts == [2, 1, 1, 0]
+    assert status_counts == {'Assigned': 4, 'Unassigned_NoFeatures': 1, 'Unassigned_MultiMapping': 1}
+    assert assigned == [3, 1]
+    assert ambiguous == [1, 1]
+
+
+def test_multiple_overlaps_are_assigned_to_all_features(tmp_path: Path):
+    assignments: Path = write_assignments(tmp_path, ['read1\tAssigned\t3\t0,1,2'])
+    counts, _, assigned, ambiguous = count_feature_types.split_assignments(assignments, [0, 0, 1], 2, True)
+    assert counts == [1, 1, 1]
+    assert assigned == [1, 1]
+    assert ambiguous == [0, 0]
+
+
+def test_type_summary_counts_reads_of_other_types_as_no_features():
+    statuses: List[str] = count_feature_types.SUMMARY_STATUS
+    summary = count_feature_types.type_summary({'Assigned': 4, 'Unassigned_NoFeatures': 1}, 1, 1, statuses)
+    assert list(summary) == statuses
+    assert summary['Assigned'] == 1
+    assert summary['Unassigned_Ambiguity'] == 1
+    assert summary['Unassigned_NoFeatures'] == 1 + 2
+    assert sum(summary.values()) == 5
+
+
+def test_meta_features_are_grouped_by_type_and_name(tmp_path: Path):
+    gff: Path = tmp_path / 'annotation.gff'
+    gff.write_text('##gff-version 3\n'
+                   'NC_1\tRefSeq\tgene\t1\t100\t.\t+\t.\tID=gene1;Name=abc\n'
+                   'NC_1\tRefSeq\tCDS\t1\t40\t.\t+\t0\tID=cds1;Parent=gene1;Name=abc\n'
+                   'NC_1\tRefSeq\tCDS\t61\t100\t.\t+\t0\tID=cds2;Parent=gene1;Name=abc\n'
+                   'NC_1\tRefSeq\texon\t1\t100\t.\t+\t.\tID=exon1;Name=abc\n'
+                   'NC_1\tRefSeq\tgene\t201\t300\t.\t-\t.\tID=gene2\n')
+    meta_features = count_feature_types.read_meta_features(gff, ['gene', 'CDS'], 'Name')
+    assert [(meta_feature.feature_type, meta_feature.name, meta_feature.length()) for meta_feature in meta_features] == \
+           [(0, 'abc', 100), (1, 'abc', 80)]
+    saf: Path = tmp_path / 'features.saf'
+    count_feature_types.write_saf(meta_features, saf)
+    assert saf.read_text().splitlines() == ['GeneID\tChr\tStart\tEnd\tStrand', '0\tNC_1\t1\t100\t+', '1\tNC_1\t1\t40\t+', '1\tNC_1\t61\t100\t+']
+
+
+def test_options_conflicting_with_the_split_are_unsupported():
+    options: List[str] = ['-s', '1', '--largestOverlap', '-M', '--fraction', '-t', 'exon', '--minOverlap', '10']
+    assert count_feature_types.unsupported_options(options) == ['--largestOverlap', '--fraction', '-t']
+    assert count_feature_types.unsupported_options(['-O', '-s', '2', '--primary']) == []
+
+
+def test_snakefiles_fall_back_for_the_unsupported_options():
+    for layout in ['pe', 'se']:
+        snakefile: str = (SNAKEFILES / 'analysis/dge_analysis/dge_analysis_{}'.format(layout)).read_text()
+        assert 'one_pass_unsupported_options = {!r}'.format(count_feature_types.UNSUPPORTED_OPTIONS).replace("'", '"') in snakefile
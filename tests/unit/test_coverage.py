@@ -0,0 +1,77 @@
+import numpy as np
+import pyBigWig
+import pysam
+import pytest
+
+from pathlib import Path
+from typing import List, Tuple
+
+from conftest import SNAKEFILES, load_script
+
+coverage = load_script(SNAKEFILES / 'analysis/normalized_coverage/lib/coverage.py')
+
+CHROMOSOMES: List[Tuple[str, int]] = [('chr1', 100), ('chr2', 30)]
+
+
+def write_bam(path: Path, reads: List[Tuple[str, int, str]]) -> Path:
+    """Sorted and indexed BAM file of the reads (chromosome, start, CIGAR)"""
+    header = {'HD': {'VN': '1.6', 'SO': 'coordinate'}, 'SQ': [{'SN': name, 'LN': length} for name, length in CHROMOSOMES]}
+    chromosome_ids = {name: i for i, (name, _) in enumerate(CHROMOSOMES)}
+    with pysam.AlignmentFile(str(path), 'wb', header=header) as bam_file:
+        for i, (chromosome, start, cigar) in enumerate(sorted(reads, key=lambda read: (chromosome_ids[read[0]], read[1]))):
+            read = pysam.AlignedSegment(bam_file.header)
+            read.query_name = 'read{}'.format(i)
+            read.reference_id = chromosome_ids[chromosome]
+            read.reference_start = start
+            read.cigarstring = cigar
+            read.query_sequence = 'A' * read.infer_query_length()
+            read.mapping_quality = 60
+            bam_file.write(read)
+    pysam.index(str(path))
+    return path
+
+
+def bin_counts(bam: Path, window, bin_size: int) -> List[int]:
+    run_starts, run_counts = coverage.window_coverage(bam, window, bin_size)
+    bins: int = -(-(window.end - window.start) // bin_size)
+    return np.repeat(run_counts, np.diff(np.append(run_starts, bins))).tolist()
+
+
+def test_windows_start_at_bin_boundaries(monkeypatch, tmp_path: Path):
+    bam: Path = write_bam(tmp_path / 'sample.bam', [])
+    monkeypatch.setattr(coverage, 'WINDOW_SIZE', 25)
+    assert [(window.chromosome, window.start, window.end) for window in coverage.windows(bam, 10)] == \
+           [('chr1', 0, 30), ('chr1', 30, 60), ('chr1', 60, 90), ('chr1', 90, 100), ('chr2', 0, 30)]
+
+
+def test_every_overlapped_bin_counts_a_read_once(tmp_path: Path):
+    # spliced read with two blocks in bin 1 (10-20), read over the boundary of bins 2 and 3, deletion in bin 5
+    bam: Path = write_bam(tmp_path / 'sample.bam', [('chr1', 11, '3M2N3M'), ('chr1', 28, '4M'), ('chr1', 50, '3M2D3M'),
+                                                    ('chr1', 5, '10M60N10M'), ('chr2', 0, '5M')])
+    assert bin_counts(bam, coverage.Window('chr1', 0, 100), 10) == [1, 2, 1, 1, 0, 1, 0, 1, 1, 0]
+    assert bin_counts(bam, coverage.Window('chr1', 0, 100), 1)[10:20] == [1, 2, 2, 2, 1, 0, 1, 1, 1, 0]
+    assert bin_counts(bam, coverage.Window('chr2', 0, 30), 7) == [1, 0, 0, 0, 0]
+
+
+def test_reads_are_clipped_to_the_window(tmp_path: Path):
+    bam: Path = write_bam(tmp_path / 'sample.bam', [('chr1', 25, '10M')])
+    assert bin_counts(bam, coverage.Window('chr1', 0, 30), 10) == [0, 0, 1]
+    assert bin_counts(bam, coverage.Window('chr1', 30, 60), 10) == [1, 0, 0]
+
+
+@pytest.mark.parametrize('method, expected', [('CPM', 1e6 / 4), ('RPKM', 1e9 / (4 * 10)), ('BPM', 1e6 / 20), ('None', 1.0)])
+def test_scale_factor(method: str, expected: float):
+    assert coverage.scale_factor(method, 4, 20, 10) == pytest.approx(expected)
+
+
+def test_runs_are_merged_across_windows(monkeypatch, tmp_path: Path):
+    bam: Path = write_bam(tmp_path / 'sample.bam', [('chr1', 20, '40M'), ('chr2', 0, '5M')])
+    monkeypatch.setattr(coverage, 'WINDOW_SIZE', 25)
+    bedgraph: Path = tmp_path / 'sample.bedgraph'
+    bigwig: Path = tmp_path / 'sample.bw'
+    coverage.write_coverage(bam, bedgraph, bigwig, 10, 'CPM', 2)
+    assert bedgraph.read_text().splitlines() == ['chr1\t0\t20\t0', 'chr1\t20\t60\t500000', 'chr1\t60\t100\t0',
+                                                 'chr2\t0\t10\t500000', 'chr2\t10\t30\t0']
+    with pyBigWig.open(str(bigwig)) as bigwig_file:
+        assert bigwig_file.chroms() == dict(CHROMOSOMES)
+        assert bigwig_file.intervals('chr1') == ((0, 20, 0.0), (20, 60, 500000.0), (60, 100, 0.0))
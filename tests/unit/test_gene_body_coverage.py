@@ -0,0 +1,83 @@
+import numpy as np
+import pysam
+
+from pathlib import Path
+from typing import List, Tuple
+
+from conftest import SNAKEFILES, load_script
+
+gene_body_coverage = load_script(SNAKEFILES / 'analysis/dge_analysis/lib/gene_body_coverage.py')
+
+
+def transcript(strand: str = '+', exons: List[Tuple[int, int]] = ((1000, 1100),)):
+    return gene_body_coverage.Transcript('chr1', strand, np.array([start for start, _ in exons], dtype=np.int64),
+                                         np.array([end for _, end in exons], dtype=np.int64))
+
+
+def write_bam(path: Path, reads: List[Tuple[int, str]]) -> str:
+    """Sorted and indexed BAM file of reads on chr1 (start, CIGAR)"""
+    header = {'HD': {'VN': '1.6', 'SO': 'coordinate'}, 'SQ': [{'SN': 'chr1', 'LN': 10000}]}
+    with pysam.AlignmentFile(str(path), 'wb', header=header) as bam_file:
+        for i, (start, cigar) in enumerate(sorted(reads)):
+            read = pysam.AlignedSegment(bam_file.header)
+            read.query_name = 'read{}'.format(i)
+            read.reference_id = 0
+            read.reference_start = start
+            read.cigarstring = cigar
+            read.query_sequence = 'A' * read.infer_query_length()
+            read.mapping_quality = 60
+            bam_file.write(read)
+    pysam.index(str(path))
+    return str(path)
+
+
+def test_percentile_positions_follow_the_exons():
+    positions: np.ndarray = transcript(exons=[(1000, 1050), (2000, 2050)]).percentile_positions()
+    assert len(positions) == gene_body_coverage.PERCENTILES
+    # like RSeQC, the first percentile is 1% into the mRNA
+    assert positions[0] == 1001
+    assert positions[-1] == 2049
+    assert ((positions >= 1000) & (positions < 2050)).all()
+    assert ((positions < 1050) | (positions >= 2000)).sum() >= gene_body_coverage.PERCENTILES - 1
+    assert (np.diff(positions) > 0).all()
+
+
+def test_percentile_positions_of_minus_strand_are_reversed():
+    plus: np.ndarray = transcript('+', [(0, 200)]).percentile_positions()
+    assert (transcript('-', [(0, 200)]).percentile_positions() == plus[::-1]).all()
+
+
+def test_bed12_blocks_are_exons(tmp_path: Path):
+    bed: Path = tmp_path / 'ref_gene.bed'
+    bed.write_text('track name=genes\nchr1\t1000\t2050\tgene1\t0\t-\t1000\t2050\t0\t2\t50,50,\t0,1000,\n')
+    transcripts = gene_body_coverage.read_bed(bed)
+    assert len(transcripts) == 1
+    assert transcripts[0].strand == '-'
+    assert transcripts[0].exon_starts.tolist() == [1000, 2000]
+    assert transcripts[0].exon_ends.tolist() == [1050, 2050]
+    assert transcripts[0].length() == 100
+
+
+def test_all_features_are_used_by_default():
+    transcripts = [transcript(exons=[(i * 1000, i * 1000 + 100)]) for i in range(10)] + [transcript(exons=[(20000, 20099)])]
+    assert len(gene_body_coverage.sample_transcripts(transcripts, 0)) == 10
+    sampled = gene_body_coverage.sample_transcripts(transcripts, 4)
+    assert len(sampled) == 4
+    assert [sampled_transcript.exon_starts[0] for sampled_transcript in sampled] == \
+           [sampled_transcript.exon_starts[0] for sampled_transcript in gene_body_coverage.sample_transcripts(transcripts, 4)]
+
+
+def test_close_positions_are_read_as_one_region():
+    gap: int = gene_body_coverage.MAX_REGION_GAP
+    assert gene_body_coverage.regions(np.array([5, 10, 10 + gap, 20 + 2 * gap + 1])) == [(5, 11 + gap), (20 + 2 * gap + 1, 22 + 2 * gap)]
+
+
+def test_coverage_at_percentile_positions(tmp_path: Path):
+    # Two reads cover the whole transcript, one read only the first half, one spliced read skips the second half
+    bam: str = write_bam(tmp_path / 'sample.bam', [(1000, '100M'), (1000, '100M'), (1000, '50M'), (1000, '50M50N50M')])
+    positions: np.ndarray = np.vstack([transcript(exons=[(1000, 1100)]).percentile_positions()])
+    result: np.ndarray = gene_body_coverage.coverage(bam, 'chr1', positions, 0)
+    assert result[:50].tolist() == [4] * 50
+    assert result[50:].tolist() == [2] * 50
+    assert gene_body_coverage.coverage(bam, 'chr2', positions, 0).tolist() == [0] * 100
+    assert gene_body_coverage.coverage(bam, 'chr1', positions, 61).tolist() == [0] * 100
@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import json
+
+import pytest
+
+from pathlib import Path
+
+import gff_index
+
+GFF: str = ('##gff-version 3\n'
+            'NC_1\tRefSeq\tgene\t1\t100\t.\t+\t.\tID=gene1\n'
+            'NC_1\tRefSeq\tCDS\t1\t100\t.\t+\t0\tID=cds1;Parent=gene1\n'
+            'NC_2\tRefSeq\tgene\t1\t50\t.\t-\t.\tID=gene2\n'
+            '\n')
+
+
+@pytest.fixture
+def cache_root(tmp_path: Path, monkeypatch) -> Path:
+    cache_root: Path = tmp_path / 'cache'
+    monkeypatch.setenv(gff_index.CACHE_ENVIRONMENT_VARIABLE, str(cache_root))
+    monkeypatch.delenv(gff_index.SIDECAR_ENVIRONMENT_VARIABLE, raising=False)
+    return cache_root
+
+
+def write_annotation(directory: Path, name: str = 'annotation.gff') -> Path:
+    gff: Path = directory / 'annotation' / name
+    gff.parent.mkdir(exist_ok=True)
+    if name.endswith('.gz'):
+        with gzip.open(str(gff), 'wt') as gff_file:
+            gff_file.write(GFF)
+    else:
+        gff.write_text(GFF)
+    return gff
+
+
+def test_index_counts_features_per_type_and_sequence(tmp_path: Path, cache_root: Path):
+    gff: Path = write_annotation(tmp_path)
+    index = gff_index.load_index(gff)
+    assert index['feature_types'] == {'gene': 2, 'CDS': 1}
+    assert index['seqids'] == {'NC_1': 2, 'NC_2': 1}
+    assert index['sha256'] == hashlib.sha256(gff.read_bytes()).hexdigest()
+    assert gff_index.feature_types(gff) == ['gene', 'CDS']
+
+
+def test_hash_of_compressed_annotation_is_file_content(tmp_path: Path, cache_root: Path):
+    gff: Path = write_annotation(tmp_path, 'annotation.gff.gz')
+    index = gff_index.load_index(gff)
+    assert index['feature_types'] == {'gene': 2, 'CDS': 1}
+    assert index['sha256'] == hashlib.sha256(gff.read_bytes()).hexdigest()
+
+
+def test_cache_is_stored_in_user_cache_not_next_to_annotation(tmp_path: Path, cache_root: Path):
+    gff: Path = write_annotation(tmp_path)
+    gff_index.load_index(gff)
+    assert sorted(path.name for path in gff.parent.iterdir()) == ['annotation.gff']
+    cache_directory: Path = gff_index.annotation_cache_directory(gff)
+    assert cache_directory.parent == cache_root
+    assert (cache_directory / gff_index.INDEX_FILE_NAME).is_file()
+    assert cache_directory.stat().st_mode & 0o077 == 0
+
+
+def test_sidecar_cache_is_opt_in(tmp_path: Path, cache_root: Path, monkeypatch):
+    gff: Path = write_annotation(tmp_path)
+    monkeypatch.setenv(gff_index.SIDECAR_ENVIRONMENT_VARIABLE, '1')
+    gff_index.load_index(gff)
+    assert (gff.parent / '.annotation.gff.curare' / gff_index.INDEX_FILE_NAME).is_file()
+    assert not cache_root.exists()
+
+
+def test_index_is_rebuilt_if_annotation_changed(tmp_path: Path, cache_root: Path):
+    gff: Path = write_annotation(tmp_path)
+    gff_index.load_index(gff)
+    with gff.open('a') as gff_file:
+        gff_file.write('NC_2\tRefSeq\texon\t1\t50\t.\t-\t.\tID=exon1\n')
+    assert gff_index.load_index(gff)['feature_types'] == {'gene': 2, 'CDS': 1, 'exon': 1}
+
+
+def test_invalid_index_is_rebuilt(tmp_path: Path, cache_root: Path):
+    gff: Path = write_annotation(tmp_path)
+    index_file: Path = gff_index.annotation_cache_directory(gff) / gff_index.INDEX_FILE_NAME
+    for content in ['{"version": ', '[1, 2]']:
+        index_file.write_text(content)
+        assert gff_index.load_index(gff)['feature_types'] == {'gene': 2, 'CDS': 1}
+        assert json.loads(index_file.read_text())['seqids'] == {'NC_1': 2, 'NC_2': 1}
+
+
+def test_index_is_built_in_memory_if_cache_is_not_writable(tmp_path: Path, cache_root: Path):
+    gff: Path = write_annotation(tmp_path)
+    cache_root.write_text('not a directory')
+    assert gff_index.load_index(gff)['feature_types'] == {'gene': 2, 'CDS': 1}
@@ -0,0 +1,111 @@
+import gzip
+import json
+
+import pytest
+
+from pathlib import Path
+from typing import List
+
+import gff_index
+import gff_reader
+
+GFF: str = ('##gff-version 3\n'
+            'NC_1\tRefSeq\tgene\t1\t100\t.\t+\t.\tID=gene1;Name=abc;note="a; b"\n'
+            'NC_1\tRefSeq\tCDS\t1\t100\t.\t+\t0\tID=cds1 ; Parent = gene1;product=protein\n'
+            'NC_2\tRefSeq\tgene\t1\t50\t.\t-\t.\tID=gene2;locus_tag=T_2\n')
+GTF: str = ('NC_1\tRefSeq\tgene\t1\t100\t.\t+\t.\tgene_id "gene1"; gene_name "abc"; note "a; b";\n'
+            'NC_1\tRefSeq\texon\t1\t100\t.\t+\t.\tgene_id "gene1"; transcript_id "t1";\n')
+
+
+@pytest.fixture(autouse=True)
+def cache_root(tmp_path: Path, monkeypatch) -> Path:
+    cache_root: Path = tmp_path / 'cache'
+    monkeypatch.setenv(gff_index.CACHE_ENVIRONMENT_VARIABLE, str(cache_root))
+    monkeypatch.delenv(gff_index.SIDECAR_ENVIRONMENT_VARIABLE, raising=False)
+    monkeypatch.setattr(gff_reader, '_loaded_features', {})
+    return cache_root
+
+
+def cache_files(gff: Path) -> List[Path]:
+    return sorted(gff_index.annotation_cache_directory(gff).glob('features_*.json'))
+
+
+def test_gff3_attribute_values():
+    attributes: str = 'ID=cds1 ; Parent = gene1;note="a; b=c";Name=abc'
+    assert gff_reader.attribute_value(attributes, 'ID') == 'cds1'
+    assert gff_reader.attribute_value(attributes, 'Parent') == 'gene1'
+    assert gff_reader.attribute_value(attributes, 'note') == '"a; b=c"'
+    assert gff_reader.attribute_value(attributes, 'Name') == 'abc'
+    assert gff_reader.attribute_value(attributes, 'b') is None
+    assert gff_reader.attribute_value(attributes, 'name') is None
+    assert gff_reader.attribute_value(attributes, 'name', ignore_case=True) == 'abc'
+
+
+def test_attribute_key_must_match_completely():
+    assert gff_reader.attribute_value('old_locus_tag=A1;locus_tag=B2', 'locus_tag') == 'B2'
+    assert gff_reader.attribute_value('gene_id "g1"; gene_idx "g2";', 'gene_id', gtf=True) == '"g1"'
+
+
+def test_gtf_attribute_values_with_quoted_separator():
+    attributes: str = 'gene_id "gene1"; note "a; b"; gene_name "abc";'
+    assert gff_reader.attribute_value(attributes, 'gene_id', gtf=True) == '"gene1"'
+    assert gff_reader.attribute_value(attributes, 'note', gtf=True) == '"a; b"'
+    assert gff_reader.attribute_value(attributes, 'gene_name', gtf=True) == '"abc"'
+    assert gff_reader.attribute_value(attributes, 'b', gtf=True) is None
+
+
+def test_all_attributes_are_parsed():
+    assert gff_reader.parse_attributes('ID=cds1 ; Parent = gene1;note="a; b"') == {'ID': 'cds1', 'Parent': 'gene1', 'note': '"a; b"'}
+    assert gff_reader.parse_attributes('gene_id "gene1"; note "a; b";', gtf=True) == {'gene_id': '"gene1"', 'note': '"a; b"'}
+
+
+def test_features_of_selected_types_and_attributes(tmp_path: Path):
+    gff: Path = tmp_path / 'annotation.gff'
+    gff.write_text(GFF)
+    features = list(gff_reader.read_features(gff, feature_types=['gene'], attributes=['ID', 'note']))
+    assert [(feature.seqid, feature.start, feature.end, feature.strand) for feature in features] == [('NC_1', 1, 100, '+'), ('NC_2', 1, 50, '-')]
+    assert [feature.attributes for feature in features] == [{'ID': 'gene1', 'note': '"a; b"'}, {'ID': 'gene2'}]
+    assert features[1].raw_attributes == 'ID=gene2;locus_tag=T_2'
+
+
+def test_gtf_is_recognized_by_extension(tmp_path: Path):
+    gtf: Path = tmp_path / 'annotation.gtf.gz'
+    with gzip.open(str(gtf), 'wt') as gtf_file:
+        gtf_file.write(GTF)
+    features = list(gff_reader.read_features(gtf, attributes=['gene_id', 'note']))
+    assert [feature.attributes for feature in features] == [{'gene_id': '"gene1"', 'note': '"a; b"'}, {'gene_id': '"gene1"'}]
+
+
+def test_loaded_features_are_cached_as_json(tmp_path: Path):
+    gff: Path = tmp_path / 'annotation.gff'
+    gff.write_text(GFF)
+    features = gff_reader.load_features(gff, feature_types=['gene', 'CDS'], attributes=['ID'])
+    assert features == list(gff_reader.read_features(gff, feature_types=['gene', 'CDS'], attributes=['ID']))
+    cache_file: Path = cache_files(gff)[0]
+    assert json.loads(cache_file.read_text())[0] == ['NC_1', 'RefSeq', 'gene', 1, 100, '.', '+', '.', {'ID': 'gene1'}, 'ID=gene1;Name=abc;note="a; b"']
+    assert sorted(path.name for path in gff.parent.iterdir()) == ['annotation.gff', 'cache']
+
+    gff_reader._loaded_features.clear()
+    assert gff_reader.load_features(gff, feature_types=['CDS', 'gene'], attributes=['ID']) == features
+    assert len(cache_files(gff)) == 1
+
+
+@pytest.mark.parametrize('content', [b'\x80\x04\x95', b'[1, 2', b'{"a": 1}', b'[[1, 2]]',
+                                     b'[["NC_1", "RefSeq", "gene", "1", "100", ".", "+", ".", {}, ""]]',
+                                     b'[["NC_1", "RefSeq", "gene", 1, 100, ".", "+", ".", null, ""]]'])
+def test_invalid_cache_is_a_cache_miss(tmp_path: Path, content: bytes):
+    gff: Path = tmp_path / 'annotation.gff'
+    gff.write_text(GFF)
+    expected = gff_reader.load_features(gff, attributes=['ID'])
+    cache_file: Path = cache_files(gff)[0]
+    cache_file.write_bytes(content)
+    gff_reader._loaded_features.clear()
+    assert gff_reader.load_features(gff, attributes=['ID']) == expected
+    assert json.loads(cache_file.read_text())[0][8] == {'ID': 'gene1'}
+
+
+def test_features_are_loaded_without_writable_cache(tmp_path: Path, cache_root: Path):
+    gff: Path = tmp_path / 'annotation.gff'
+    gff.write_text(GFF)
+    cache_root.write_text('not a directory')
+    assert [feature.attributes for feature in gff_reader.load_features(gff, attributes=['ID'])] == [{'ID': 'gene1'}, {'ID': 'cds1'}, {'ID': 'gene2'}]
@@ -0,0 +1,150 @@
+import json
+import multiprocessing
+
+from pathlib import Path
+from typing import Dict
+
+import index_store
+
+
+def make_genome(tmp_path: Path, content: str = '>chr1\nACGT\n') -> Path:
+    genome: Path = tmp_path / 'genome.fna'
+    genome.write_text(content)
+    return genome
+
+
+def build(entry: Path, content: str = 'index') -> int:
+    return index_store.build_index(entry, 'printf {} > {}/genome.idx'.format(content, entry))
+
+
+def age(entry: Path, last_used: str):
+    metadata_path: Path = entry / index_store.ENTRY_METADATA_FILE
+    metadata: Dict = json.loads(metadata_path.read_text())
+    metadata['last_used'] = last_used
+    metadata_path.write_text(json.dumps(metadata))
+
+
+def release_usage_locks():
+    for usage_lock in index_store._used_entries:
+        usage_lock.close()
+    index_store._used_entries.clear()
+
+
+def test_index_key_depends_on_all_inputs():
+    key: str = index_store.index_key('abc', 'bowtie2', '2.5.1', {'option': '1'})
+    assert key == index_store.index_key('abc', 'bowtie2', '2.5.1', {'option': '1'})
+    assert len({key,
+                index_store.index_key('abd', 'bowtie2', '2.5.1', {'option': '1'}),
+                index_store.index_key('abc', 'bwa', '2.5.1', {'option': '1'}),
+                index_store.index_key('abc', 'bowtie2', '2.5.2', {'option': '1'}),
+                index_store.index_key('abc', 'bowtie2', '2.5.1', {'option': '2'})}) == 5
+
+
+def test_index_key_uses_content_instead_of_path(tmp_path: Path):
+    store: Path = tmp_path / 'store'
+    first: Path = make_genome(tmp_path)
+    copy: Path = tmp_path / 'copy' / 'genome.fna'
+    copy.parent.mkdir()
+    copy.write_text(first.read_text())
+    assert index_store.resolve_index(store, first, 'bwa', '0.7', {}) == index_store.resolve_index(store, copy, 'bwa', '0.7', {})
+    copy.write_text('>chr1\nACGA\n')
+    assert index_store.resolve_index(store, first, 'bwa', '0.7', {}) != index_store.resolve_index(store, copy, 'bwa', '0.7', {})
+    release_usage_locks()
+
+
+def test_file_hash_cache_keeps_other_entries(tmp_path: Path):
+    store: Path = tmp_path / 'store'
+    genome: Path = make_genome(tmp_path)
+    (tmp_path / 'store').mkdir()
+    (store / index_store.FILE_HASHES_CACHE).write_text(json.dumps({'other:1:1': 'abc'}))
+    genome_hash: str = index_store.file_content_hash(store, genome)
+    cache: Dict[str, str] = json.loads((store / index_store.FILE_HASHES_CACHE).read_text())
+    assert cache['other:1:1'] == 'abc'
+    assert genome_hash in cache.values()
+
+
+def test_build_moves_complete_index_into_store(tmp_path: Path):
+    store: Path = tmp_path / 'store'
+    entry: Path = index_store.resolve_index(store, make_genome(tmp_path), 'bwa', '0.7', {})
+    assert not index_store.is_complete(entry)
+    assert index_store.list_indexes(store) == []
+
+    assert build(entry) == 0
+    assert index_store.is_complete(entry)
+    assert (entry / 'genome.idx').read_text() == 'index'
+    assert json.loads((entry / index_store.ENTRY_METADATA_FILE).read_text())['tool'] == 'bwa'
+    assert [index.path for index in index_store.list_indexes(store)] == [entry]
+    assert list(entry.parent.glob('.*.tmp')) == []
+    release_usage_locks()
+
+
+def test_build_skips_complete_index(tmp_path: Path):
+    entry: Path = index_store.resolve_index(tmp_path / 'store', make_genome(tmp_path), 'bwa', '0.7', {})
+    assert build(entry, 'first') == 0
+    assert build(entry, 'second') == 0
+    assert (entry / 'genome.idx').read_text() == 'first'
+    release_usage_locks()
+
+
+def test_failed_build_leaves_entry_incomplete(tmp_path: Path):
+    entry: Path = index_store.resolve_index(tmp_path / 'store', make_genome(tmp_path), 'bwa', '0.7', {})
+    # The exit code of the tool is kept although the output is piped into tee
+    assert index_store.build_index(entry, 'false | tee {}/build.log'.format(entry)) != 0
+    assert not index_store.is_complete(entry)
+    assert not (entry / 'build.log').exists()
+    assert list(entry.parent.glob('.*.tmp')) == []
+    release_usage_locks()
+
+
+def test_prune_removes_least_recently_used_indexes(tmp_path: Path):
+    store: Path = tmp_path / 'store'
+    old: Path = index_store.resolve_index(store, make_genome(tmp_path, '>old\nA\n'), 'bwa', '0.7', {})
+    new: Path = index_store.resolve_index(store, make_genome(tmp_path, '>new\nA\n'), 'bwa', '0.7', {})
+    incomplete: Path = index_store.resolve_index(store, make_genome(tmp_path, '>incomplete\nA\n'), 'bwa', '0.7', {})
+    build(old, 'x' * 1000)
+    build(new, 'x' * 1000)
+    age(old, '2020-01-01T00:00:00')
+    age(new, '2021-01-01T00:00:00')
+    release_usage_locks()
+
+    size: int = index_store.directory_size(new)
+    assert [entry.path for entry in index_store.prune(store, size, dry_run=True)] == [old]
+    assert old.is_dir()
+    assert [entry.path for entry in index_store.prune(store, size)] == [old]
+    assert not old.exists()
+    assert new.is_dir()
+    assert incomplete.is_dir()
+
+
+def hold_usage_lock(store: Path, genome: Path, ready, done):
+    index_store.resolve_index(store, genome, 'bwa', '0.7', {})
+    ready.set()
+    done.wait(10)
+
+
+def test_prune_keeps_indexes_in_use(tmp_path: Path):
+    store: Path = tmp_path / 'store'
+    genome: Path = make_genome(tmp_path)
+    entry: Path = index_store.resolve_index(store, genome, 'bwa', '0.7', {})
+    build(entry)
+    release_usage_locks()
+
+    ready, done = multiprocessing.Event(), multiprocessing.Event()
+    run = multiprocessing.Process(target=hold_usage_lock, args=(store, genome, ready, done))
+    run.start()
+    try:
+        assert ready.wait(10)
+        assert index_store.prune(store, 0) == []
+        assert index_store.is_complete(entry)
+    finally:
+        done.set()
+        run.join()
+    assert [removed.path for removed in index_store.prune(store, 0)] == [entry]
+
+
+def test_parse_and_format_size():
+    assert index_store.parse_size('800M') == 800 * 1024 ** 2
+    assert index_store.parse_size('1.5T') == int(1.5 * 1024 ** 4)
+    assert index_store.parse_size('20gb') == 20 * 1024 ** 3
+    assert index_store.format_size(512) == '512B'
+    assert index_store.format_size(1536) == '1.5K'
@@ -0,0 +1,76 @@
+from typing import List
+
+import merge_chunk_statistics
+
+FLAGSTAT: str = '''{total} + 0 in total (QC-passed reads + QC-failed reads)
+{total} + 0 primary
+0 + 0 secondary
+{mapped} + 0 mapped ({mapped_rate} : N/A)
+{mapped} + 0 primary mapped ({mapped_rate} : N/A)
+{total} + 0 paired in sequencing
+{paired} + 0 properly paired ({paired_rate} : N/A)'''
+
+BOWTIE2: str = '''Warning: skipping read 'r{warning}' because it was < 2 characters long
+{reads} reads; of these:
+  {reads} (100.00%) were paired; of these:
+    {unaligned} ({unaligned_rate}) aligned concordantly 0 times
+    {unique} ({unique_rate}) aligned concordantly exactly 1 time
+    0 (0.00%) aligned concordantly >1 times
+{overall}% overall alignment rate'''
+
+
+def test_flagstat_counts_are_summed_and_percentages_recalculated():
+    chunks: List[List[str]] = [
+        FLAGSTAT.format(total=100, mapped=90, mapped_rate='90.00%', paired=80, paired_rate='80.00%').splitlines(),
+        FLAGSTAT.format(total=300, mapped=150, mapped_rate='50.00%', paired=100, paired_rate='33.33%').splitlines()
+    ]
+    assert merge_chunk_statistics.detect_format(chunks[0]) == 'flagstat'
+    assert merge_chunk_statistics.merge_flagstat(chunks) == [
+        '400 + 0 in total (QC-passed reads + QC-failed reads)',
+        '400 + 0 primary',
+        '0 + 0 secondary',
+        '240 + 0 mapped (60.00% : N/A)',
+        '240 + 0 primary mapped (60.00% : N/A)',
+        '400 + 0 paired in sequencing',
+        '180 + 0 properly paired (45.00% : N/A)'
+    ]
+
+
+def test_bowtie2_percentages_are_relative_to_parent_lines():
+    chunks: List[List[str]] = [
+        BOWTIE2.format(warning=1, reads=100, unaligned=20, unaligned_rate='20.00%', unique=80, unique_rate='80.00%', overall='85.00').splitlines(),
+        BOWTIE2.format(warning=2, reads=300, unaligned=0, unaligned_rate='0.00%', unique=300, unique_rate='100.00%', overall='100.00').splitlines()
+    ]
+    assert merge_chunk_statistics.detect_format(chunks[0]) == 'bowtie2'
+    assert merge_chunk_statistics.merge_bowtie2(chunks) == [
+        '400 reads; of these:',
+        '  400 (100.00%) were paired; of these:',
+        '    20 (5.00%) aligned concordantly 0 times',
+        '    380 (95.00%) aligned concordantly exactly 1 time',
+        '    0 (0.00%) aligned concordantly >1 times',
+        '96.25% overall alignment rate'
+    ]
+
+
+def test_bowtie_percentages_are_relative_to_processed_reads():
+    chunks: List[List[str]] = [
+        ['# reads processed: 100', '# reads with at least one alignment: 50 (50.00%)', 'Reported 50 alignments'],
+        ['# reads processed: 300', '# reads with at least one alignment: 250 (83.33%)', 'Reported 250 alignments']
+    ]
+    assert merge_chunk_statistics.detect_format(chunks[0]) == 'bowtie'
+    assert merge_chunk_statistics.merge_bowtie(chunks) == [
+        '# reads processed: 400', '# reads with at least one alignment: 300 (75.00%)', 'Reported 300 alignments'
+    ]
+
+
+def test_segemehl_counts_are_summed_and_percentages_recalculated():
+    chunks: List[List[str]] = [
+        ['type\tall\tmapped\tmapped%\tunmapped\tunmapped%', 'all\t100\t60\t60.00\t40\t40.00'],
+        ['type\tall\tmapped\tmapped%\tunmapped\tunmapped%', 'all\t300\t240\t80.00\t60\t20.00']
+    ]
+    assert merge_chunk_statistics.detect_format(chunks[0]) == 'segemehl'
+    assert merge_chunk_statistics.merge_segemehl(chunks)[1] == 'all\t400\t300\t75.00\t100\t25.00'
+
+
+def test_unknown_format():
+    assert merge_chunk_statistics.detect_format(['[M::main] Version: 2.24']) is None
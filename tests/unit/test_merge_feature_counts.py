@@ -0,0 +1,48 @@
+import pytest
+
+from pathlib import Path
+from typing import List
+
+import merge_feature_counts
+
+HEADER: str = '# Program:featureCounts v2.0.1; Command:"featureCounts" "-T" "2" "{sample}.bam"\n'
+COLUMNS: str = 'Geneid\tChr\tStart\tEnd\tStrand\tLength\tmapping/{sample}.bam\n'
+
+
+def write_sample(directory: Path, sample: str, counts: List[int], genes: List[str] = None) -> Path:
+    table: Path = directory / '{}.txt'.format(sample)
+    rows: List[str] = ['{}\tNC_1\t{}\t{}\t+\t100\t{}\n'.format(gene, 100 * i + 1, 100 * i + 100, count)
+                       for i, (gene, count) in enumerate(zip(genes or ['gene1', 'gene2'], counts))]
+    table.write_text(HEADER.format(sample=sample) + COLUMNS.format(sample=sample) + ''.join(rows))
+    table.with_name(table.name + '.summary').write_text('Status\tmapping/{}.bam\nAssigned\t{}\nUnassigned_NoFeatures\t3\n'.format(sample, sum(counts)))
+    return table
+
+
+def test_count_tables_are_merged_column_wise(tmp_path: Path):
+    tables: List[Path] = [write_sample(tmp_path, 'a', [1, 2]), write_sample(tmp_path, 'b', [10, 20])]
+    output: Path = tmp_path / 'counts.txt'
+    merge_feature_counts.merge_count_tables(tables, output)
+    lines: List[str] = output.read_text().splitlines()
+    assert lines[0] == '# Program:featureCounts v2.0.1; Command: merged from 2 per-sample count tables'
+    assert lines[1:] == ['Geneid\tChr\tStart\tEnd\tStrand\tLength\tmapping/a.bam\tmapping/b.bam',
+                         'gene1\tNC_1\t1\t100\t+\t100\t1\t10',
+                         'gene2\tNC_1\t101\t200\t+\t100\t2\t20']
+
+
+def test_summaries_are_merged_column_wise(tmp_path: Path):
+    tables: List[Path] = [write_sample(tmp_path, 'a', [1, 2]), write_sample(tmp_path, 'b', [10, 20])]
+    output: Path = tmp_path / 'counts.txt.summary'
+    merge_feature_counts.merge_summaries([table.with_name(table.name + '.summary') for table in tables], output)
+    assert output.read_text().splitlines() == ['Status\tmapping/a.bam\tmapping/b.bam', 'Assigned\t3\t30', 'Unassigned_NoFeatures\t3\t3']
+
+
+def test_different_annotations_are_rejected(tmp_path: Path):
+    tables: List[Path] = [write_sample(tmp_path, 'a', [1, 2]), write_sample(tmp_path, 'b', [10, 20], ['gene1', 'gene3'])]
+    with pytest.raises(ValueError, match='same annotation'):
+        merge_feature_counts.merge_count_tables(tables, tmp_path / 'counts.txt')
+
+
+def test_different_number_of_features_is_rejected(tmp_path: Path):
+    tables: List[Path] = [write_sample(tmp_path, 'a', [1, 2]), write_sample(tmp_path, 'b', [10, 20, 30], ['gene1', 'gene2', 'gene3'])]
+    with pytest.raises(ValueError, match='number of features'):
+        merge_feature_counts.merge_count_tables(tables, tmp_path / 'counts.txt')
@@ -0,0 +1,38 @@
+import json
+
+from pathlib import Path
+from typing import Any, List, Tuple
+
+import report_data
+
+
+def read_chunk(chunk: Path) -> Tuple[str, List[Any]]:
+    """File name and rows of a chunk file (Curare.addChunk(<file>,<rows>);)"""
+    content: str = chunk.read_text()
+    assert content.startswith('Curare.addChunk(') and content.endswith(');\n')
+    return tuple(json.loads('[{}]'.format(content[len('Curare.addChunk('):-len(');\n')])))
+
+
+def test_data_is_written_without_indentation(tmp_path: Path):
+    output: Path = tmp_path / 'dge_analysis.js'
+    report_data.write_data_js(output, 'dge_analysis', {'samples': ['a', 'b'], 'counts': {'a': 1.5}})
+    assert output.read_text() == 'window.Curare.dge_analysis = {"samples":["a","b"],"counts":{"a":1.5}};\n'
+
+
+def test_rows_are_split_into_chunks(tmp_path: Path):
+    data_dir: Path = tmp_path / '.report' / 'data'
+    rows: List[List[Any]] = [['sample{}'.format(i), i] for i in range(5)]
+    index = report_data.write_chunks(rows, data_dir, data_dir / 'dge_analysis', 'feature_counts', 2)
+    assert index == {'files': ['dge_analysis/feature_counts_0.js', 'dge_analysis/feature_counts_1.js', 'dge_analysis/feature_counts_2.js'],
+                     'rows': 5, 'chunk_rows': 2}
+    chunks = [read_chunk(data_dir / file) for file in index['files']]
+    assert [file for file, _ in chunks] == index['files']
+    assert [row for _, chunk_rows in chunks for row in chunk_rows] == rows
+    # row 3 is found in its chunk like Curare.loadRow()
+    assert chunks[3 // index['chunk_rows']][1][3 % index['chunk_rows']] == ['sample3', 3]
+
+
+def test_empty_rows_have_no_chunks(tmp_path: Path):
+    index = report_data.write_chunks([], tmp_path, tmp_path / 'chunks', 'fold_changes', 10)
+    assert index == {'files': [], 'rows': 0, 'chunk_rows': 10}
+    assert list((tmp_path / 'chunks').iterdir()) == []
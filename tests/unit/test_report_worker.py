@@ -0,0 +1,69 @@
+import sys
+
+from pathlib import Path
+from typing import List
+
+import report_worker
+
+
+def write_script(directory: Path, name: str, body: str) -> str:
+    script: Path = directory / name
+    script.write_text(body)
+    return str(script)
+
+
+def test_manifest_round_trip(tmp_path: Path):
+    manifest: Path = tmp_path / 'report_manifest.json'
+    report_worker.write_manifest(manifest, [[tmp_path / 'a.py', '--threads', 2], ['b.py']])
+    assert report_worker.read_manifest(manifest) == [[str(tmp_path / 'a.py'), '--threads', '2'], ['b.py']]
+
+
+def test_scripts_run_as_main_with_their_arguments(tmp_path: Path):
+    output: Path = tmp_path / 'output.txt'
+    write_script(tmp_path, 'helper.py', 'SUFFIX = "!"\n')
+    script: str = write_script(tmp_path, 'convert.py', 'import sys\nfrom helper import SUFFIX\n'
+                                                       'if __name__ == "__main__":\n'
+                                                       '    open(sys.argv[2], "a").write(sys.argv[1] + SUFFIX)\n')
+    argv: List[str] = list(sys.argv)
+    path: List[str] = list(sys.path)
+    assert report_worker.run_tasks([[script, 'a', str(output)], [script, 'b', str(output)]]) == 0
+    assert output.read_text() == 'a!b!'
+    assert sys.argv == argv
+    assert sys.path == path
+
+
+def test_imported_modules_are_shared_between_scripts(tmp_path: Path):
+    write_script(tmp_path, 'shared_cache_module.py', 'loaded = []\n')
+    script: str = write_script(tmp_path, 'load.py', 'import shared_cache_module\nshared_cache_module.loaded.append(1)\n')
+    try:
+        assert report_worker.run_tasks([[script], [script]]) == 0
+        assert sys.modules['shared_cache_module'].loaded == [1, 1]
+    finally:
+        sys.modules.pop('shared_cache_module', None)
+
+
+def test_exit_codes():
+    assert report_worker.exit_code(None) == 0
+    assert report_worker.exit_code(3) == 3
+    assert report_worker.exit_code('message') == 1
+
+
+def test_all_scripts_run_and_failures_are_reported(tmp_path: Path, capsys):
+    output: Path = tmp_path / 'output.txt'
+    ok: str = write_script(tmp_path, 'ok.py', 'open({!r}, "a").write("ok")\n'.format(str(output)))
+    exits: str = write_script(tmp_path, 'exits.py', 'import sys\nsys.exit("no conditions")\n')
+    fails: str = write_script(tmp_path, 'fails.py', 'raise ValueError("broken table")\n')
+    assert report_worker.run_tasks([[exits], [fails], [ok]]) == 1
+    assert output.read_text() == 'ok'
+    captured = capsys.readouterr()
+    assert '[exit code 1] {}'.format(exits) in captured.out
+    assert '[ok] {}'.format(ok) in captured.out
+    assert 'no conditions' in captured.err
+    assert 'ValueError: broken table' in captured.err
+    assert '2 of 3 scripts failed' in captured.err
+
+
+def test_open_figures_are_closed(tmp_path: Path):
+    script: str = write_script(tmp_path, 'plot.py', 'import matplotlib\nmatplotlib.use("Agg")\nimport matplotlib.pyplot as plt\nplt.figure()\n')
+    assert report_worker.run_tasks([[script]]) == 0
+    assert sys.modules['matplotlib.pyplot'].get_fignums() == []
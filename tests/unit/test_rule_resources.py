@@ -0,0 +1,89 @@
+import re
+
+import pytest
+import yaml
+
+from pathlib import Path
+from typing import Dict
+
+from conftest import SNAKEFILES
+from curare import curare
+from curare.curare import InvalidPipelineFileError, Module, ResourceRange
+
+
+def module_with_threads(threads: Dict[str, ResourceRange], pipe_groups=None) -> Module:
+    module = Module('test')
+    module.resources = {rule_name: {'threads': resource} for rule_name, resource in threads.items()}
+    module.pipe_groups = pipe_groups or []
+    return module
+
+
+def test_section_declarations_are_merged_per_resource():
+    declarations = {'mapping': {'threads': {'default': 8}, 'mem_mb': {'default': 4096}}}
+    curare.add_resource_declarations(declarations, {'mapping': {'mem_mb': {'default': 8192}}, 'sorting': {'threads': {'default': 2}}})
+    assert declarations == {'mapping': {'threads': {'default': 8}, 'mem_mb': {'default': 8192}}, 'sorting': {'threads': {'default': 2}}}
+
+
+def test_single_rules_are_limited_to_cores():
+    module = module_with_threads({'mapping': ResourceRange(8, 1, 64), 'sorting': ResourceRange(4, 1, 64)})
+    curare.scale_resources({'mapping': [module]}, '6', None)
+    assert module.resources['mapping']['threads'].value == 6
+    assert module.resources['sorting']['threads'].value == 4
+
+
+@pytest.mark.parametrize('cores, expected', [('12', (8, 4)), ('8', (6, 2)), ('4', (3, 1)), ('2', (1, 1))])
+def test_pipe_group_is_limited_to_cores(cores, expected):
+    module = module_with_threads({'mapping': ResourceRange(8, 1, 64), 'sorting': ResourceRange(4, 1, 64)}, [['mapping', 'sorting']])
+    curare.scale_resources({'mapping': [module]}, cores, None)
+    assert (module.resources['mapping']['threads'].value, module.resources['sorting']['threads'].value) == expected
+
+
+def test_pipe_group_counts_rules_without_declaration():
+    module = module_with_threads({'sorting': ResourceRange(4, 1, 64)}, [['samse', 'sorting']])
+    curare.scale_resources({'mapping': [module]}, '4', None)
+    assert module.resources['sorting']['threads'].value == 3
+
+
+def test_pipe_group_respects_minimum_values():
+    module = module_with_threads({'mapping': ResourceRange(8, 1, 64), 'sorting': ResourceRange(4, 3, 64)}, [['mapping', 'sorting']])
+    curare.scale_resources({'mapping': [module]}, '4', None)
+    assert module.resources['mapping']['threads'].value == 1
+    assert module.resources['sorting']['threads'].value == 3
+
+
+def test_pipe_group_without_enough_cores_is_rejected():
+    module = module_with_threads({'mapping': ResourceRange(8, 1, 64), 'sorting': ResourceRange(4, 1, 64)}, [['mapping', 'sorting']])
+    with pytest.raises(InvalidPipelineFileError, match='run at the same time'):
+        curare.scale_resources({'mapping': [module]}, '1', None)
+
+
+def test_section_resources_of_dge_analysis(tmp_path: Path):
+    gff_file: Path = tmp_path / 'annotation.gff'
+    gff_file.write_text('##gff-version 3\n')
+    settings = {'gff_feature_type': 'gene', 'gff_path': str(gff_file)}
+    paired_end = curare.load_module('analysis', 'dge_analysis', settings, tmp_path / 'pipeline.yml', True)
+    single_end = curare.load_module('analysis', 'dge_analysis', settings, tmp_path / 'pipeline.yml', False)
+    assert paired_end.resources['dge_analysis_normalize_counts']['threads'].value == 8
+    assert 'deseq2_normalize_counts' not in paired_end.resources
+    assert single_end.resources['deseq2_normalize_counts']['threads'].value == 8
+
+
+def test_cluster_jobs_are_limited_by_node_resources():
+    args = {'--executor': 'local', '--cores': '2', '--mem-mb': '4000', '--node-cores': None, '--node-mem-mb': None}
+    assert curare.get_job_resource_limits(args) == ('2', '4000')
+    args['--executor'] = 'cluster'
+    assert curare.get_job_resource_limits(args) == (None, None)
+    args.update({'--node-cores': '16', '--node-mem-mb': '64000'})
+    assert curare.get_job_resource_limits(args) == ('16', '64000')
+
+
+@pytest.mark.parametrize('module_yaml', sorted(SNAKEFILES.glob('*/*/*.yaml')), ids=lambda path: path.stem)
+def test_declared_rules_exist_in_all_layouts(module_yaml: Path):
+    declaration = yaml.safe_load(module_yaml.read_text())
+    for layout in ['single_end', 'paired_end']:
+        if layout not in declaration:
+            continue
+        snakefile: str = (module_yaml.parent / declaration[layout]['snakefile']).read_text()
+        rule_names = set(re.findall(r'^(?:rule|checkpoint) (\w+):$', snakefile, re.MULTILINE))
+        declared = set(declaration.get('resources', {}) or {}) | set(declaration[layout].get('resources', {}) or {})
+        assert declared <= rule_names, '{} ({}): resources of unknown rules {}'.format(module_yaml.name, layout, sorted(declared - rule_names))
@@ -0,0 +1,128 @@
+import gzip
+import json
+
+import yaml
+
+from pathlib import Path
+from typing import Dict, List
+
+from conftest import ROOT
+
+import run_planner
+from run_planner import Coefficients, ModuleEstimate, PlannedModule
+
+DRY_RUN_OUTPUT: str = '''Building DAG of jobs...
+Job stats:
+job                         count    min threads    max threads
+------------------------  -------  -------------  -------------
+all                             1              1              1
+bowtie2__bowtie2_mapping        6              8              8
+bowtie2__index_bam              6              4              4
+total                          13              1              8
+
+This was a dry-run (flag -n). The order of jobs does not reflect the order of execution.
+'''
+
+
+def module_estimate(name: str, final_gb: float, intermediate_gb: float) -> ModuleEstimate:
+    return ModuleEstimate(name, 1, 1.0, 1024, final_gb, intermediate_gb, False)
+
+
+def test_parse_job_counts():
+    assert run_planner.parse_job_counts(DRY_RUN_OUTPUT) == {'all': 1, 'bowtie2__bowtie2_mapping': 6, 'bowtie2__index_bam': 6}
+    assert run_planner.parse_job_counts('Nothing to be done (all requested files are present and up to date).') == {}
+
+
+def test_estimate_limits_parallel_jobs_by_cores_and_memory():
+    module = PlannedModule('bowtie2', 'bowtie2', Path('mapping'), threads={'bowtie2_mapping': 8, 'index_bam': 4},
+                           mem_mb={'bowtie2_mapping': 4096, 'index_bam': 2048})
+    coefficients: Dict[str, Coefficients] = {run_planner.DEFAULT_COEFFICIENTS: Coefficients(3600.0, 2.0, 3.0, 1000)}
+    counts: Dict[str, int] = run_planner.parse_job_counts(DRY_RUN_OUTPUT)
+    estimate: ModuleEstimate = run_planner.estimate([module], counts, 2.0, coefficients, 16, None)[0]
+    assert (estimate.jobs, estimate.cpu_hours, estimate.final_gb, estimate.intermediate_gb) == (12, 2.0, 4.0, 6.0)
+    # 2 mappings (8 threads) with 4096 MB or 4 BAM jobs (4 threads) with 2048 MB at the same time
+    assert estimate.peak_memory_mb == 8192
+    assert run_planner.estimate([module], counts, 2.0, coefficients, 16, 6000)[0].peak_memory_mb == 6000
+
+
+def test_peak_disk_usage_accumulates_results():
+    estimates: List[ModuleEstimate] = [module_estimate('fastp', 1.0, 0.5), module_estimate('bowtie2', 2.0, 10.0),
+                                       module_estimate('dge_analysis', 0.5, 1.0)]
+    # Results of fastp and bowtie2 and the temporary files of bowtie2
+    assert run_planner.peak_disk_usage(estimates) == (13.0, 'bowtie2')
+    estimates[2] = module_estimate('dge_analysis', 0.5, 12.0)
+    assert run_planner.peak_disk_usage(estimates) == (15.5, 'dge_analysis')
+    assert run_planner.peak_disk_usage([]) == (0.0, '')
+
+
+def test_format_plan_prints_peak_disk_usage():
+    lines: List[str] = run_planner.format_plan([module_estimate('fastp', 1.0, 0.5), module_estimate('bowtie2', 2.0, 10.0)], {'all': 1}, 3.0)
+    assert 'Peak disk usage: 13.00 GB (results of all modules up to bowtie2 and its temporary files)' in lines
+
+
+def test_input_size_counts_uncompressed_reads_with_gzip_ratio(tmp_path: Path):
+    compressed: Path = tmp_path / 'sample_R1.fastq.gz'
+    with gzip.open(str(compressed), 'wb') as reads:
+        reads.write(b'@read\nACGT\n+\nIIII\n')
+    uncompressed: Path = tmp_path / 'sample_R2.fastq'
+    uncompressed.write_bytes(b'x' * 4000)
+    samples = {'sample': {'main': {'forward_reads': str(compressed), 'reverse_reads': str(uncompressed)}}}
+    expected_bytes: float = compressed.stat().st_size + 4000 / run_planner.GZIP_RATIO
+    assert abs(run_planner.input_size_gb(samples) - expected_bytes / run_planner.GB) < 1e-12
+
+
+def write_calibration(path: Path, runs: List[tuple]) -> Path:
+    """Calibration file with bowtie2 runs (input GB, CPU seconds, reference CPU seconds, reference jobs)"""
+    calibration_runs = {'/runs/{}'.format(i): {'updated': '2026-01-0{}T00:00:00'.format(i + 1), 'input_gb': input_gb,
+                                               'modules': {'bowtie2': {'cpu_seconds': cpu_seconds, 'reference_cpu_seconds': reference_cpu_seconds,
+                                                                       'reference_jobs': reference_jobs, 'final_gb': input_gb}}}
+                        for i, (input_gb, cpu_seconds, reference_cpu_seconds, reference_jobs) in enumerate(runs)}
+    path.write_text(yaml.safe_dump({'runs': calibration_runs}))
+    return path
+
+
+def test_fit_line():
+    assert run_planner.fit_line([1.0, 2.0, 3.0], [150.0, 250.0, 350.0]) == (50.0, 100.0)
+    # single input size: line through the origin
+    assert run_planner.fit_line([2.0, 2.0], [100.0, 300.0]) == (0.0, 100.0)
+    # no negative slope or intercept
+    assert run_planner.fit_line([1.0, 2.0], [300.0, 100.0]) == (200.0, 0.0)
+    assert run_planner.fit_line([1.0, 2.0], [10.0, 300.0]) == (0.0, 310.0 / 3.0)
+
+
+def test_reference_jobs_and_small_runs_do_not_change_the_rate_per_gb(tmp_path: Path):
+    calibration: Path = write_calibration(tmp_path / 'calibration.yaml', [(0.005, 90000.0, 0.0, 0), (1.0, 1100.0, 3000.0, 1),
+                                                                         (3.0, 3100.0, 0.0, 0)])
+    coefficients = run_planner.load_coefficients(ROOT / 'curare' / 'snakefiles' / 'misc' / 'calibration.yaml', calibration)
+    bowtie2: Coefficients = coefficients['bowtie2']
+    assert bowtie2.measured
+    assert (bowtie2.cpu_seconds_fixed, bowtie2.cpu_seconds_per_gb) == (100.0, 1000.0)
+    assert bowtie2.cpu_seconds_per_reference_job == 3000.0
+    assert bowtie2.final_disk_factor == 1.0
+    assert not coefficients['fastp'].measured
+
+    module = PlannedModule('bowtie2', 'bowtie2', Path('mapping'), reference_rules=['bowtie2_index'])
+    with_index = run_planner.estimate([module], {'bowtie2__bowtie2_index': 1, 'bowtie2__bowtie2_mapping': 6}, 2.0, coefficients, 8, None)[0]
+    assert with_index.cpu_hours == (100.0 + 2 * 1000.0 + 3000.0) / 3600
+    without_index = run_planner.estimate([module], {'bowtie2__bowtie2_mapping': 6}, 2.0, coefficients, 8, None)[0]
+    assert without_index.cpu_hours == (100.0 + 2 * 1000.0) / 3600
+
+
+def test_small_runs_only_calibrate_reference_jobs(tmp_path: Path):
+    calibration: Path = write_calibration(tmp_path / 'calibration.yaml', [(0.005, 90000.0, 2000.0, 1)])
+    coefficients = run_planner.load_coefficients(ROOT / 'curare' / 'snakefiles' / 'misc' / 'calibration.yaml', calibration)
+    default = run_planner.load_coefficients(ROOT / 'curare' / 'snakefiles' / 'misc' / 'calibration.yaml', tmp_path / 'missing.yaml')['bowtie2']
+    assert coefficients['bowtie2'].cpu_seconds_per_gb == default.cpu_seconds_per_gb
+    assert coefficients['bowtie2'].cpu_seconds_per_reference_job == 2000.0
+
+
+def test_reference_jobs_are_collected_separately(tmp_path: Path):
+    metadata: Path = tmp_path / '.snakemake' / 'metadata'
+    metadata.mkdir(parents=True)
+    for i, (rule_name, start, end) in enumerate([('bowtie2__bowtie2_index', 0, 100), ('bowtie2__bowtie2_mapping', 100, 150),
+                                                 ('bowtie2__bowtie2_mapping', 100, 150), ('bowtie2__index_bam', 150, 160)]):
+        (metadata / str(i)).write_text(json.dumps({'rule': rule_name, 'starttime': start, 'endtime': end, 'incomplete': False}))
+    module = PlannedModule('bowtie2', 'bowtie2', Path('mapping'), threads={'bowtie2_index': 2, 'bowtie2_mapping': 8}, reference_rules=['bowtie2_index'])
+    statistics = run_planner.collect_run_statistics(tmp_path, [module])['bowtie2']
+    # jobs with multiple output files are counted once
+    assert statistics == {'cpu_seconds': 50 * 8 + 10, 'reference_cpu_seconds': 200, 'reference_jobs': 1, 'final_gb': 0.0}
@@ -0,0 +1,16 @@
+import pytest
+
+from pathlib import Path
+
+from conftest import ROOT
+from curare import curare
+
+GENOME: Path = ROOT / 'tests' / 'resources' / 'reference' / 'GCF_000007445.1_ASM744v1_genomic.fna'
+
+
+@pytest.mark.parametrize('executor, shared_genome', [('local', True), ('cluster', False)])
+def test_shared_genome_is_disabled_on_cluster(executor: str, shared_genome: bool, tmp_path: Path):
+    star = curare.load_module('mapping', 'star', {'genome_fasta': str(GENOME), 'shared_genome': 'yes'}, tmp_path / 'pipeline.yml', True)
+    curare.disable_single_host_settings({'mapping': [star]}, executor)
+    assert star.get_setting('shared_genome') is shared_genome
+
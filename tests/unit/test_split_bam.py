@@ -0,0 +1,78 @@
+import io
+
+from types import SimpleNamespace
+from typing import Dict, List
+
+import pytest
+
+import split_bam
+from split_bam import DISCONCORDANT, MAPPED, SINGLETON, UNMAPPED
+
+HEADER: bytes = b'@HD\tVN:1.6\tSO:unsorted\n@SQ\tSN:chr1\tLN:1000\n'
+
+
+def record(name: str, flag: int) -> bytes:
+    return '{}\t{}\tchr1\t1\t60\t4M\t*\t0\t0\tACGT\tIIII\n'.format(name, flag).encode()
+
+
+def split(records: List[bytes], categories: List[str], single_end: bool = False):
+    sinks: Dict[str, io.BytesIO] = {category: io.BytesIO() for category in categories}
+    sorters = {category: SimpleNamespace(stdin=sink) for category, sink in sinks.items()}
+    mirror: io.BytesIO = io.BytesIO()
+    counts = split_bam.split_alignment(io.BytesIO(HEADER + b''.join(records)), sorters, [mirror], single_end)
+    return sinks, mirror, counts
+
+
+@pytest.mark.parametrize('flag, category', [
+    (99, MAPPED),           # paired, proper pair, mate reverse, first
+    (147, MAPPED),          # paired, proper pair, reverse, second
+    (97, DISCONCORDANT),    # paired, both mapped, not proper
+    (73, SINGLETON),        # mate unmapped
+    (133, SINGLETON),       # read unmapped, mate mapped
+    (77, UNMAPPED),         # both unmapped
+    (141, UNMAPPED),
+])
+def test_classify_paired_end(flag, category):
+    assert split_bam.classify_paired_end(flag, True) == category
+
+
+def test_classify_paired_end_without_disconcordant_output():
+    assert split_bam.classify_paired_end(97, False) == MAPPED
+
+
+def test_classify_single_end():
+    assert split_bam.classify_single_end(0) == MAPPED
+    assert split_bam.classify_single_end(16) == MAPPED
+    assert split_bam.classify_single_end(4) == UNMAPPED
+
+
+def test_split_routes_records_and_copies_header():
+    records = [record('a', 99), record('a', 147), record('b', 97), record('b', 145), record('c', 73), record('c', 133),
+               record('d', 77), record('d', 141)]
+    sinks, mirror, counts = split(records, [MAPPED, SINGLETON, DISCONCORDANT, UNMAPPED])
+    assert counts == {MAPPED: 2, DISCONCORDANT: 2, SINGLETON: 2, UNMAPPED: 2}
+    for category, expected in [(MAPPED, records[0:2]), (DISCONCORDANT, records[2:4]), (SINGLETON, records[4:6]), (UNMAPPED, records[6:8])]:
+        assert sinks[category].getvalue() == HEADER + b''.join(expected)
+    # the flagstat mirror gets every record once
+    assert mirror.getvalue() == HEADER + b''.join(records)
+
+
+def test_split_without_output_counts_but_drops_records():
+    records = [record('a', 99), record('c', 73), record('d', 77)]
+    sinks, mirror, counts = split(records, [MAPPED])
+    assert counts[SINGLETON] == 1 and counts[UNMAPPED] == 1
+    assert sinks[MAPPED].getvalue() == HEADER + records[0]
+
+
+def test_split_merges_disconcordant_into_mapped_without_output():
+    records = [record('a', 99), record('b', 97)]
+    sinks, mirror, counts = split(records, [MAPPED, UNMAPPED])
+    assert counts[MAPPED] == 2
+    assert sinks[MAPPED].getvalue() == HEADER + b''.join(records)
+
+
+def test_split_single_end():
+    records = [record('a', 0), record('b', 4), record('c', 16)]
+    sinks, mirror, counts = split(records, [MAPPED, UNMAPPED], single_end=True)
+    assert sinks[MAPPED].getvalue() == HEADER + records[0] + records[2]
+    assert sinks[UNMAPPED].getvalue() == HEADER + records[1]
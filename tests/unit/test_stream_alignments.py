@@ -0,0 +1,72 @@
+import gzip
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from pathlib import Path
+
+from conftest import ROOT, SNAKEFILES
+from curare import curare
+
+GENOME: Path = ROOT / 'tests' / 'resources' / 'reference' / 'GCF_000007445.1_ASM744v1_genomic.fna'
+STREAMING_MODULES = ['bowtie', 'bowtie2', 'bwa-backtrack', 'bwa-mem', 'bwa-mem2', 'bwa-sw', 'minimap2', 'segemehl']
+
+
+def load_streaming_module(module_name: str, paired_end: bool, tmp_path: Path) -> curare.Module:
+    settings = {'genome_fasta': str(GENOME), 'stream_alignments': 'yes', 'minimap2_preset': 'sr'}
+    return curare.load_module('mapping', module_name, settings, tmp_path / 'pipeline.yml', paired_end)
+
+
+@pytest.mark.parametrize('paired_end', [True, False])
+@pytest.mark.parametrize('module_name', STREAMING_MODULES)
+def test_pipe_group_connects_aligner_and_sorting(module_name: str, paired_end: bool, tmp_path: Path):
+    module = load_streaming_module(module_name, paired_end, tmp_path)
+    assert len(module.pipe_groups) == 1
+    aligner, sorting = module.pipe_groups[0]
+    snakefile: str = module.snakefile.read_text()
+    aligner_rule: str = snakefile.split('rule {}:'.format(aligner))[1].split('\nrule ')[0]
+    sorting_rule: str = snakefile.split('rule {}:'.format(sorting))[1].split('\nrule ')[0]
+    assert re.search(r'alignment_output\(chunked\("mapping/sam/\{\w+\}\.sam"\)\)', aligner_rule.split('log:')[0])
+    assert 'chunked("mapping/sam/{sample}.sam")' in sorting_rule.split('output:')[0]
+
+
+@pytest.mark.parametrize('cores', [8, 4, 2])
+@pytest.mark.parametrize('module_name', STREAMING_MODULES)
+def test_pipe_group_fits_into_cores(module_name: str, cores: int, tmp_path: Path):
+    module = load_streaming_module(module_name, True, tmp_path)
+    curare.scale_resources({'mapping': [module]}, str(cores), '16000')
+    for resource_name, limit in (('threads', cores), ('mem_mb', 16000)):
+        used = sum(module.resources[rule_name][resource_name].value if resource_name in module.resources.get(rule_name, {}) else int(resource_name == 'threads')
+                   for rule_name in module.pipe_groups[0])
+        assert used <= limit
+
+
+def test_pipe_group_is_only_used_when_streaming(tmp_path: Path):
+    module = curare.load_module('mapping', 'bowtie2', {'genome_fasta': str(GENOME)}, tmp_path / 'pipeline.yml', True)
+    assert module.pipe_groups == []
+
+
+@pytest.mark.skipif(shutil.which('snakemake') is None, reason='Snakemake is not installed')
+@pytest.mark.parametrize('cores', [8, 4])
+def test_streaming_pipeline_dry_run(cores: int, tmp_path: Path):
+    reads = []
+    for mate in (1, 2):
+        reads_file: Path = tmp_path / 'sample_R{}.fastq.gz'.format(mate)
+        with gzip.open(str(reads_file), 'wt') as fastq:
+            fastq.write('@read1\nACGT\n+\nIIII\n')
+        reads.append(str(reads_file))
+    samples_file: Path = tmp_path / 'samples.tsv'
+    samples_file.write_text('name\tforward_reads\treverse_reads\nsample\t{}\t{}\n'.format(*reads))
+    pipeline_file: Path = tmp_path / 'pipeline.yml'
+    pipeline_file.write_text('pipeline:\n  paired_end: true\npreprocessing:\n  modules: ["none"]\npremapping:\n  modules: []\n'
+                             'mapping:\n  modules: ["bowtie2"]\n  bowtie2:\n    genome_fasta: "{}"\n    stream_alignments: yes\n'
+                             'analysis:\n  modules: []\n'.format(GENOME))
+    environment = dict(os.environ, PYTHONPATH=str(ROOT))
+    plan = subprocess.run([sys.executable, '-m', 'curare.curare', '--samples', str(samples_file), '--pipeline', str(pipeline_file),
+                           '--output', str(tmp_path / 'output'), '--cores', str(cores), '--no-conda', '--plan'],
+                          env=environment, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    assert plan.returncode == 0, plan.stdout
@@ -0,0 +1,50 @@
+import pytest
+
+from pathlib import Path
+
+from conftest import SNAKEFILES, load_script
+
+SCRIPTS = [SNAKEFILES / 'analysis/dge_analysis/lib/deseq2_summary_tsv_to_xlsx.py',
+           SNAKEFILES / 'analysis/dge_analysis_edgeR/lib/edgeR_summary_tsv_to_xlsx.py']
+
+
+@pytest.fixture(params=SCRIPTS, ids=lambda script: script.name)
+def summary_script(request):
+    return load_script(request.param)
+
+
+def write_annotation(tmp_path: Path) -> Path:
+    gff: Path = tmp_path / 'annotation.gff'
+    gff.write_text('##gff-version 3\n'
+                   'NC_1\tRefSeq\tgene\t1\t100\t.\t+\t.\tID=gene1;locus_tag=A_1;product=first\n'
+                   'NC_1\tRefSeq\tCDS\t1\t100\t.\t+\t0\tID=cds1;Parent=gene1;product=first protein\n'
+                   'NC_1\tRefSeq\tgene\t201\t300\t.\t-\t.\tID=gene2;locus_tag=A_2;product=\n'
+                   'NC_2\tRefSeq\tgene\t1\t50\t.\t+\t.\tID=gene3;locus_tag=A_3\n')
+    return gff
+
+
+def test_only_annotations_of_summary_ids_are_kept(tmp_path: Path, summary_script):
+    annotations = summary_script.read_annotations(str(write_annotation(tmp_path)), 'ID', ['PRODUCT', 'LOCUS_TAG'], {'gene1', 'gene3'})
+    assert annotations == {'gene1': ['NC_1', '1', '100', '+', 'A_1', 'first', 'ID=gene1; locus_tag=A_1; product=first'],
+                           'gene3': ['NC_2', '1', '50', '+', 'A_3', '-', 'ID=gene3; locus_tag=A_3']}
+
+
+def test_empty_attribute_values_are_kept(tmp_path: Path, summary_script):
+    annotations = summary_script.read_annotations(str(write_annotation(tmp_path)), 'ID', ['PRODUCT', ''], {'gene2'})
+    assert annotations == {'gene2': ['NC_1', '201', '300', '-', '-', '', 'ID=gene2; locus_tag=A_2; product=']}
+
+
+def test_missing_identifier_exits(tmp_path: Path, summary_script):
+    with pytest.raises(SystemExit) as error:
+        summary_script.read_annotations(str(write_annotation(tmp_path)), 'GENE_ID', ['PRODUCT'], {'gene1'})
+    assert error.value.code == 2
+
+
+def test_annotation_columns_follow_the_id(tmp_path: Path, summary_script):
+    tsv: Path = tmp_path / 'summary.tsv'
+    tsv.write_text('id\tpvalue\tcount\ngene1\t0.01\t5\n\ngene9\t0.5\t7\n')
+    annotations = {'gene1': ['NC_1', '1', '100', '+', 'first', 'ID=gene1']}
+    assert list(summary_script.annotated_rows(str(tsv), annotations, ['PRODUCT'])) == \
+           [['id', 'Chromosome', 'Start', 'End', 'Strand', 'Product', 'pvalue', 'count', 'Attributes'],
+            ['gene1', 'NC_1', '1', '100', '+', 'first', '0.01', '5', 'ID=gene1'],
+            ['gene9', '-', '-', '-', '-', '-', '0.5', '7', '']]